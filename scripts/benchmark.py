@@ -0,0 +1,242 @@
+"""
+Benchmarks dos caminhos críticos do Generator e do Mixer, sem Docker e sem rede.
+
+Cada benchmark é calibrado com timeit (autorange) e repetido `--repeat` vezes;
+o resultado é o tempo por operação (mediana, mínimo e desvio). As rekeys do
+CSPRNG buscam sementes em um mixer substituto local (scripts/fake_mixer.py).
+
+Uso:
+    python scripts/benchmark.py --output atual.json
+    python scripts/benchmark.py --filter flask/ --compare base.json
+    python scripts/benchmark.py --compare base.json atual.json   # só compara, sem medir
+
+Com --compare, a saída termina com código 1 se algum benchmark ficou mais
+lento que o limite de --threshold (padrão 10%).
+"""
+import os
+import sys
+import json
+import time
+import timeit
+import hashlib
+import logging
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+
+# --- Configurações ---
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.join(SCRIPTS_DIR, "..")
+SERVICES_DIR = os.path.join(ROOT_DIR, "services")
+sys.path[:0] = [SERVICES_DIR, os.path.join(SERVICES_DIR, "generator"), os.path.join(SERVICES_DIR, "mixer"),
+                os.path.join(SERVICES_DIR, "harvester"), SCRIPTS_DIR]
+os.environ.setdefault("API_AUTH_KEY", "benchmark-key")
+os.environ.setdefault("LOG_DIR", tempfile.mkdtemp(prefix="csprng-bench-"))
+os.environ.setdefault("GAMES_DIR", os.path.join(ROOT_DIR, "games"))
+
+from fake_mixer import start_fake_mixer  # noqa: E402
+
+_fake_mixer = start_fake_mixer()
+os.environ["MIXER_SERVER_URL"] = f"http://127.0.0.1:{_fake_mixer.server_address[1]}"
+
+import numpy as np  # noqa: E402
+import generator_server  # noqa: E402
+import negotiation  # noqa: E402
+import mixer_server  # noqa: E402
+from common.auth import create_hmac, verify_hmac  # noqa: E402
+from sampling import generate_unbiased_number, draw_unbiased_numbers, perform_weighted_draw, iter_packed_uints, shuffle_indices, sample_without_replacement  # noqa: E402
+from slots import EVALUATION_BATCH  # noqa: E402
+from sources.radio import Radio  # noqa: E402
+from health import SourceHealth  # noqa: E402
+
+REPEAT = 5
+REGRESSION_THRESHOLD = 0.10
+GENERATE_SIZES = [32, 1024, 64 * 1024, 1024 * 1024]
+# Larguras de range; 2^k + 1 é o pior caso da rejeição (quase metade das amostras é descartada)
+UNBIASED_WIDTHS = {"2": 2, "100": 100, "2^31+1": 2 ** 31 + 1, "2^62+1": 2 ** 62 + 1}
+WEIGHT_TOTALS = [10, 10 ** 3, 10 ** 6, 10 ** 12]
+
+
+def build_benchmarks(csprng) -> list:
+    """Retorna a lista de (nome, função, bytes por operação ou None)."""
+    benchmarks = []
+
+    for size in GENERATE_SIZES:
+        benchmarks.append((f"generate/{size}", lambda size=size: csprng.generate(size), size))
+
+    for label, width in UNBIASED_WIDTHS.items():
+        benchmarks.append((f"unbiased/scalar/{label}", lambda width=width: generate_unbiased_number(0, width - 1, csprng), None))
+    ranges = [[0, 2 ** 31]] * 100
+    benchmarks.append(("unbiased/batch100/2^31+1", lambda: draw_unbiased_numbers(ranges, csprng), None))
+
+    # 1 Mi valores compactos: intervalo completo (keystream direto) e um dado de 6 faces (rejeição vetorizada)
+    stream = generator_server.StreamCSPRNG(csprng)
+    for label, bits, low, high in (("uint32/full", 32, 0, None), ("uint16/1-6", 16, 1, 6)):
+        benchmarks.append((f"packed/{label}/1M", lambda bits=bits, low=low, high=high: b"".join(iter_packed_uints(bits, 1 << 20, low, high, stream)),
+                           (1 << 20) * bits // 8))
+
+    benchmarks.append(("shuffle/52x10000", lambda: shuffle_indices(52, 10000, csprng), None))
+    benchmarks.append(("sample/6of60x10000", lambda: sample_without_replacement(60, 6, 10000, csprng), None))
+    # Um lote completo de avaliação do slot de exemplo (o que o simulador de RTP faz em laço)
+    slot = generator_server.slot_catalog.get("classic_5x3")
+    benchmarks.append(("slots/classic_5x3/spin_wins/65536", lambda: slot.spin_wins(EVALUATION_BATCH, stream), None))
+
+    for total in WEIGHT_TOTALS:
+        # Quatro símbolos com pesos desiguais somando `total`
+        weights = [total // 2, total // 4, total // 8]
+        weights.append(total - sum(weights))
+        symbols = [{"name": f"S{i}", "weight": w} for i, w in enumerate(weights)]
+        benchmarks.append((f"weighted/100draws/total={total}", lambda symbols=symbols: perform_weighted_draw(symbols, 100, csprng), None))
+
+    hashes = [hashlib.sha256(os.urandom(32)).digest() for _ in range(64)]
+    benchmarks.append(("mixer/add_entropy", lambda: mixer_server.mix_entropy([("bench", hashes[0])]), None))
+    batch = [(f"source{i % 4}", h) for i, h in enumerate(hashes)]
+    benchmarks.append(("mixer/add_entropy_batch64", lambda: mixer_server.mix_entropy(batch), None))
+    benchmarks.append(("mixer/get_seed", mixer_server.issue_seed, None))
+
+    # Uma janela completa do buffer de captura (5 s a 44,1 kHz, só o byte baixo de cada amostra)
+    radio = Radio(backend="fake")
+    window = os.urandom(44100 * 5)
+    benchmarks.append(("radio/condition/5s", lambda: radio.condition(window), len(window)))
+    health = SourceHealth("bench", radio.min_entropy_per_byte)
+    benchmarks.append(("harvester/health/5s", lambda: health.check(window + os.urandom(1)), len(window)))
+
+    body = os.urandom(1024)
+    signature = create_hmac(body)
+    benchmarks.append(("hmac/verify/1024", lambda: verify_hmac(signature, body), None))
+
+    client = generator_server.app.test_client()
+    get_headers = {"X-RNG-Auth": create_hmac(b"")}
+
+    def post(path, payload):
+        data = json.dumps(payload).encode("utf-8")
+        headers = {"X-RNG-Auth": create_hmac(data), "Content-Type": "application/json"}
+        return lambda: client.post(path, data=data, headers=headers)
+
+    benchmarks.append(("flask/health", lambda: client.get("/api/v1/health"), None))
+    benchmarks.append(("flask/draw_numbers/10", post("/api/v1/rng/draw_numbers", {"ranges": [[1, 100]] * 10}), None))
+    benchmarks.append(("flask/draw_numbers/10000", post("/api/v1/rng/draw_numbers", {"ranges": [[1, 100]] * 10000}), None))
+    # Os mesmos 10000 ranges no layout compacto (pares int64 na requisição e na resposta)
+    packed_body = np.array([[1, 100]] * 10000, dtype="<i8").tobytes()
+    packed_headers = {"X-RNG-Auth": create_hmac(packed_body), "Content-Type": negotiation.PACKED_MIMETYPE, "Accept": negotiation.PACKED_MIMETYPE}
+    benchmarks.append(("flask/draw_numbers/10000/packed", lambda: client.post("/api/v1/rng/draw_numbers", data=packed_body, headers=packed_headers), None))
+    benchmarks.append(("flask/draw_symbols/10", post("/api/v1/games/draw_symbols", {
+        "symbols": [{"name": "A", "weight": 1}, {"name": "B", "weight": 5}, {"name": "C", "weight": 10}],
+        "num_draws": 10}), None))
+    benchmarks.append(("flask/game/slot_5x3", lambda: client.get("/api/v1/games/slot_5x3", headers=get_headers), None))
+    benchmarks.append(("flask/slots/classic_5x3/100", lambda: client.get("/api/v1/slots/classic_5x3/spin?spins=100", headers=get_headers), None))
+    return benchmarks
+
+
+def measure(func, repeat: int) -> dict:
+    """Calibra o número de iterações (>= 0.2 s por rodada) e mede `repeat` rodadas."""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    per_op = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    return {
+        "median_ns": statistics.median(per_op) * 1e9,
+        "min_ns": min(per_op) * 1e9,
+        "stdev_ns": (statistics.stdev(per_op) if len(per_op) > 1 else 0.0) * 1e9,
+        "iterations": number,
+        "repeat": repeat,
+    }
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                                capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def run(name_filter: str, repeat: int) -> dict:
+    # O console recebe um log por requisição; o arquivo de auditoria continua no caminho medido.
+    for handler in logging.getLogger().handlers:
+        if type(handler) is logging.StreamHandler:
+            handler.setLevel(logging.WARNING)
+
+    csprng = generator_server.DeterministicCSPRNG(os.urandom(64))
+    generator_server.csprng_instance = generator_server.CSPRNGPool([os.urandom(64)])
+    generator_server.game_catalog.reload()
+    generator_server.slot_catalog.reload()
+    # O acumulador precisa de entropia no pool 0 antes da primeira semente
+    mixer_server.mix_entropy([(f"source{i}", os.urandom(32)) for i in range(mixer_server.MIN_ENTROPY_SOURCES)])
+
+    results = {}
+    for name, func, bytes_per_op in build_benchmarks(csprng):
+        if name_filter and name_filter not in name:
+            continue
+        result = measure(func, repeat)
+        if bytes_per_op:
+            result["bytes_per_op"] = bytes_per_op
+            result["mb_per_s"] = bytes_per_op / result["median_ns"] * 1e3
+        results[name] = result
+        throughput = f"{result['mb_per_s']:10.1f} MB/s" if bytes_per_op else ""
+        print(f"{name:<40} {result['median_ns'] / 1e3:12.2f} us/op  ±{result['stdev_ns'] / 1e3:8.2f} {throughput}", file=sys.stderr)
+
+    csprng.close()
+    generator_server.csprng_instance.close()
+    return {"environment": environment(), "results": results}
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> bool:
+    """Imprime a variação da mediana por benchmark. Retorna True se houve regressão."""
+    regressed = False
+    print(f"{'benchmark':<40} {'base (us)':>12} {'atual (us)':>12} {'variação':>10}")
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            print(f"{name:<40} {'-':>12} {result['median_ns'] / 1e3:12.2f} {'novo':>10}")
+            continue
+        change = result["median_ns"] / base["median_ns"] - 1
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSÃO"
+            regressed = True
+        print(f"{name:<40} {base['median_ns'] / 1e3:12.2f} {result['median_ns'] / 1e3:12.2f} {change:+9.1%}{flag}")
+    return regressed
+
+
+def load(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks dos caminhos críticos do CSPRNG (saída em JSON).")
+    parser.add_argument("--output", help="Arquivo JSON de saída (padrão: stdout).")
+    parser.add_argument("--filter", default="", help="Só executa benchmarks cujo nome contém este texto.")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="Rodadas por benchmark.")
+    parser.add_argument("--compare", nargs="+", metavar="JSON",
+                        help="Compara com uma execução anterior; com dois arquivos, compara-os sem medir.")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="Aumento relativo da mediana considerado regressão (padrão 0.10).")
+    args = parser.parse_args()
+
+    if args.compare and len(args.compare) > 2:
+        parser.error("--compare aceita um ou dois arquivos.")
+
+    if args.compare and len(args.compare) == 2:
+        report = load(args.compare[1])
+    else:
+        report = run(args.filter, args.repeat)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+        elif not args.compare:
+            json.dump(report, sys.stdout, indent=2)
+            print()
+
+    if args.compare:
+        sys.exit(1 if compare(load(args.compare[0]), report, args.threshold) else 0)
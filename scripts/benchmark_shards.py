@@ -0,0 +1,63 @@
+import os
+import sys
+import time
+import tempfile
+import argparse
+import threading
+
+# --- Configurações ---
+# O benchmark roda sem Docker e sem mixer: as sementes vêm de os.urandom.
+SERVICES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "services")
+sys.path[:0] = [SERVICES_DIR, os.path.join(SERVICES_DIR, "generator")]
+os.environ.setdefault("API_AUTH_KEY", "benchmark-key")
+os.environ.setdefault("LOG_DIR", tempfile.mkdtemp(prefix="csprng-bench-"))
+
+import generator_server  # noqa: E402
+from sampling import draw_uniform_numbers  # noqa: E402
+
+DURATION_SECONDS = 2.0
+THREAD_COUNTS = [1, 2, 4, 8, 16]
+
+
+def run_requests(csprng, num_threads: int, duration: float) -> float:
+    """Executa requisições equivalentes a um slot 5x3 em várias threads e retorna req/s."""
+    counts = [0] * num_threads
+    start = threading.Barrier(num_threads + 1)
+    deadline = [0.0]
+
+    def worker(index):
+        start.wait()
+        done = 0
+        while time.perf_counter() < deadline[0]:
+            draw_uniform_numbers(0, 10, 15, csprng)
+            done += 1
+        counts[index] = done
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    deadline[0] = time.perf_counter() + duration
+    start.wait()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / duration
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara req/s do CSPRNG com um único lock vs. shards.")
+    parser.add_argument("--shards", type=int, default=os.cpu_count() or 1, help="Número de shards do pool.")
+    parser.add_argument("--duration", type=float, default=DURATION_SECONDS, help="Duração de cada medição (s).")
+    parser.add_argument("--threads", type=int, nargs="+", default=THREAD_COUNTS, help="Quantidades de threads a medir.")
+    args = parser.parse_args()
+
+    single = generator_server.DeterministicCSPRNG(os.urandom(64))
+    pool = generator_server.CSPRNGPool([os.urandom(64) for _ in range(args.shards)])
+
+    print(f"{'threads':>8} {'lock único (req/s)':>20} {f'{args.shards} shards (req/s)':>20} {'ganho':>8}")
+    for num_threads in args.threads:
+        single_rate = run_requests(single, num_threads, args.duration)
+        pool_rate = run_requests(pool, num_threads, args.duration)
+        print(f"{num_threads:>8} {single_rate:>20.0f} {pool_rate:>20.0f} {pool_rate / single_rate:>7.2f}x")
+
+    single.close()
+    pool.close()
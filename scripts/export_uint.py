@@ -0,0 +1,96 @@
+"""
+Exporta inteiros uniformes sem viés como array compacto uint8/16/32/64
+little-endian, no mesmo formato de GET /api/v1/rng/uint.
+
+Modo local (padrão): os valores são gerados neste processo com o mesmo código
+do Generator, a partir de uma semente do mixer em MIXER_SERVER_URL (ou de um
+mixer substituto com --fake-mixer, só para testes), e escritos direto no
+arquivo, lote a lote. Modo remoto (--url): baixa o stream do endpoint.
+
+Uso:
+    API_AUTH_KEY=... python scripts/export_uint.py --bits 32 --count 25000000 --output random_numbers.bin
+    API_AUTH_KEY=... python scripts/export_uint.py --bits 16 --count 1000000 --min 1 --max 6 --url http://localhost:5001
+"""
+import os
+import sys
+import time
+import tempfile
+import argparse
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVICES_DIR = os.path.join(SCRIPTS_DIR, "..", "services")
+sys.path[:0] = [SERVICES_DIR, os.path.join(SERVICES_DIR, "generator"), SCRIPTS_DIR]
+
+DOWNLOAD_CHUNK = 1024 * 1024
+
+
+def export_local(args, output) -> int:
+    if args.fake_mixer:
+        from fake_mixer import start_fake_mixer
+        mixer = start_fake_mixer()
+        os.environ["MIXER_SERVER_URL"] = f"http://127.0.0.1:{mixer.server_address[1]}"
+    os.environ.setdefault("LOG_DIR", tempfile.mkdtemp(prefix="csprng-export-"))
+
+    import generator_server
+    from sampling import iter_packed_uints
+
+    seed = generator_server.fetch_new_seed_with_retry()
+    if not seed:
+        raise RuntimeError("Não foi possível obter uma semente do mixer.")
+    csprng = generator_server.DeterministicCSPRNG(seed)
+    try:
+        written = 0
+        for chunk in iter_packed_uints(args.bits, args.count, args.min, args.max, generator_server.StreamCSPRNG(csprng)):
+            output.write(chunk)
+            written += len(chunk)
+        return written
+    finally:
+        csprng.close()
+
+
+def export_remote(args, output) -> int:
+    import requests
+    from common.auth import create_hmac
+
+    params = {"bits": args.bits, "count": args.count, "min": args.min}
+    if args.max is not None:
+        params["max"] = args.max
+    with requests.get(f"{args.url.rstrip('/')}/api/v1/rng/uint", params=params,
+                      headers={"X-RNG-Auth": create_hmac(b"")}, stream=True, timeout=30) as response:
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}: {response.text}")
+        written = 0
+        for chunk in response.iter_content(DOWNLOAD_CHUNK):
+            output.write(chunk)
+            written += len(chunk)
+        return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta inteiros uniformes como uint little-endian compacto.")
+    parser.add_argument("--bits", type=int, default=32, choices=(8, 16, 32, 64), help="Largura de cada valor.")
+    parser.add_argument("--count", type=int, required=True, help="Quantidade de valores.")
+    parser.add_argument("--min", type=int, default=0, help="Menor valor (padrão 0).")
+    parser.add_argument("--max", type=int, default=None, help="Maior valor (padrão: o máximo do tipo).")
+    parser.add_argument("--output", required=True, help="Arquivo de saída ('-' para stdout).")
+    parser.add_argument("--url", help="Baixa de um Generator em execução em vez de gerar localmente.")
+    parser.add_argument("--fake-mixer", action="store_true", help="Modo local com sementes de os.urandom (apenas testes).")
+    args = parser.parse_args()
+
+    if "API_AUTH_KEY" not in os.environ:
+        print("Erro: defina API_AUTH_KEY no ambiente.", file=sys.stderr)
+        sys.exit(2)
+
+    started = time.perf_counter()
+    output = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+    try:
+        written = export_remote(args, output) if args.url else export_local(args, output)
+    except (ValueError, RuntimeError) as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        sys.exit(2)
+    finally:
+        if output is not sys.stdout.buffer:
+            output.close()
+    elapsed = time.perf_counter() - started
+    print(f"{written} bytes ({args.count} valores de {args.bits} bits) em {elapsed:.2f}s "
+          f"({written / max(elapsed, 1e-9) / 1e6:.1f} MB/s).", file=sys.stderr)
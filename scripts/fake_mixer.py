@@ -0,0 +1,66 @@
+"""
+Mixer substituto para medições locais do Generator, sem harvesters.
+
+Serve `GET /api/v1/seed` com sementes de 64 bytes de os.urandom, verificando o
+HMAC da mesma forma que o mixer real. NÃO usar em produção.
+
+Uso: API_AUTH_KEY=... python scripts/fake_mixer.py --port 5000
+"""
+import os
+import hmac
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SEED_SIZE = 64
+
+
+class FakeMixerHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    auth_key = b""
+
+    def _reply(self, status: int, body: bytes, content_type: str = "application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/api/v1/health":
+            return self._reply(200, b'{"status": "ok", "message": "Fake mixer."}')
+        if self.path != "/api/v1/seed":
+            return self._reply(404, b'{"error": "Not found"}')
+
+        expected = hmac.new(self.auth_key, b"", hashlib.sha256).hexdigest()
+        if not hmac.compare_digest(self.headers.get("X-RNG-Auth", ""), expected):
+            return self._reply(403, b'{"error": "Invalid authentication"}')
+        self._reply(200, os.urandom(SEED_SIZE), "application/octet-stream")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fake_mixer(host: str = "127.0.0.1", port: int = 0, auth_key: str = None) -> ThreadingHTTPServer:
+    """Inicia o mixer substituto em uma thread daemon. Retorna o servidor (`server_address` tem a porta)."""
+    key = (auth_key if auth_key is not None else os.environ["API_AUTH_KEY"]).encode("utf-8")
+    handler = type("BoundFakeMixerHandler", (FakeMixerHandler,), {"auth_key": key})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-mixer", daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mixer substituto que serve sementes de os.urandom.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    args = parser.parse_args()
+
+    server = start_fake_mixer(args.host, args.port)
+    print(f"Fake mixer ouvindo em http://{args.host}:{server.server_address[1]}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
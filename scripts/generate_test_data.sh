@@ -1,29 +1,25 @@
 #!/bin/bash
 
 # Este script coleta uma grande quantidade de números aleatórios do serviço
-# generator para serem usados em testes estatísticos.
+# generator para serem usados em testes estatísticos. Os números chegam já
+# como uint32 little-endian de /api/v1/rng/uint, prontos para
+# scripts/statistical_tests.py --numbers e para o dieharder.
 
 set -e
 
-OUTPUT_FILE="random_numbers.txt"
+OUTPUT_FILE="random_numbers.bin"
 TOTAL_NUMBERS=25000000 # ~100MB de dados (25M * 4 bytes/int)
-NUMBERS_PER_REQUEST=1000
 
-echo "Iniciando a coleta de ${TOTAL_NUMBERS} números aleatórios..."
-echo "Isso pode levar vários minutos."
-
-# Limpa o arquivo de saída se ele já existir
-> "$OUTPUT_FILE"
+API_KEY=$(grep API_AUTH_KEY .env | cut -d '=' -f2)
+if [ -z "$API_KEY" ]; then
+    echo "Erro: Não foi possível encontrar API_AUTH_KEY no arquivo .env"
+    exit 1
+fi
+HMAC=$(python3 -c "import hmac, hashlib; print(hmac.new(b'$API_KEY', b'', hashlib.sha256).hexdigest())")
 
-REQUEST_COUNT=$((TOTAL_NUMBERS / NUMBERS_PER_REQUEST))
+echo "Iniciando a coleta de ${TOTAL_NUMBERS} números aleatórios..."
 
-for i in $(seq 1 $REQUEST_COUNT); do
-  # Faz a requisição e extrai os números do JSON, um por linha.
-  # Assumimos um endpoint GET /api/v1/random/integer?count=N
-  curl -s "http://localhost:5001/api/v1/random/integer?count=${NUMBERS_PER_REQUEST}" | jq '.numbers[]' >> "$OUTPUT_FILE"
-  
-  # Mostra o progresso
-  echo -ne "Progresso: $i / $REQUEST_COUNT requisições concluídas.\r"
-done
+# Uma única requisição: o servidor gera os valores em lotes e os envia conforme ficam prontos.
+curl -sf -H "X-RNG-Auth: $HMAC" "http://localhost:5001/api/v1/rng/uint?bits=32&count=${TOTAL_NUMBERS}" -o "$OUTPUT_FILE"
 
-echo -e "\nColeta concluída! Dados salvos em '${OUTPUT_FILE}'."
\ No newline at end of file
+echo "Coleta concluída! Dados salvos em '${OUTPUT_FILE}'."
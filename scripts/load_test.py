@@ -0,0 +1,296 @@
+"""
+Gerador de carga e perfil de latência para a API do Generator.
+
+Modos:
+  - fechado (padrão): `--concurrency` clientes, cada um envia a próxima
+    requisição assim que recebe a resposta anterior.
+  - aberto (`--rate R`): requisições disparadas a R req/s em horários fixos,
+    executadas por até `--concurrency` clientes. A latência é medida a partir
+    do horário agendado, então a fila formada quando o servidor não acompanha
+    a taxa entra na medição (sem "coordinated omission").
+
+A carga é uma mistura ponderada de operações (`--mix slot_5x3=6,draw_numbers=2,...`).
+As requisições são assinadas com HMAC como em `common.auth.create_hmac`.
+
+Para medir tudo em uma única máquina, `--spawn-generator` sobe o Generator
+local apontando para um mixer substituto em processo (scripts/fake_mixer.py),
+sem harvesters:
+
+    API_AUTH_KEY=chave python scripts/load_test.py --spawn-generator --rate 200 --duration 30
+    API_AUTH_KEY=chave python scripts/load_test.py --url http://127.0.0.1:5001 --concurrency 32 --output carga.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.join(SCRIPTS_DIR, "..")
+GENERATOR_DIR = os.path.join(ROOT_DIR, "services", "generator")
+sys.path[:0] = [os.path.join(ROOT_DIR, "services"), SCRIPTS_DIR]
+
+from common.auth import create_hmac  # noqa: E402
+from fake_mixer import start_fake_mixer  # noqa: E402
+
+# --- Configurações ---
+GENERATOR_URL = "http://127.0.0.1:5001"
+DEFAULT_MIX = "slot_5x3=6,draw_numbers=2,draw_symbols=1,stream=1"
+DURATION_SECONDS = 10.0
+WARMUP_SECONDS = 2.0
+CONCURRENCY = 16
+REQUEST_TIMEOUT = 30
+STREAM_BYTES = 64 * 1024
+PERCENTILES = {"p50": 50, "p95": 95, "p99": 99, "p999": 99.9}
+SPAWN_READY_TIMEOUT = 60
+
+
+def _signed_get(path: str):
+    headers = {"X-RNG-Auth": create_hmac(b"")}
+    return lambda session, base: session.get(base + path, headers=headers, timeout=REQUEST_TIMEOUT)
+
+
+def _signed_post(path: str, payload: dict):
+    data = json.dumps(payload).encode("utf-8")
+    headers = {"X-RNG-Auth": create_hmac(data), "Content-Type": "application/json"}
+    return lambda session, base: session.post(base + path, data=data, headers=headers, timeout=REQUEST_TIMEOUT)
+
+
+def _stream(session, base):
+    headers = {"X-RNG-Auth": create_hmac(b"")}
+    params = {"bytes": STREAM_BYTES, "chunk": STREAM_BYTES}
+    response = session.get(base + "/api/v1/stream_entropy", params=params, headers=headers, stream=True, timeout=REQUEST_TIMEOUT)
+    # O stream só termina quando todo o corpo foi lido.
+    for _ in response.iter_content(chunk_size=STREAM_BYTES):
+        pass
+    return response
+
+
+OPERATIONS = {
+    "slot_5x3": _signed_get("/api/v1/games/slot_5x3"),
+    "draw_numbers": _signed_post("/api/v1/rng/draw_numbers", {"ranges": [[1, 60]] * 6}),
+    "draw_symbols": _signed_post("/api/v1/games/draw_symbols", {
+        "symbols": [{"name": "Cereja", "weight": 50}, {"name": "Limão", "weight": 30},
+                    {"name": "Sino", "weight": 15}, {"name": "Sete", "weight": 5}],
+        "num_draws": 15}),
+    "shuffle": _signed_get("/api/v1/rng/shuffle?n=52&count=8"),
+    "sample": _signed_get("/api/v1/rng/sample?n=60&k=6&start=1"),
+    "stream": _stream,
+    "health": lambda session, base: session.get(base + "/api/v1/health", timeout=REQUEST_TIMEOUT),
+}
+
+
+def parse_mix(text: str) -> list:
+    """Converte 'op=peso,op=peso' em uma lista de (operação, peso)."""
+    mix = []
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Operação desconhecida: '{name}'. Opções: {', '.join(OPERATIONS)}.")
+        mix.append((name, float(weight or 1)))
+    return mix
+
+
+class Recorder:
+    """Latências e códigos de status por operação, descartando o período de aquecimento."""
+    def __init__(self, measure_from: float):
+        self.measure_from = measure_from
+        self.latencies = {}
+        self.statuses = {}
+        self.exceptions = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, started: float, finished: float, status):
+        if started < self.measure_from:
+            return
+        with self._lock:
+            if status is None:
+                self.exceptions[name] = self.exceptions.get(name, 0) + 1
+                return
+            self.latencies.setdefault(name, []).append(finished - started)
+            statuses = self.statuses.setdefault(name, {})
+            statuses[status] = statuses.get(status, 0) + 1
+
+
+def execute(name: str, session, base: str, started: float, recorder: Recorder):
+    try:
+        response = OPERATIONS[name](session, base)
+        status = response.status_code
+    except requests.exceptions.RequestException:
+        status = None
+    recorder.record(name, started, time.perf_counter(), status)
+
+
+def run_closed(base: str, mix: list, concurrency: int, duration: float, warmup: float) -> tuple:
+    """Retorna o Recorder e a duração efetiva da medição (s)."""
+    names, weights = zip(*mix)
+    start = time.perf_counter()
+    recorder = Recorder(start + warmup)
+    deadline = start + warmup + duration
+
+    def client(seed):
+        rng = random.Random(seed)
+        with requests.Session() as session:
+            while time.perf_counter() < deadline:
+                name = rng.choices(names, weights)[0]
+                execute(name, session, base, time.perf_counter(), recorder)
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder, time.perf_counter() - recorder.measure_from
+
+
+def run_open(base: str, mix: list, concurrency: int, duration: float, warmup: float, rate: float) -> tuple:
+    names, weights = zip(*mix)
+    rng = random.Random()
+    sessions = threading.local()
+
+    def task(name, scheduled):
+        if not hasattr(sessions, "session"):
+            sessions.session = requests.Session()
+        execute(name, sessions.session, base, scheduled, recorder)
+
+    start = time.perf_counter()
+    recorder = Recorder(start + warmup)
+    total = int((warmup + duration) * rate)
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for i in range(total):
+            scheduled = start + i / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(task, rng.choices(names, weights)[0], scheduled)
+    # Inclui o tempo para esvaziar a fila: a vazão reportada é a atendida, não a ofertada.
+    return recorder, time.perf_counter() - recorder.measure_from
+
+
+def histogram(latencies: np.ndarray) -> dict:
+    """Histograma em baldes de potências de 2 (limite superior em ms -> contagem)."""
+    if latencies.size == 0:
+        return {}
+    bounds = 2.0 ** np.arange(-4, 16)  # 62.5 us a 32 s
+    counts = np.bincount(np.searchsorted(bounds, latencies * 1e3), minlength=bounds.size + 1)
+    labels = [f"{b:g}" for b in bounds] + ["inf"]
+    return {label: int(count) for label, count in zip(labels, counts) if count}
+
+
+def summarize(recorder: Recorder, duration: float) -> dict:
+    report = {}
+    for name in sorted(set(recorder.latencies) | set(recorder.exceptions)):
+        latencies = np.asarray(recorder.latencies.get(name, []))
+        statuses = recorder.statuses.get(name, {})
+        exceptions = recorder.exceptions.get(name, 0)
+        total = latencies.size + exceptions
+        ok = sum(count for status, count in statuses.items() if 200 <= status < 300)
+        unavailable = statuses.get(503, 0)
+        entry = {
+            "requests": total,
+            "throughput_rps": total / duration,
+            "ok": ok,
+            "status_503": unavailable,
+            "rate_503": unavailable / total if total else 0.0,
+            "error_rate": (total - ok) / total if total else 0.0,
+            "exceptions": exceptions,
+            "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        }
+        if latencies.size:
+            for label, percentile in PERCENTILES.items():
+                entry[f"{label}_ms"] = float(np.percentile(latencies, percentile)) * 1e3
+            entry["max_ms"] = float(latencies.max()) * 1e3
+            entry["histogram_ms"] = histogram(latencies)
+        report[name] = entry
+    return report
+
+
+def print_report(report: dict):
+    print(f"{'operação':<14} {'req':>8} {'req/s':>9} {'p50':>8} {'p95':>8} {'p99':>8} {'p999':>8} {'max':>8} {'erros':>7} {'503':>7}")
+    for name, entry in report.items():
+        latency = " ".join(f"{entry.get(f'{label}_ms', float('nan')):8.2f}" for label in PERCENTILES)
+        print(f"{name:<14} {entry['requests']:>8} {entry['throughput_rps']:>9.1f} {latency} {entry.get('max_ms', float('nan')):8.2f} "
+              f"{entry['error_rate']:>7.2%} {entry['rate_503']:>7.2%}")
+    print("(latências em ms)")
+
+
+def spawn_generator(port: int, mixer_url: str, gunicorn: bool) -> subprocess.Popen:
+    """Sobe o Generator local usando o mixer substituto e espera o health check ficar pronto."""
+    env = dict(os.environ)
+    env.setdefault("LOG_DIR", tempfile.mkdtemp(prefix="csprng-load-"))
+    env.setdefault("GAMES_DIR", os.path.join(ROOT_DIR, "games"))
+    env["MIXER_SERVER_URL"] = mixer_url
+    env["PYTHONPATH"] = os.pathsep.join([os.path.join(ROOT_DIR, "services"), env.get("PYTHONPATH", "")])
+    if gunicorn:
+        env["GENERATOR_BIND"] = f"127.0.0.1:{port}"
+        command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "generator_server:app"]
+    else:
+        command = [sys.executable, "-c", f"import generator_server as g; g.start_background_tasks(); g.app.run(host='127.0.0.1', port={port}, threaded=True)"]
+    process = subprocess.Popen(command, cwd=GENERATOR_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.monotonic() + SPAWN_READY_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"O Generator terminou durante a inicialização (código {process.returncode}).")
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/api/v1/health", timeout=1).status_code == 200:
+                return process
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("O Generator não ficou pronto a tempo.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gerador de carga e perfil de latência da API do Generator.")
+    parser.add_argument("--url", default=GENERATOR_URL, help="URL base do Generator.")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Mistura ponderada de operações ({', '.join(OPERATIONS)}).")
+    parser.add_argument("--rate", type=float, help="Taxa fixa em req/s (modo aberto). Sem ela, o modo é fechado.")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="Clientes simultâneos.")
+    parser.add_argument("--duration", type=float, default=DURATION_SECONDS, help="Duração da medição (s).")
+    parser.add_argument("--warmup", type=float, default=WARMUP_SECONDS, help="Aquecimento descartado (s).")
+    parser.add_argument("--output", help="Grava o relatório em JSON neste arquivo.")
+    parser.add_argument("--spawn-generator", action="store_true", help="Sobe um Generator local com o mixer substituto.")
+    parser.add_argument("--gunicorn", action="store_true", help="Com --spawn-generator, usa o modo multiprocesso (gunicorn).")
+    parser.add_argument("--port", type=int, default=5001, help="Porta do Generator iniciado com --spawn-generator.")
+    args = parser.parse_args()
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    generator_process = None
+    base_url = args.url.rstrip("/")
+    if args.spawn_generator:
+        mixer = start_fake_mixer()
+        generator_process = spawn_generator(args.port, f"http://127.0.0.1:{mixer.server_address[1]}", args.gunicorn)
+        base_url = f"http://127.0.0.1:{args.port}"
+
+    try:
+        if args.rate:
+            recorder, duration = run_open(base_url, mix, args.concurrency, args.duration, args.warmup, args.rate)
+        else:
+            recorder, duration = run_closed(base_url, mix, args.concurrency, args.duration, args.warmup)
+    finally:
+        if generator_process is not None:
+            generator_process.terminate()
+            generator_process.wait()
+
+    report = summarize(recorder, duration)
+    print_report(report)
+    if args.output:
+        mode = {"mode": "open", "rate": args.rate} if args.rate else {"mode": "closed"}
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({**mode, "url": base_url, "mix": dict(mix), "concurrency": args.concurrency,
+                       "duration": duration, "operations": report}, f, indent=2)
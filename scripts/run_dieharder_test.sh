@@ -26,11 +26,10 @@ HMAC=$(python3 -c "import hmac, hashlib; print(hmac.new(b'$API_KEY', b'', hashli
 echo "Passo 2: Gerando ${TARGET_SIZE_MB}MB de dados binários a partir do gerador..."
 echo "Isso pode levar alguns minutos. O progresso será exibido abaixo."
 
-# Usamos 'curl' para obter o stream, 'pv' para mostrar o progresso e 'head' para limitar o tamanho exato.
-# 1. curl inicia o stream infinito.
+# Usamos 'curl' para obter o stream e 'pv' para mostrar o progresso.
+# 1. curl pede exatamente SIZE_IN_BYTES em blocos de 1 MiB; o stream termina sozinho.
 # 2. pv monitora o fluxo, esperando um total de SIZE_IN_BYTES.
-# 3. head lê exatamente SIZE_IN_BYTES e fecha o pipe, interrompendo o processo.
-curl -s -H "X-RNG-Auth: $HMAC" http://localhost:5001/api/v1/stream_entropy | pv -s $SIZE_IN_BYTES | head -c $SIZE_IN_BYTES > "$BINARY_DATA_FILE"
+curl -s -H "X-RNG-Auth: $HMAC" "http://localhost:5001/api/v1/stream_entropy?bytes=${SIZE_IN_BYTES}&chunk=1048576" | pv -s $SIZE_IN_BYTES > "$BINARY_DATA_FILE"
 
 echo -e "\nPasso 3: Executando o conjunto de testes dieharder em '${BINARY_DATA_FILE}'..."
 echo "Isso pode levar muito tempo (várias horas dependendo da máquina)."
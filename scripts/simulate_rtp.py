@@ -0,0 +1,205 @@
+"""
+Simulador offline de máquinas de slot (games/slots/*.json).
+
+Roda milhões de giros em vários processos com o mesmo código do endpoint
+/api/v1/slots/<nome>/spin (sorteio vetorizado das paradas e avaliação das
+linhas em lote) e reporta RTP, frequência de acerto e volatilidade com
+intervalos de confiança. Cada processo usa seu próprio AES-CTR
+(`StreamCSPRNG`), com chaves sorteadas de os.urandom; nenhum mixer é
+necessário. Com --exact, enumera todas as combinações de paradas e reporta os
+valores teóricos.
+
+Uso:
+    python scripts/simulate_rtp.py classic_5x3 --spins 100000000
+    python scripts/simulate_rtp.py games/slots/classic_5x3.json --exact --output rtp.json
+    python scripts/simulate_rtp.py classic_5x3 --spins 10000000 --expect-rtp 0.9591
+"""
+import os
+import sys
+import json
+import math
+import time
+import tempfile
+import argparse
+from statistics import NormalDist
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVICES_DIR = os.path.join(SCRIPTS_DIR, "..", "services")
+sys.path[:0] = [SERVICES_DIR, os.path.join(SERVICES_DIR, "generator")]
+# O servidor é importado só pelo StreamCSPRNG; a chave de API não é usada aqui.
+os.environ.setdefault("API_AUTH_KEY", "simulation-key")
+os.environ.setdefault("LOG_DIR", tempfile.mkdtemp(prefix="rtp-sim-"))
+os.environ.setdefault("GAMES_DIR", os.path.join(SCRIPTS_DIR, "..", "games"))
+
+DEFAULT_CHUNK = 1000000  # Giros (ou combinações, no modo exato) por tarefa de um processo
+EXACT_TOLERANCE = 5e-7  # No modo exato, --expect-rtp é comparado na precisão impressa (6 casas)
+
+_machine = None
+_csprng = None
+
+
+class _OsEntropy:
+    """Fonte das chaves do AES-CTR de cada processo (no lugar do pool de shards do servidor)."""
+    def generate(self, num_bytes: int) -> bytes:
+        return os.urandom(num_bytes)
+
+
+def resolve_slot(slot: str) -> str:
+    """Aceita o caminho de um arquivo ou o nome de um slot em SLOTS_DIR."""
+    if os.path.isfile(slot):
+        return slot
+    from slots import SLOTS_DIR
+    path = os.path.join(SLOTS_DIR, f"{slot}.json")
+    if not os.path.isfile(path):
+        raise ValueError(f"Slot '{slot}' não encontrado (nem como arquivo, nem em {SLOTS_DIR}).")
+    return path
+
+
+def _init_worker(path: str):
+    global _machine, _csprng
+    import generator_server
+    from slots import load_slot
+    _machine = load_slot(path)
+    _csprng = generator_server.StreamCSPRNG(_OsEntropy())
+
+
+def _histogram(wins: np.ndarray) -> dict:
+    values, counts = np.unique(wins, return_counts=True)
+    return dict(zip(values.tolist(), counts.tolist()))
+
+
+def _simulate(spins: int) -> dict:
+    """Tarefa de um processo: histograma dos prêmios de `spins` giros sorteados."""
+    return _histogram(_machine.spin_wins(spins, _csprng))
+
+
+def _enumerate(start: int, stop: int) -> dict:
+    """Tarefa de um processo: histograma dos prêmios das combinações de paradas [start, stop)."""
+    histogram = {}
+    for offset in range(start, stop, DEFAULT_CHUNK):
+        index = np.arange(offset, min(offset + DEFAULT_CHUNK, stop), dtype=np.int64)
+        stops = np.stack(np.unravel_index(index, _machine.strip_lengths), axis=1)
+        for value, count in _histogram(_machine.evaluate(stops)["wins"]).items():
+            histogram[value] = histogram.get(value, 0) + count
+    return histogram
+
+
+def summarize(histogram: dict, bet: int, confidence: float = None) -> dict:
+    """
+    RTP (prêmio médio / aposta), frequência de acerto (giros com prêmio) e
+    volatilidade (desvio padrão do prêmio / aposta). Com `confidence`, inclui
+    intervalos pela aproximação normal; o da volatilidade usa o quarto momento
+    (método delta sobre a variância amostral).
+    """
+    values = np.array(list(histogram), dtype=np.float64)
+    counts = np.array(list(histogram.values()), dtype=np.float64)
+    n = counts.sum()
+    mean = (values * counts).sum() / n
+    deviations = values - mean
+    variance = (deviations ** 2 * counts).sum() / n
+    fourth = (deviations ** 4 * counts).sum() / n
+    hits = counts[values != 0].sum() / n
+    sd = math.sqrt(variance)
+
+    summary = {
+        "spins": int(n),
+        "bet": bet,
+        "rtp": mean / bet,
+        "hit_frequency": hits,
+        "volatility": sd / bet,
+        "max_win": float(values.max()),
+    }
+    if confidence is not None:
+        z = NormalDist().inv_cdf((1 + confidence) / 2)
+        errors = {
+            "rtp": sd / math.sqrt(n) / bet,
+            "hit_frequency": math.sqrt(hits * (1 - hits) / n),
+            "volatility": math.sqrt(max(fourth - variance ** 2, 0.0) / n) / (2 * sd) / bet if sd else 0.0,
+        }
+        summary["confidence"] = confidence
+        summary["intervals"] = {key: [summary[key] - z * e, summary[key] + z * e] for key, e in errors.items()}
+    return summary
+
+
+def run(path: str, tasks: list, submit, workers: int) -> dict:
+    histogram = {}
+    done = 0
+    total = sum(size for size, _ in tasks)
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(path,)) as pool:
+        futures = {submit(pool, args): size for size, args in tasks}
+        for future in as_completed(futures):
+            for value, count in future.result().items():
+                histogram[value] = histogram.get(value, 0) + count
+            done += futures[future]
+            elapsed = time.perf_counter() - started
+            print(f"\r{done}/{total} ({done / max(elapsed, 1e-9):,.0f}/s)", end="", file=sys.stderr, flush=True)
+    print(file=sys.stderr)
+    return histogram
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simula um slot e reporta RTP, frequência de acerto e volatilidade.")
+    parser.add_argument("slot", help="Nome do slot em SLOTS_DIR ou caminho do arquivo JSON.")
+    parser.add_argument("--spins", type=int, default=10 ** 8, help="Giros simulados (padrão 10^8).")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processos (padrão: núcleos da máquina).")
+    parser.add_argument("--chunk", type=int, default=DEFAULT_CHUNK, help="Giros por tarefa.")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Nível dos intervalos de confiança (padrão 0.95).")
+    parser.add_argument("--exact", action="store_true", help="Enumera todas as combinações de paradas em vez de sortear.")
+    parser.add_argument("--expect-rtp", type=float, help="Sai com código 1 se o RTP esperado ficar fora do intervalo (ou diferir do exato).")
+    parser.add_argument("--output", help="Grava o resumo em JSON neste arquivo.")
+    args = parser.parse_args()
+
+    if args.spins <= 0 or args.chunk <= 0 or args.workers <= 0 or not 0 < args.confidence < 1:
+        parser.error("--spins, --chunk e --workers devem ser positivos e --confidence deve estar entre 0 e 1.")
+
+    try:
+        path = resolve_slot(args.slot)
+        from slots import load_slot
+        machine = load_slot(path)
+    except (OSError, ValueError) as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    started = time.perf_counter()
+    if args.exact:
+        combinations = int(np.prod(machine.strip_lengths, dtype=object))
+        tasks = [(min(args.chunk, combinations - start), (start, min(start + args.chunk, combinations)))
+                 for start in range(0, combinations, args.chunk)]
+        histogram = run(path, tasks, lambda pool, task: pool.submit(_enumerate, *task), args.workers)
+        summary = summarize(histogram, machine.bet)
+        summary["exact"] = True
+    else:
+        tasks = [(min(args.chunk, args.spins - start), (min(args.chunk, args.spins - start),))
+                 for start in range(0, args.spins, args.chunk)]
+        histogram = run(path, tasks, lambda pool, task: pool.submit(_simulate, *task), args.workers)
+        summary = summarize(histogram, machine.bet, args.confidence)
+        summary["exact"] = False
+    summary["slot"] = machine.name
+    summary["seconds"] = time.perf_counter() - started
+
+    print(f"Slot: {machine.name} ({summary['spins']:,} {'combinações' if args.exact else 'giros'}, aposta {machine.bet})")
+    for key, label in (("rtp", "RTP"), ("hit_frequency", "Frequência de acerto"), ("volatility", "Volatilidade")):
+        line = f"  {label:<21} {summary[key]:.6f}"
+        if "intervals" in summary:
+            low, high = summary["intervals"][key]
+            line += f"  IC {args.confidence:.0%}: [{low:.6f}, {high:.6f}]"
+        print(line)
+    print(f"  {'Maior prêmio':<21} {summary['max_win']:g}  ({summary['seconds']:.1f}s)")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+
+    if args.expect_rtp is not None:
+        if args.exact:
+            within = math.isclose(summary["rtp"], args.expect_rtp, abs_tol=EXACT_TOLERANCE)
+        else:
+            low, high = summary["intervals"]["rtp"]
+            within = low <= args.expect_rtp <= high
+        if not within:
+            print(f"RTP esperado {args.expect_rtp} fora do resultado.", file=sys.stderr)
+            sys.exit(1)
@@ -0,0 +1,438 @@
+"""
+Bateria estatística offline para a saída do Generator.
+
+Bits (arquivo binário, ex: raw_entropy.bin de scripts/test_generator.py):
+o arquivo é mapeado em memória e dividido em sequências de --sequence-bits
+bits (padrão 1.000.000, como no NIST STS). Cada sequência passa por um
+subconjunto vetorizado do NIST SP 800-22: frequency, block frequency, runs,
+longest run of ones, serial e approximate entropy. As sequências são
+distribuídas entre --workers processos, cada um mapeando o arquivo por conta
+própria. Como no STS, cada teste é avaliado pela proporção de sequências
+aprovadas (alfa 0.01) e pela uniformidade dos p-valores.
+
+Sorteios: --numbers (draw_numbers; texto com um inteiro por linha, ou .bin com
+uint8/16/32/64 little-endian conforme --number-bits, como os de
+/api/v1/rng/uint e scripts/export_uint.py) e --symbols (draw_symbols; texto com um símbolo por
+linha) passam por um teste qui-quadrado contra a distribuição esperada.
+
+Uso:
+    python scripts/statistical_tests.py raw_entropy.bin
+    python scripts/statistical_tests.py raw_entropy.bin --workers 8 --output relatorio.json
+    python scripts/statistical_tests.py --numbers random_numbers.bin --min 0 --max 4294967295
+    python scripts/statistical_tests.py --numbers dados.bin --number-bits 16 --min 1 --max 6
+    python scripts/statistical_tests.py --symbols simbolos.txt --weights CHERRY=10,BELL=5,SEVEN=1
+
+A saída termina com código 1 se algum teste falhar.
+"""
+import os
+import sys
+import json
+import math
+import time
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# --- Configurações ---
+ALPHA = 0.01                 # Nível de significância de cada teste
+UNIFORMITY_ALPHA = 0.0001    # Limite do p-valor da uniformidade dos p-valores
+MIN_UNIFORMITY_SEQUENCES = 55  # Abaixo disso a uniformidade não é avaliada (recomendação do STS)
+SEQUENCE_BITS = 1_000_000
+BLOCK_FREQUENCY_M = 128
+SERIAL_M = 16
+APEN_M = 10
+SEQUENCES_PER_TASK = 32      # Sequências por tarefa enviada a um processo
+TEXT_CHUNK_BYTES = 64 * 1024 * 1024
+MAX_CHI_SQUARE_BINS = 1024
+# Parâmetros do longest run of ones: (n mínimo, M, limites das classes v, probabilidades)
+LONGEST_RUN_PARAMS = [
+    (750_000, 10_000, [10, 11, 12, 13, 14, 15, 16], [0.0882, 0.2092, 0.2483, 0.1933, 0.1208, 0.0675, 0.0727]),
+    (6_272, 128, [4, 5, 6, 7, 8, 9], [0.1174, 0.2430, 0.2493, 0.1752, 0.1027, 0.1124]),
+    (128, 8, [1, 2, 3, 4], [0.2148, 0.3672, 0.2305, 0.1875]),
+]
+BIT_TESTS = ["frequency", "block_frequency", "runs", "longest_run", "serial_1", "serial_2", "approximate_entropy"]
+
+
+# --- Funções especiais ---
+
+def igamc(a: float, x: float) -> float:
+    """Função gama incompleta superior regularizada Q(a, x)."""
+    if x <= 0:
+        return 1.0
+    log_prefix = a * math.log(x) - x - math.lgamma(a)
+    if x < a + 1:
+        # Série de P(a, x)
+        term = total = 1.0 / a
+        n = a
+        for _ in range(100_000):
+            n += 1
+            term *= x / n
+            total += term
+            if term < total * 1e-15:
+                break
+        return max(0.0, 1.0 - total * math.exp(log_prefix))
+    # Fração contínua de Q(a, x) (método de Lentz)
+    tiny = 1e-300
+    b = x + 1 - a
+    c = 1 / tiny
+    d = 1 / b
+    h = d
+    for i in range(1, 100_000):
+        an = -i * (i - a)
+        b += 2
+        d = an * d + b
+        d = tiny if abs(d) < tiny else d
+        c = b + an / c
+        c = tiny if abs(c) < tiny else c
+        d = 1 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1) < 1e-15:
+            break
+    return min(1.0, math.exp(log_prefix) * h)
+
+
+# --- Testes do NIST SP 800-22 sobre uma sequência ---
+
+def _pattern_counts(data: np.ndarray, m: int) -> np.ndarray:
+    """
+    Contagem dos padrões de m bits (m <= 16) sobrepostos, com a sequência
+    estendida ciclicamente. Cada janela é lida de um valor de 24 bits formado
+    por três bytes consecutivos, então são só 8 deslocamentos sobre os bytes.
+    """
+    extended = np.concatenate((data, data[:2])).astype(np.uint32)
+    words = (extended[:-2] << 16) | (extended[1:-1] << 8) | extended[2:]
+    mask = (1 << m) - 1
+    counts = np.zeros(1 << m, dtype=np.int64)
+    for shift in range(8):
+        counts += np.bincount((words >> (24 - m - shift)) & mask, minlength=1 << m)
+    return counts
+
+
+def _collapse(counts: np.ndarray, bits: int) -> np.ndarray:
+    """Contagens dos prefixos `bits` bits mais curtos (a extensão cíclica preserva a soma)."""
+    return counts.reshape(-1, 1 << bits).sum(axis=1)
+
+
+def _longest_runs(blocks: np.ndarray) -> np.ndarray:
+    """Maior sequência de uns em cada linha de `blocks` (matriz de bits)."""
+    rows, width = blocks.shape
+    # Colunas de zeros nas bordas: nenhuma sequência atravessa blocos e as
+    # mudanças de valor alternam entre início e fim de sequência.
+    padded = np.zeros((rows, width + 2), dtype=np.uint8)
+    padded[:, 1:-1] = blocks
+    flat = padded.ravel()
+    changes = np.flatnonzero(flat[1:] != flat[:-1])
+    starts = changes[0::2]
+    lengths = np.append(changes[1::2] - starts, 0)
+    first = np.searchsorted(starts, np.arange(rows) * (width + 2))
+    longest = np.maximum.reduceat(lengths, first)
+    longest[first == np.append(first[1:], len(starts))] = 0  # Linhas sem nenhum 1
+    return longest
+
+
+def test_sequence(data: np.ndarray) -> dict:
+    """Executa os testes de bits em uma sequência (bytes) e retorna os p-valores."""
+    bits = np.unpackbits(data)
+    n = len(bits)
+    ones = int(np.count_nonzero(bits))
+    results = {}
+
+    # Frequency (monobit)
+    s_obs = abs(2 * ones - n) / math.sqrt(n)
+    results["frequency"] = math.erfc(s_obs / math.sqrt(2))
+
+    # Block frequency
+    blocks = n // BLOCK_FREQUENCY_M
+    proportions = bits[:blocks * BLOCK_FREQUENCY_M].reshape(blocks, BLOCK_FREQUENCY_M).sum(axis=1) / BLOCK_FREQUENCY_M
+    chi2 = 4 * BLOCK_FREQUENCY_M * float(np.sum((proportions - 0.5) ** 2))
+    results["block_frequency"] = igamc(blocks / 2, chi2 / 2)
+
+    # Runs (pré-requisito: a frequência precisa estar próxima de 1/2)
+    pi = ones / n
+    if abs(pi - 0.5) >= 2 / math.sqrt(n):
+        results["runs"] = 0.0
+    else:
+        v_obs = 1 + int(np.count_nonzero(bits[1:] != bits[:-1]))
+        results["runs"] = math.erfc(abs(v_obs - 2 * n * pi * (1 - pi)) / (2 * math.sqrt(2 * n) * pi * (1 - pi)))
+
+    # Longest run of ones em blocos
+    for min_n, block, classes, probabilities in LONGEST_RUN_PARAMS:
+        if n >= min_n:
+            count = n // block
+            longest = _longest_runs(bits[:count * block].reshape(count, block))
+            observed = np.bincount(np.clip(longest, classes[0], classes[-1]) - classes[0], minlength=len(classes))
+            expected = count * np.array(probabilities)
+            chi2 = float(np.sum((observed - expected) ** 2 / expected))
+            results["longest_run"] = igamc((len(classes) - 1) / 2, chi2 / 2)
+            break
+
+    # Serial e approximate entropy: todas as contagens saem da mesma passagem de 16 bits
+    counts = _pattern_counts(data, SERIAL_M)
+
+    def psi2(c, m):
+        return (1 << m) / n * float(np.sum(c.astype(np.float64) ** 2)) - n
+
+    psi_m = psi2(counts, SERIAL_M)
+    psi_m1 = psi2(_collapse(counts, 1), SERIAL_M - 1)
+    psi_m2 = psi2(_collapse(counts, 2), SERIAL_M - 2)
+    results["serial_1"] = igamc(2 ** (SERIAL_M - 2), (psi_m - psi_m1) / 2)
+    results["serial_2"] = igamc(2 ** (SERIAL_M - 3), (psi_m - 2 * psi_m1 + psi_m2) / 2)
+
+    def phi(c):
+        c = c[c > 0] / n
+        return float(np.sum(c * np.log(c)))
+
+    apen = phi(_collapse(counts, SERIAL_M - APEN_M)) - phi(_collapse(counts, SERIAL_M - APEN_M - 1))
+    results["approximate_entropy"] = igamc(2 ** (APEN_M - 1), n * (math.log(2) - apen))
+    return results
+
+
+def _run_sequences(path: str, offset: int, sequence_bytes: int, count: int) -> dict:
+    """Tarefa de um processo: testa `count` sequências a partir de `offset`."""
+    data = np.memmap(path, dtype=np.uint8, mode="r", offset=offset, shape=(sequence_bytes * count,))
+    p_values = {name: [] for name in BIT_TESTS}
+    for i in range(count):
+        for name, value in test_sequence(np.asarray(data[i * sequence_bytes:(i + 1) * sequence_bytes])).items():
+            p_values[name].append(value)
+    return p_values
+
+
+def _parallel(func, tasks: list, workers: int):
+    """Executa `func(*task)` para cada tarefa, em `workers` processos (ou no atual, se 1)."""
+    if workers <= 1:
+        for task in tasks:
+            yield func(*task)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(func, *zip(*tasks))
+
+
+def evaluate_p_values(p_values: list) -> dict:
+    """Proporção de aprovação e uniformidade dos p-valores de um teste (critérios do STS)."""
+    values = np.asarray(p_values)
+    k = len(values)
+    proportion = float(np.mean(values >= ALPHA))
+    expected = 1 - ALPHA
+    minimum = expected - 3 * math.sqrt(expected * ALPHA / k)
+    histogram, _ = np.histogram(values, bins=10, range=(0.0, 1.0))
+    chi2 = float(np.sum((histogram - k / 10) ** 2 / (k / 10)))
+    uniformity = igamc(4.5, chi2 / 2)
+    passed = proportion >= minimum and (k < MIN_UNIFORMITY_SEQUENCES or uniformity >= UNIFORMITY_ALPHA)
+    return {
+        "sequences": k,
+        "proportion": proportion,
+        "min_proportion": minimum,
+        "uniformity_p_value": uniformity if k >= MIN_UNIFORMITY_SEQUENCES else None,
+        "passed": passed,
+    }
+
+
+def run_bit_tests(path: str, sequence_bits: int, workers: int) -> dict:
+    if sequence_bits % 8 or sequence_bits < 1024:
+        raise ValueError("--sequence-bits deve ser múltiplo de 8 e pelo menos 1024.")
+    sequence_bytes = sequence_bits // 8
+    size = os.path.getsize(path)
+    sequences = size // sequence_bytes
+    if sequences == 0:
+        raise ValueError(f"'{path}' tem {size} bytes; são necessários pelo menos {sequence_bytes} por sequência.")
+
+    tasks = []
+    for first in range(0, sequences, SEQUENCES_PER_TASK):
+        count = min(SEQUENCES_PER_TASK, sequences - first)
+        tasks.append((path, first * sequence_bytes, sequence_bytes, count))
+
+    p_values = {name: [] for name in BIT_TESTS}
+    for partial in _parallel(_run_sequences, tasks, workers):
+        for name, values in partial.items():
+            p_values[name].extend(values)
+
+    return {
+        "file": path,
+        "bytes_tested": sequences * sequence_bytes,
+        "bytes_ignored": size - sequences * sequence_bytes,
+        "sequence_bits": sequence_bits,
+        "tests": {name: evaluate_p_values(values) for name, values in p_values.items()},
+    }
+
+
+# --- Qui-quadrado dos sorteios ---
+
+def _text_ranges(path: str, chunk_bytes: int) -> list:
+    """Divide um arquivo de texto em intervalos de bytes que terminam em fim de linha."""
+    size = os.path.getsize(path)
+    ranges = []
+    start = 0
+    with open(path, "rb") as f:
+        while start < size:
+            end = min(size, start + chunk_bytes)
+            if end < size:
+                f.seek(end)
+                end += len(f.readline())
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def _read_range(path: str, start: int, end: int) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(start)
+        return f.read(end - start)
+
+
+def _bin_edges(low: int, high: int, bins: int) -> list:
+    """Primeiro valor de cada bin (mais o fim) para dividir [low, high] em `bins` bins quase iguais."""
+    width = high - low + 1
+    return [low + -(-i * width // bins) for i in range(bins + 1)]
+
+
+def _count_numbers(path: str, start: int, end: int, low: int, high: int, bins: int, itemsize: int) -> tuple:
+    """Tarefa de um processo: contagens por bin dos números em um intervalo do arquivo (itemsize 0: texto)."""
+    if itemsize:
+        values = np.memmap(path, dtype=f"<u{itemsize}", mode="r", offset=start, shape=((end - start) // itemsize,))
+        if itemsize < 8:
+            values = values.astype(np.int64)
+    else:
+        values = np.array(_read_range(path, start, end).split(), dtype=np.int64)
+    in_range = (values >= low) & (values <= high)
+    values = values[in_range] - low
+    width = high - low + 1
+    if width * bins < 2 ** 63:
+        indexes = values * bins // width
+    else:
+        indexes = np.minimum((values / float(width) * bins).astype(np.int64), bins - 1)
+    return np.bincount(indexes, minlength=bins), int(len(in_range) - np.count_nonzero(in_range))
+
+
+def _chi_square(observed: np.ndarray, probabilities: np.ndarray, invalid: int) -> dict:
+    total = int(observed.sum())
+    expected = total * probabilities
+    chi2 = float(np.sum((observed - expected) ** 2 / expected)) if total else 0.0
+    p_value = igamc((len(observed) - 1) / 2, chi2 / 2) if total else 0.0
+    return {
+        "samples": total,
+        "invalid": invalid,
+        "bins": len(observed),
+        "min_expected": float(expected.min()) if total else 0.0,
+        "chi_square": chi2,
+        "p_value": p_value,
+        "passed": total > 0 and invalid == 0 and p_value >= ALPHA,
+    }
+
+
+def run_numbers_test(path: str, low: int, high: int, workers: int, number_bits: int = 32) -> dict:
+    if high < low:
+        raise ValueError("--max deve ser maior ou igual a --min.")
+    binary = path.endswith(".bin")
+    itemsize = number_bits // 8 if binary else 0
+    if binary and not 0 <= low <= high < 2 ** number_bits:
+        raise ValueError(f"Em .bin de {number_bits} bits, --min e --max devem estar entre 0 e {2 ** number_bits - 1}.")
+    bins = min(high - low + 1, MAX_CHI_SQUARE_BINS)
+    if binary:
+        size = os.path.getsize(path) // itemsize * itemsize
+        step = TEXT_CHUNK_BYTES // itemsize * itemsize
+        ranges = [(start, min(size, start + step)) for start in range(0, size, step)]
+    else:
+        ranges = _text_ranges(path, TEXT_CHUNK_BYTES)
+    observed = np.zeros(bins, dtype=np.int64)
+    invalid = 0
+    for counts, out_of_range in _parallel(_count_numbers, [(path, s, e, low, high, bins, itemsize) for s, e in ranges], workers):
+        observed += counts
+        invalid += out_of_range
+    edges = _bin_edges(low, high, bins)
+    probabilities = np.array([(edges[i + 1] - edges[i]) / (high - low + 1) for i in range(bins)])
+    report = _chi_square(observed, probabilities, invalid)
+    report.update({"file": path, "min": low, "max": high})
+    return report
+
+
+def _count_symbols(path: str, start: int, end: int) -> Counter:
+    return Counter(_read_range(path, start, end).decode("utf-8").split())
+
+
+def run_symbols_test(path: str, weights: dict, workers: int) -> dict:
+    counts = Counter()
+    for partial in _parallel(_count_symbols, [(path, s, e) for s, e in _text_ranges(path, TEXT_CHUNK_BYTES)], workers):
+        counts.update(partial)
+    names = sorted(weights)
+    total_weight = sum(weights.values())
+    observed = np.array([counts.get(name, 0) for name in names], dtype=np.int64)
+    invalid = sum(count for name, count in counts.items() if name not in weights)
+    report = _chi_square(observed, np.array([weights[name] / total_weight for name in names]), invalid)
+    report.update({"file": path, "observed": dict(zip(names, observed.tolist()))})
+    return report
+
+
+def parse_weights(text: str) -> dict:
+    weights = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        if not name.strip() or not weight.strip().isdigit() or int(weight) <= 0:
+            raise ValueError(f"Peso inválido: '{item}'. Use NOME=peso_inteiro, separados por vírgula.")
+        weights[name.strip()] = int(weight)
+    return weights
+
+
+def print_report(report: dict):
+    if "bits" in report:
+        bits = report["bits"]
+        print(f"\nBits: {bits['file']} ({bits['bytes_tested']} bytes, {bits['tests']['frequency']['sequences']} sequências de {bits['sequence_bits']} bits)")
+        print(f"{'teste':<22} {'proporção':>10} {'mínimo':>8} {'uniformidade':>13}  resultado")
+        for name, result in bits["tests"].items():
+            uniformity = f"{result['uniformity_p_value']:.6f}" if result["uniformity_p_value"] is not None else "-"
+            print(f"{name:<22} {result['proportion']:10.4f} {result['min_proportion']:8.4f} {uniformity:>13}  {'OK' if result['passed'] else 'FALHOU'}")
+    for key, label in (("numbers", "draw_numbers"), ("symbols", "draw_symbols")):
+        if key in report:
+            result = report[key]
+            print(f"\nQui-quadrado ({label}): {result['file']}")
+            print(f"  amostras={result['samples']} bins={result['bins']} inválidas={result['invalid']} "
+                  f"esperado mínimo={result['min_expected']:.1f} chi2={result['chi_square']:.2f} "
+                  f"p={result['p_value']:.6f}  {'OK' if result['passed'] else 'FALHOU'}")
+    print(f"\nResultado geral: {'APROVADO' if report['passed'] else 'REPROVADO'} ({report['elapsed_seconds']:.1f} s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Subconjunto vetorizado do NIST STS e qui-quadrado dos sorteios.")
+    parser.add_argument("bits", nargs="?", help="Arquivo binário com a saída bruta do gerador.")
+    parser.add_argument("--sequence-bits", type=int, default=SEQUENCE_BITS, help="Bits por sequência (padrão 1000000).")
+    parser.add_argument("--numbers", help="Saída de draw_numbers: um inteiro por linha, ou .bin com uints little-endian.")
+    parser.add_argument("--number-bits", type=int, default=32, choices=(8, 16, 32, 64), help="Largura dos valores em --numbers .bin (padrão 32).")
+    parser.add_argument("--min", type=int, help="Menor valor possível em --numbers.")
+    parser.add_argument("--max", type=int, help="Maior valor possível em --numbers.")
+    parser.add_argument("--symbols", help="Saída de draw_symbols: um símbolo por linha.")
+    parser.add_argument("--weights", help="Pesos esperados em --symbols (ex: A=1,B=5,C=10).")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processos usados (padrão: número de CPUs).")
+    parser.add_argument("--output", help="Grava o relatório em JSON.")
+    args = parser.parse_args()
+
+    if not (args.bits or args.numbers or args.symbols):
+        parser.error("informe um arquivo de bits, --numbers ou --symbols.")
+    if args.numbers and (args.min is None or args.max is None):
+        parser.error("--numbers exige --min e --max.")
+    if args.symbols and not args.weights:
+        parser.error("--symbols exige --weights.")
+
+    started = time.perf_counter()
+    report = {}
+    try:
+        if args.bits:
+            report["bits"] = run_bit_tests(args.bits, args.sequence_bits, args.workers)
+        if args.numbers:
+            report["numbers"] = run_numbers_test(args.numbers, args.min, args.max, args.workers, args.number_bits)
+        if args.symbols:
+            report["symbols"] = run_symbols_test(args.symbols, parse_weights(args.weights), args.workers)
+    except (OSError, ValueError) as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    results = list(report.get("bits", {}).get("tests", {}).values())
+    results += [report[key] for key in ("numbers", "symbols") if key in report]
+    report["passed"] = all(result["passed"] for result in results)
+    report["elapsed_seconds"] = time.perf_counter() - started
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    sys.exit(0 if report["passed"] else 1)
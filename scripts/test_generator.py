@@ -1,6 +1,8 @@
 import requests
 import time
 import os
+import hmac
+import hashlib
 from datetime import datetime
 
 # --- Configurações ---
@@ -8,6 +10,8 @@ GENERATOR_URL = "http://127.0.0.1:5001/api/v1/stream_entropy"
 OUTPUT_FILE = "raw_entropy.bin"
 TARGET_SIZE_MB = 1
 TARGET_SIZE_BYTES = TARGET_SIZE_MB * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024  # Tamanho dos blocos pedidos ao servidor e lidos do stream
+API_AUTH_KEY = os.getenv("API_AUTH_KEY", "")
 
 if __name__ == "__main__":
     print(f"[{datetime.now()}] Aguardando 10 segundos para que o mixer colete entropia...")
@@ -22,11 +26,14 @@ if __name__ == "__main__":
     total_bytes_collected = 0
 
     try:
-        response = requests.get(GENERATOR_URL, stream=True, timeout=30)
+        # O stream é limitado pelo servidor a TARGET_SIZE_BYTES e termina sozinho.
+        headers = {'X-RNG-Auth': hmac.new(API_AUTH_KEY.encode('utf-8'), b'', hashlib.sha256).hexdigest()}
+        params = {'bytes': TARGET_SIZE_BYTES, 'chunk': CHUNK_SIZE}
+        response = requests.get(GENERATOR_URL, params=params, headers=headers, stream=True, timeout=30)
         response.raise_for_status()
         
         with open(OUTPUT_FILE, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=1024):
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
                 if chunk:
                     f.write(chunk)
                     total_bytes_collected += len(chunk)
@@ -0,0 +1,122 @@
+"""
+Verifica sorteios auditados recalculando-os a partir do keystream registrado.
+
+Cada registro de sorteio no log de auditoria traz o tipo (`draw`), os
+parâmetros, o resultado e os trechos de keystream consumidos (`keystream`:
+compromisso da semente, época, offset e tamanho). A verificação gera só esses
+trechos, com o contador do AES-CTR posicionado no offset, e repete o sorteio,
+então cada registro leva milissegundos, não importa quanto foi gerado antes.
+
+Modo local (padrão): usa as sementes das épocas encerradas em --escrow-dir
+(SEED_ESCROW_DIR do Generator) e as definições de jogos e slots de GAMES_DIR.
+Modo remoto (--url): envia cada registro para POST /api/v1/audit/verify; o
+Generator só aceita registros que constam no seu log de auditoria.
+
+Os registros são lidos em NDJSON (saída de /api/v1/audit/query ou o próprio
+audit.log); linhas que não são sorteios com keystream são ignoradas.
+
+Uso:
+    python scripts/verify_draw.py audit.log --escrow-dir /app/seeds
+    python scripts/verify_draw.py registros.ndjson --url http://localhost:5001
+"""
+import os
+import sys
+import json
+import tempfile
+import argparse
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVICES_DIR = os.path.join(SCRIPTS_DIR, "..", "services")
+sys.path[:0] = [SERVICES_DIR, os.path.join(SERVICES_DIR, "generator")]
+
+
+def read_records(paths: list):
+    for path in paths:
+        stream = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+        try:
+            for line in stream:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(record, dict) and record.get("draw") and record.get("keystream"):
+                    yield record
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+
+def local_verifier(escrow_dir: str):
+    # O servidor é importado só pelos catálogos e pela reexecução dos sorteios; a chave de API não é usada.
+    os.environ.setdefault("API_AUTH_KEY", "verification-key")
+    os.environ.setdefault("LOG_DIR", tempfile.mkdtemp(prefix="csprng-verify-"))
+    os.environ.setdefault("GAMES_DIR", os.path.join(SCRIPTS_DIR, "..", "games"))
+    import generator_server
+    import replay
+
+    generator_server.game_catalog.reload()
+    generator_server.slot_catalog.reload()
+    escrow = replay.SeedEscrow(escrow_dir)
+    return lambda record: generator_server.verify_audit_record(record, escrow.load)
+
+
+def remote_verifier(url: str):
+    import requests
+    from common.auth import create_hmac
+
+    def verify(record):
+        body = json.dumps(record).encode("utf-8")
+        response = requests.post(f"{url.rstrip('/')}/api/v1/audit/verify", data=body, timeout=30,
+                                 headers={"X-RNG-Auth": create_hmac(body), "Content-Type": "application/json"})
+        data = response.json()
+        if response.status_code == 404:
+            raise LookupError(data.get("message"))
+        if response.status_code != 200:
+            raise ValueError(data.get("message") or data.get("error") or f"HTTP {response.status_code}")
+        return data
+    return verify
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verifica sorteios auditados a partir do keystream registrado.")
+    parser.add_argument("records", nargs="+", help="Arquivos NDJSON de registros de auditoria ('-' para stdin).")
+    parser.add_argument("--escrow-dir", default=os.getenv("SEED_ESCROW_DIR"), help="Custódia de sementes (padrão: SEED_ESCROW_DIR).")
+    parser.add_argument("--url", help="Verifica pelo endpoint de um Generator em execução.")
+    parser.add_argument("--quiet", action="store_true", help="Mostra só os registros que não conferem.")
+    args = parser.parse_args()
+
+    if args.url:
+        if "API_AUTH_KEY" not in os.environ:
+            print("Erro: defina API_AUTH_KEY no ambiente.", file=sys.stderr)
+            sys.exit(2)
+        verify = remote_verifier(args.url)
+    elif not args.escrow_dir:
+        print("Erro: informe --escrow-dir (ou SEED_ESCROW_DIR) ou --url.", file=sys.stderr)
+        sys.exit(2)
+    else:
+        verify = local_verifier(args.escrow_dir)
+
+    totals = {"ok": 0, "mismatch": 0, "unavailable": 0}
+    for record in read_records(args.records):
+        label = f"{record.get('asctime', '-')} {record['draw']:<8} {record.get('endpoint', '')}"
+        try:
+            outcome = verify(record)
+        except (LookupError, ValueError) as e:
+            totals["unavailable"] += 1
+            print(f"{label}  NÃO VERIFICADO: {e}")
+            continue
+        if outcome["verified"]:
+            totals["ok"] += 1
+            if not args.quiet:
+                # O endpoint devolve só `verified` e `reason`; as medidas existem só no modo local.
+                details = f" ({outcome['keystream_bytes']} bytes, {outcome['elapsed_ms']:.2f} ms)" if "elapsed_ms" in outcome else ""
+                print(f"{label}  OK{details}")
+        else:
+            totals["mismatch"] += 1
+            print(f"{label}  NÃO CONFERE: {outcome['reason']}")
+
+    print(f"{totals['ok']} conferem, {totals['mismatch']} não conferem, {totals['unavailable']} não verificados.", file=sys.stderr)
+    if totals["mismatch"]:
+        sys.exit(1)
+    if totals["unavailable"] or not totals["ok"]:
+        sys.exit(2)
@@ -0,0 +1,203 @@
+"""
+Índice esparso sobre os arquivos de auditoria (audit.log e seus backups rotacionados).
+
+Cada segmento é dividido em blocos de ~AUDIT_INDEX_BLOCK_SIZE bytes de linhas
+completas. Para cada bloco o índice guarda o intervalo de bytes, o menor e o
+maior timestamp e os conjuntos de `event`, `endpoint` e `ip` presentes. Uma
+consulta só lê (com seek) os blocos que podem conter registros compatíveis.
+
+Os segmentos são identificados pelo inode, então o índice continua válido
+quando a rotação renomeia audit.log para audit.log.1, e assim por diante.
+A indexação é incremental: só os bytes acrescentados desde a última consulta
+são lidos.
+"""
+import os
+import glob
+import json
+import threading
+from datetime import datetime
+
+AUDIT_INDEX_BLOCK_SIZE = 64 * 1024
+AUDIT_INDEX_READ_SIZE = 1024 * 1024
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"  # Formato de `asctime` do formatter JSON (mais ",mmm")
+
+
+def parse_audit_time(value: str):
+    """
+    Converte um horário ISO-8601 no formato de `asctime` dos registros, que é
+    comparável como texto. Horários com fuso são convertidos para o fuso local
+    do servidor, o mesmo usado em `asctime`. Levanta ValueError se inválido.
+    """
+    if value is None:
+        return None
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone().replace(tzinfo=None)
+    return moment.strftime(TIMESTAMP_FORMAT) + ",%03d" % (moment.microsecond // 1000)
+
+
+def _record_endpoint(record: dict):
+    # Falhas de autenticação registram o caminho em 'path' em vez de 'endpoint'.
+    return record.get('endpoint') or record.get('path')
+
+
+class _Block:
+    __slots__ = ('start', 'end', 'min_ts', 'max_ts', 'events', 'endpoints', 'ips')
+
+    def __init__(self, start: int):
+        self.start = start
+        self.end = start
+        self.min_ts = None
+        self.max_ts = None
+        self.events = set()
+        self.endpoints = set()
+        self.ips = set()
+
+    def add(self, line: bytes):
+        self.end += len(line)
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return
+        if not isinstance(record, dict):
+            return
+        timestamp = record.get('asctime')
+        if isinstance(timestamp, str):
+            if self.min_ts is None or timestamp < self.min_ts:
+                self.min_ts = timestamp
+            if self.max_ts is None or timestamp > self.max_ts:
+                self.max_ts = timestamp
+        self.events.add(record.get('event'))
+        self.endpoints.add(_record_endpoint(record))
+        self.ips.add(record.get('ip'))
+
+    def may_match(self, start, end, event, endpoint, ip) -> bool:
+        if self.min_ts is None:
+            return False
+        if (start is not None and self.max_ts < start) or (end is not None and self.min_ts > end):
+            return False
+        if event is not None and event not in self.events:
+            return False
+        if endpoint is not None and endpoint not in self.endpoints:
+            return False
+        if ip is not None and ip not in self.ips:
+            return False
+        return True
+
+
+class _Segment:
+    """Índice de um arquivo de auditoria (um inode)."""
+    def __init__(self):
+        self.size = 0
+        self.blocks = []
+
+    def extend(self, f, size: int):
+        """Indexa as linhas completas entre o fim já indexado e `size`."""
+        if size < self.size:
+            # Arquivo truncado ou inode reutilizado: reconstrói o índice.
+            self.size = 0
+            self.blocks = []
+        offset = self.size
+        f.seek(offset)
+        carry = b''
+        while offset + len(carry) < size:
+            data = f.read(min(AUDIT_INDEX_READ_SIZE, size - offset - len(carry)))
+            if not data:
+                break
+            data = carry + data
+            complete = data.rfind(b'\n') + 1
+            carry = data[complete:]
+            for line in data[:complete].splitlines(keepends=True):
+                if not self.blocks or self.blocks[-1].end - self.blocks[-1].start >= AUDIT_INDEX_BLOCK_SIZE:
+                    self.blocks.append(_Block(offset))
+                self.blocks[-1].add(line)
+                offset += len(line)
+        # Uma linha incompleta no fim (escrita em andamento) fica para a próxima vez.
+        self.size = offset
+
+
+class AuditLogIndex:
+    """Índice incremental e consultas filtradas sobre `log_path` e seus backups rotacionados."""
+    def __init__(self, log_path: str):
+        self.log_path = log_path
+        self._segments = {}
+        self._lock = threading.Lock()
+
+    def segment_paths(self) -> list:
+        """Caminhos dos segmentos do mais antigo (maior sufixo) ao atual."""
+        backups = []
+        for path in glob.glob(glob.escape(self.log_path) + ".*"):
+            suffix = path[len(self.log_path) + 1:]
+            if suffix.isdigit():
+                backups.append((int(suffix), path))
+        return [path for _, path in sorted(backups, reverse=True)] + [self.log_path]
+
+    def _ranges(self, f, filters: tuple) -> list:
+        """Atualiza o índice do arquivo aberto e retorna os intervalos de bytes a ler."""
+        stat = os.fstat(f.fileno())
+        with self._lock:
+            segment = self._segments.setdefault((stat.st_dev, stat.st_ino), _Segment())
+            segment.extend(f, stat.st_size)
+            ranges = []
+            for block in segment.blocks:
+                if not block.may_match(*filters):
+                    continue
+                if ranges and ranges[-1][1] == block.start:
+                    ranges[-1][1] = block.end
+                else:
+                    ranges.append([block.start, block.end])
+            return ranges
+
+    def _prune(self, paths: list):
+        """Descarta o índice de segmentos que já saíram da rotação."""
+        alive = set()
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            alive.add((stat.st_dev, stat.st_ino))
+        with self._lock:
+            for key in set(self._segments) - alive:
+                del self._segments[key]
+
+    def query(self, start=None, end=None, event=None, endpoint=None, ip=None, limit=None):
+        """
+        Gera as linhas JSON (bytes, terminadas em '\\n') dos registros que
+        atendem a todos os filtros, em ordem de arquivo, do segmento mais
+        antigo ao atual. `start`/`end` estão no formato de `parse_audit_time`.
+        """
+        filters = (start, end, event, endpoint, ip)
+        paths = self.segment_paths()
+        self._prune(paths)
+        matched = 0
+        for path in paths:
+            try:
+                f = open(path, 'rb')
+            except FileNotFoundError:
+                continue
+            with f:
+                for range_start, range_end in self._ranges(f, filters):
+                    f.seek(range_start)
+                    for line in f.read(range_end - range_start).splitlines():
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            continue
+                        if not isinstance(record, dict):
+                            continue
+                        timestamp = record.get('asctime') or ''
+                        if start is not None and timestamp < start:
+                            continue
+                        if end is not None and timestamp > end:
+                            continue
+                        if event is not None and record.get('event') != event:
+                            continue
+                        if endpoint is not None and _record_endpoint(record) != endpoint:
+                            continue
+                        if ip is not None and record.get('ip') != ip:
+                            continue
+                        yield line + b'\n'
+                        matched += 1
+                        if limit is not None and matched >= limit:
+                            return
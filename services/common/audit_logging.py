@@ -0,0 +1,175 @@
+import os
+import fcntl
+import queue
+import logging
+import threading
+import logging.handlers
+
+
+class AsyncAuditHandler(logging.handlers.RotatingFileHandler):
+    """
+    Handler de auditoria assíncrono: a thread da requisição apenas enfileira o
+    registro; uma thread dedicada formata (JSON) e grava os registros em lotes
+    no arquivo rotativo, com um único flush por lote.
+
+    A fila é limitada. Quando está cheia, `full_policy` decide: 'block' espera
+    por espaço (padrão) e 'drop' descarta o registro e o contabiliza. Descartes
+    nunca são silenciosos: a contagem é gravada no próprio log de auditoria
+    assim que houver espaço. `flush()` espera a fila esvaziar e `close()` (chamado
+    por logging.shutdown na saída do processo) grava tudo o que estiver pendente.
+    Registros emitidos depois de `close()` (ex: no encerramento do worker) são
+    gravados de forma síncrona, na thread que os emite.
+
+    No modo multiprocesso (gunicorn), todos os workers gravam no mesmo arquivo.
+    Cada lote é gravado com um lock exclusivo (flock) em `<arquivo>.lock`:
+    antes de gravar, o worker reabre o arquivo se outro worker já o rotacionou,
+    e a rotação só acontece com o lock, a partir do tamanho real do arquivo.
+    Assim nenhum worker grava em um arquivo já renomeado e rotações
+    concorrentes não descartam backups.
+    """
+    _STOP = object()
+
+    def __init__(self, filename: str, maxBytes: int = 0, backupCount: int = 0,
+                 queue_size: int = 10000, full_policy: str = 'block', batch_size: int = 256):
+        if full_policy not in ('block', 'drop'):
+            raise ValueError("full_policy deve ser 'block' ou 'drop'.")
+        super().__init__(filename, maxBytes=maxBytes, backupCount=backupCount, encoding='utf-8')
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._full_policy = full_policy
+        self._batch_size = batch_size
+        self._dropped = 0
+        self._dropped_lock = threading.Lock()
+        self._closed = False
+        self._lock_fd = os.open(self.baseFilename + '.lock', os.O_RDWR | os.O_CREAT, 0o644)
+        self._writer = threading.Thread(target=self._write_loop, name="audit-log-writer", daemon=True)
+        self._writer.start()
+
+    def emit(self, record: logging.LogRecord):
+        # Chamado com self.lock adquirido (Handler.handle).
+        if self._closed:
+            self._write_sync(record)
+            return
+        # Resolve a mensagem agora; a serialização JSON fica para a thread de escrita.
+        record.msg = record.getMessage()
+        record.args = None
+        if self._full_policy == 'block':
+            self._queue.put(record)
+            return
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self._dropped += 1
+
+    @property
+    def dropped(self) -> int:
+        """Total de registros descartados por fila cheia (política 'drop')."""
+        with self._dropped_lock:
+            return self._dropped
+
+    def _drop_report(self, reported: int):
+        """Cria um registro com a quantidade de descartes ainda não reportada."""
+        with self._dropped_lock:
+            pending = self._dropped - reported
+        if pending <= 0:
+            return None, reported
+        record = logging.LogRecord("audit", logging.WARNING, __file__, 0,
+                                   f"{pending} audit records dropped: audit queue full.", None, None)
+        record.event = 'audit_records_dropped'
+        record.dropped = pending
+        return record, reported + pending
+
+    def _reopen_if_rotated(self):
+        """Reabre o arquivo se o caminho não aponta mais para o arquivo aberto (rotacionado por outro worker)."""
+        try:
+            current = os.stat(self.baseFilename)
+        except FileNotFoundError:
+            current = None
+        opened = os.fstat(self.stream.fileno())
+        if current is None or (current.st_dev, current.st_ino) != (opened.st_dev, opened.st_ino):
+            self.stream.close()
+            self.stream = self._open()
+
+    def _write(self, records: list):
+        # Só a thread de escrita usa o arquivo. Não usa self.lock: ele fica retido
+        # pelos emissores e por logging.shutdown enquanto esperam a fila.
+        lines = []
+        for record in records:
+            try:
+                lines.append((record, self.format(record) + self.terminator))
+            except Exception:
+                self.handleError(record)
+        if not lines:
+            return
+        fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+        try:
+            self._reopen_if_rotated()
+            # O tamanho vem do arquivo, não de tell(): outros workers também gravam nele.
+            size = os.fstat(self.stream.fileno()).st_size
+            for record, line in lines:
+                try:
+                    length = len(line.encode('utf-8'))
+                    if self.maxBytes > 0 and size > 0 and size + length >= self.maxBytes:
+                        self.stream.flush()
+                        self.doRollover()
+                        size = 0
+                    self.stream.write(line)
+                    size += length
+                except Exception:
+                    self.handleError(record)
+            self.stream.flush()
+        except Exception:
+            self.handleError(lines[-1][0])
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _write_sync(self, record: logging.LogRecord):
+        """Grava um registro depois do encerramento da thread de escrita, reabrindo o arquivo se preciso."""
+        if self._lock_fd is None:
+            self._lock_fd = os.open(self.baseFilename + '.lock', os.O_RDWR | os.O_CREAT, 0o644)
+        if self.stream is None:
+            self.stream = self._open()
+        self._write([record])
+
+    def _write_loop(self):
+        reported = 0
+        stopping = False
+        while not stopping:
+            items = [self._queue.get()]
+            while len(items) < self._batch_size:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            records = []
+            for item in items:
+                if item is self._STOP:
+                    stopping = True
+                else:
+                    records.append(item)
+            report, reported = self._drop_report(reported)
+            if report is not None:
+                records.append(report)
+
+            self._write(records)
+            for _ in items:
+                self._queue.task_done()
+
+    def flush(self):
+        """Espera até que todos os registros enfileirados tenham sido gravados."""
+        if not self._closed:
+            self._queue.join()
+
+    def close(self):
+        # Com self.lock, nenhum emissor enfileira depois do _STOP: os que chegarem
+        # depois já veem o handler fechado e gravam de forma síncrona.
+        with self.lock:
+            if not self._closed:
+                self._closed = True
+                self._queue.put(self._STOP)
+                self._writer.join()
+            if self._lock_fd is not None:
+                os.close(self._lock_fd)
+                self._lock_fd = None
+            super().close()
@@ -18,3 +18,11 @@ def verify_hmac(received_hmac: str, data: bytes) -> bool:
     """Verifica um HMAC recebido contra um calculado."""
     expected_hmac = create_hmac(data)
     return hmac.compare_digest(received_hmac, expected_hmac)
+
+def create_hmac_digest(data: bytes) -> bytes:
+    """Cria um digest HMAC-SHA256 binário (32 bytes), usado no transporte interno."""
+    return hmac.new(API_AUTH_KEY, data, hashlib.sha256).digest()
+
+def verify_hmac_digest(received_digest: bytes, data: bytes) -> bool:
+    """Verifica um digest HMAC binário recebido contra um calculado."""
+    return hmac.compare_digest(received_digest, create_hmac_digest(data))
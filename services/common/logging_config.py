@@ -1,7 +1,7 @@
 import os
 
 # Cria o diretório de logs se ele não existir
-LOG_DIR = "/app/logs"
+LOG_DIR = os.getenv("LOG_DIR", "/app/logs")
 if not os.path.exists(LOG_DIR):
     os.makedirs(LOG_DIR)
 
@@ -24,10 +24,13 @@ LOGGING_CONFIG = {
             'level': 'INFO',
         },
         'audit_file': {
-            'class': 'logging.handlers.RotatingFileHandler',
+            # Gravação assíncrona: a requisição só enfileira; uma thread dedicada grava em lotes
+            'class': 'common.audit_logging.AsyncAuditHandler',
             'filename': os.path.join(LOG_DIR, 'audit.log'),
             'maxBytes': 1024 * 1024 * 5,  # 5 MB
             'backupCount': 5,
+            'queue_size': int(os.getenv("AUDIT_QUEUE_SIZE", 10000)),
+            'full_policy': os.getenv("AUDIT_QUEUE_FULL_POLICY", "block"),  # 'block' ou 'drop'
             'formatter': 'json',
             'level': 'INFO',
         },
@@ -0,0 +1,273 @@
+"""
+Métricas no formato de texto do Prometheus, sem dependências externas.
+
+Os valores ficam em células por thread: no caminho crítico, um incremento é
+uma soma em uma lista que só a thread atual escreve, sem lock. A coleta
+(GET /api/v1/metrics) soma as células de todas as threads. Células de
+threads encerradas são incorporadas a um total acumulado, então threads de
+vida curta não fazem a memória crescer.
+
+No modo multiprocesso cada worker tem suas próprias métricas.
+"""
+import time
+import bisect
+import threading
+
+from flask import g, request
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LOCK_WAIT_BUCKETS = (0.000001, 0.000005, 0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.1)
+_PRUNE_THRESHOLD = 256  # Número de células a partir do qual as de threads encerradas são incorporadas
+
+
+class _PerThreadCells:
+    """
+    Células de tamanho fixo, uma por thread; a soma só acontece na coleta.
+    No caminho crítico use `local.cell` e recorra a `cell()` no primeiro acesso
+    da thread (AttributeError).
+    """
+    def __init__(self, size: int):
+        self._size = size
+        self.local = threading.local()
+        self._cells = []  # (thread, célula)
+        self._retired = [0] * size
+        self._lock = threading.Lock()
+
+    def cell(self) -> list:
+        cell = getattr(self.local, 'cell', None)
+        if cell is None:
+            cell = [0] * self._size
+            with self._lock:
+                if len(self._cells) >= _PRUNE_THRESHOLD:
+                    self._prune_locked()
+                self._cells.append((threading.current_thread(), cell))
+            self.local.cell = cell
+        return cell
+
+    def _prune_locked(self):
+        alive = []
+        for thread, cell in self._cells:
+            if thread.is_alive():
+                alive.append((thread, cell))
+            else:
+                for i, value in enumerate(cell):
+                    self._retired[i] += value
+        self._cells = alive
+
+    def totals(self) -> list:
+        with self._lock:
+            self._prune_locked()
+            totals = list(self._retired)
+            for _, cell in self._cells:
+                for i, value in enumerate(cell):
+                    totals[i] += value
+        return totals
+
+
+class _CounterChild:
+    def __init__(self):
+        self._cells = _PerThreadCells(1)
+        self._local = self._cells.local
+
+    def inc(self, amount=1):
+        try:
+            self._local.cell[0] += amount
+        except AttributeError:
+            self._cells.cell()[0] += amount
+
+    def samples(self, name: str, labels: str):
+        yield f"{name}{labels}", self._cells.totals()[0]
+
+
+class _HistogramChild:
+    def __init__(self, buckets: tuple):
+        self._buckets = buckets
+        # Uma posição por bucket, uma para +Inf e uma para a soma dos valores.
+        self._cells = _PerThreadCells(len(buckets) + 2)
+        self._local = self._cells.local
+
+    def observe(self, value: float):
+        try:
+            cell = self._local.cell
+        except AttributeError:
+            cell = self._cells.cell()
+        cell[bisect.bisect_left(self._buckets, value)] += 1
+        cell[-1] += value
+
+    def samples(self, name: str, labels: str):
+        totals = self._cells.totals()
+        separator = labels[:-1] + "," if labels else "{"
+        cumulative = 0
+        for bound, count in zip(self._buckets, totals):
+            cumulative += count
+            yield f'{name}_bucket{separator}le="{_format_value(bound)}"}}', cumulative
+        cumulative += totals[len(self._buckets)]
+        yield f'{name}_bucket{separator}le="+Inf"}}', cumulative
+        yield f"{name}_sum{labels}", totals[-1]
+        yield f"{name}_count{labels}", cumulative
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lookup = {}  # Valores de label como recebidos -> série (evita normalizar a cada uso)
+        self._children_lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self._children[()] = self._new_child()
+            self._bind_default()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _bind_default(self):
+        """Métricas sem labels expõem diretamente os métodos da série única (uma chamada a menos)."""
+
+    def labels(self, *values):
+        """Retorna a série com os valores de label dados (criada no primeiro uso)."""
+        child = self._lookup.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"A métrica '{self.name}' espera os labels {self.labelnames}.")
+            key = tuple(str(value) for value in values)
+            with self._children_lock:
+                child = self._children.get(key)
+                if child is None:
+                    child = self._children[key] = self._new_child()
+                self._lookup[values] = child
+        return child
+
+    def samples(self):
+        with self._children_lock:
+            children = list(self._children.items())
+        for key, child in sorted(children):
+            yield from child.samples(self.name, _format_labels(self.labelnames, key))
+
+
+class Counter(_Metric):
+    """Contador monotônico."""
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def _bind_default(self):
+        self.inc = self._default.inc
+
+
+class Histogram(_Metric):
+    """Histograma com buckets cumulativos (`le`), soma e contagem."""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS, registry=None):
+        self._buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self._buckets)
+
+    def _bind_default(self):
+        self.observe = self._default.observe
+
+
+class Gauge(_Metric):
+    """
+    Valor instantâneo lido na coleta. `function` retorna um número ou, se a
+    métrica tiver labels, um dicionário {tupla de valores de label: número}.
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, function, labelnames: tuple = (), registry=None):
+        self._function = function
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return None
+
+    def samples(self):
+        value = self._function()
+        if not self.labelnames:
+            yield self.name, value
+            return
+        for key, item in sorted(value.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)}", item
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric):
+        with self._lock:
+            self._metrics.append(metric)
+
+    def render(self) -> str:
+        """Gera o texto de exposição do Prometheus com todas as métricas registradas."""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for sample, value in metric.samples():
+                lines.append(f"{sample} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value) -> str:
+    if isinstance(value, float):
+        if value == float("inf"):
+            return "+Inf"
+        return repr(value)
+    return str(value)
+
+
+def acquire_timed(lock) -> float:
+    """
+    Adquire `lock` e retorna o tempo de espera em segundos. Sem disputa o
+    relógio nem é consultado e o retorno é 0.0; por isso os histogramas de
+    espera só registram aquisições disputadas.
+    """
+    if lock.acquire(blocking=False):
+        return 0.0
+    started = time.perf_counter()
+    lock.acquire()
+    return time.perf_counter() - started
+
+
+REQUEST_DURATION = Histogram("http_request_duration_seconds", "Latência das requisições HTTP por endpoint.",
+                             ("endpoint", "method", "status"))
+
+
+def instrument_app(app):
+    """Registra a latência de cada requisição do app Flask em `http_request_duration_seconds`."""
+    @app.before_request
+    def _start_request_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _observe_request_duration(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            REQUEST_DURATION.labels(request.endpoint or "unknown", request.method, response.status_code).observe(time.perf_counter() - started)
+        return response
@@ -0,0 +1,330 @@
+"""
+Transporte binário interno entre harvester, mixer e generator.
+
+Alternativa persistente ao HTTP para os saltos internos, sobre TCP
+(`tcp://host:porta`) ou Unix domain socket (`unix:///caminho/do/socket`).
+
+Formato de cada frame:
+
+    [tamanho: 4 bytes][tipo: 1 byte][sequência: 8 bytes][payload][HMAC: 32 bytes]
+
+O tamanho cobre tudo após ele. O HMAC-SHA256 (chave de `common.auth`) cobre o
+identificador da sessão, a direção, o tipo, a sequência e o payload. Na abertura
+da conexão, servidor e cliente trocam nonces aleatórios (frames HELLO) que
+formam o identificador da sessão; a sequência de cada direção deve ser
+estritamente crescente. Assim um frame não pode ser reaproveitado em outra
+conexão, na direção oposta ou fora de ordem.
+
+O servidor limita o tempo de cada conexão: o handshake e a leitura de um frame
+já iniciado têm TRANSPORT_FRAME_TIMEOUT segundos, e uma conexão sem novos
+frames por TRANSPORT_IDLE_TIMEOUT segundos é encerrada. Assim clientes que
+conectam e não enviam nada não prendem as threads do servidor. O cliente
+reconecta sozinho quando o servidor encerra uma conexão ociosa.
+"""
+import os
+import struct
+import socket
+import logging
+import threading
+import socketserver
+
+from common.auth import create_hmac_digest, verify_hmac_digest
+
+logger = logging.getLogger(__name__)
+
+FRAME_HELLO = 0
+FRAME_ENTROPY_PUSH = 1   # Payload: repetição de [tamanho da fonte: 1][fonte][hash: 32]
+FRAME_SEED_PULL = 2      # Payload vazio
+FRAME_SEED = 3           # Payload: semente de 64 bytes
+FRAME_ACK = 4            # Payload: quantidade de itens processados (4 bytes)
+FRAME_ERROR = 5          # Payload: mensagem em UTF-8
+FRAME_ENTROPY_PUSH_ESTIMATED = 6  # Como FRAME_ENTROPY_PUSH, com [min-entropia em bits: float32] após cada hash
+
+MAX_FRAME_SIZE = 1024 * 1024
+TRANSPORT_FRAME_TIMEOUT = float(os.getenv("TRANSPORT_FRAME_TIMEOUT", "10"))  # Handshake e leitura de um frame iniciado
+TRANSPORT_IDLE_TIMEOUT = float(os.getenv("TRANSPORT_IDLE_TIMEOUT", "300"))  # Espera máxima por um novo frame
+NONCE_SIZE = 16
+MAC_SIZE = 32
+ENTROPY_HASH_SIZE = 32
+CLIENT_TO_SERVER = b'C'
+SERVER_TO_CLIENT = b'S'
+
+_LENGTH = struct.Struct(">I")
+_HEADER = struct.Struct(">BQ")
+_COUNT = struct.Struct(">I")
+_ESTIMATE = struct.Struct(">f")
+
+
+class TransportError(ConnectionError):
+    """Falha de conexão, de protocolo ou de autenticação no transporte interno."""
+
+
+class ConnectionClosed(TransportError):
+    """O outro lado encerrou a conexão."""
+
+
+class FrameRejected(TransportError):
+    """O outro lado recusou a requisição (FRAME_ERROR); repeti-la não adianta."""
+
+
+def parse_address(url: str):
+    """Converte `tcp://host:porta` ou `unix:///caminho` em (família, endereço)."""
+    if url.startswith("unix://"):
+        return socket.AF_UNIX, url[len("unix://"):]
+    if url.startswith("tcp://"):
+        host, _, port = url[len("tcp://"):].rpartition(":")
+        return socket.AF_INET, (host, int(port))
+    raise ValueError(f"Endereço de transporte inválido: '{url}'. Use tcp://host:porta ou unix:///caminho.")
+
+
+def encode_entropy_entries(entries: list, estimated: bool = False) -> bytes:
+    """
+    Codifica uma lista de (fonte, hash de 32 bytes) no payload de
+    FRAME_ENTROPY_PUSH. Com `estimated`, as entradas são (fonte, hash,
+    min-entropia ou None) e o payload é o de FRAME_ENTROPY_PUSH_ESTIMATED.
+    """
+    parts = []
+    for entry in entries:
+        tag = entry[0].encode('utf-8')[:255]
+        parts.append(bytes([len(tag)]) + tag + entry[1])
+        if estimated:
+            # NaN indica que a fonte não informou estimativa
+            parts.append(_ESTIMATE.pack(float('nan') if entry[2] is None else entry[2]))
+    return b''.join(parts)
+
+
+def decode_entropy_entries(payload: bytes, estimated: bool = False) -> list:
+    """
+    Decodifica o payload de FRAME_ENTROPY_PUSH em uma lista de (fonte, hash),
+    ou o de FRAME_ENTROPY_PUSH_ESTIMATED em (fonte, hash, min-entropia ou None).
+    """
+    entries = []
+    view = memoryview(payload)
+    pos = 0
+    trailer = _ESTIMATE.size if estimated else 0
+    while pos < len(view):
+        tag_len = view[pos]
+        end = pos + 1 + tag_len + ENTROPY_HASH_SIZE
+        if end + trailer > len(view):
+            raise ValueError("Payload de entropia truncado.")
+        source = bytes(view[pos + 1:pos + 1 + tag_len]).decode('utf-8')
+        digest = bytes(view[end - ENTROPY_HASH_SIZE:end])
+        if estimated:
+            (min_entropy,) = _ESTIMATE.unpack_from(view, end)
+            entries.append((source, digest, None if min_entropy != min_entropy else min_entropy))
+        else:
+            entries.append((source, digest))
+        pos = end + trailer
+    return entries
+
+
+class FramedConnection:
+    """Leitura e escrita de frames autenticados em um socket conectado."""
+    def __init__(self, sock: socket.socket, is_server: bool):
+        self.sock = sock
+        self.session = b''
+        self._send_direction = SERVER_TO_CLIENT if is_server else CLIENT_TO_SERVER
+        self._recv_direction = CLIENT_TO_SERVER if is_server else SERVER_TO_CLIENT
+        self._send_seq = 0
+        self._recv_seq = 0
+
+    def _recv_exact(self, size: int) -> bytes:
+        data = bytearray()
+        while len(data) < size:
+            chunk = self.sock.recv(size - len(data))
+            if not chunk:
+                raise ConnectionClosed("Conexão encerrada pelo outro lado.")
+            data += chunk
+        return bytes(data)
+
+    def send(self, frame_type: int, payload: bytes = b''):
+        self._send_seq += 1
+        header = _HEADER.pack(frame_type, self._send_seq)
+        mac = create_hmac_digest(self.session + self._send_direction + header + payload)
+        self.sock.sendall(_LENGTH.pack(len(header) + len(payload) + MAC_SIZE) + header + payload + mac)
+
+    def recv(self, idle_timeout: float = None):
+        """
+        Lê um frame e retorna (tipo, payload). Levanta TransportError se for inválido.
+        Com `idle_timeout`, espera até esse tempo pelo primeiro byte do frame; o
+        restante usa o timeout do socket.
+        """
+        prefix = b''
+        if idle_timeout is not None:
+            frame_timeout = self.sock.gettimeout()
+            self.sock.settimeout(idle_timeout)
+            try:
+                prefix = self._recv_exact(1)
+            finally:
+                self.sock.settimeout(frame_timeout)
+        (length,) = _LENGTH.unpack(prefix + self._recv_exact(_LENGTH.size - len(prefix)))
+        if not _HEADER.size + MAC_SIZE <= length <= MAX_FRAME_SIZE:
+            raise TransportError(f"Tamanho de frame inválido: {length}.")
+        body = self._recv_exact(length)
+        header, payload, mac = body[:_HEADER.size], body[_HEADER.size:-MAC_SIZE], body[-MAC_SIZE:]
+        if not verify_hmac_digest(mac, self.session + self._recv_direction + header + payload):
+            raise TransportError("HMAC de frame inválido.")
+        frame_type, seq = _HEADER.unpack(header)
+        if seq <= self._recv_seq:
+            raise TransportError("Número de sequência repetido ou fora de ordem.")
+        self._recv_seq = seq
+        return frame_type, payload
+
+    def handshake(self, is_server: bool):
+        """Troca os nonces de sessão. O servidor envia o seu primeiro."""
+        own_nonce = os.urandom(NONCE_SIZE)
+        if is_server:
+            self.send(FRAME_HELLO, own_nonce)
+            frame_type, peer_nonce = self.recv()
+        else:
+            frame_type, peer_nonce = self.recv()
+            self.send(FRAME_HELLO, own_nonce)
+        if frame_type != FRAME_HELLO or len(peer_nonce) != NONCE_SIZE:
+            raise TransportError("Handshake inválido.")
+        server_nonce, client_nonce = (own_nonce, peer_nonce) if is_server else (peer_nonce, own_nonce)
+        self.session = server_nonce + client_nonce
+
+
+class TransportServer:
+    """
+    Servidor do transporte interno. Cada conexão roda em sua própria thread e
+    pode enviar qualquer sequência de frames; `handlers` mapeia o tipo do frame
+    para uma função `handler(payload) -> (tipo_resposta, payload_resposta)`.
+    """
+    def __init__(self, url: str, handlers: dict):
+        family, address = parse_address(url)
+        handlers = dict(handlers)
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                self.request.settimeout(TRANSPORT_FRAME_TIMEOUT)
+                connection = FramedConnection(self.request, is_server=True)
+                try:
+                    connection.handshake(is_server=True)
+                    while True:
+                        frame_type, payload = connection.recv(idle_timeout=TRANSPORT_IDLE_TIMEOUT)
+                        handler = handlers.get(frame_type)
+                        if handler is None:
+                            connection.send(FRAME_ERROR, b"Unsupported frame type.")
+                            continue
+                        try:
+                            response_type, response_payload = handler(payload)
+                        except ValueError as e:
+                            response_type, response_payload = FRAME_ERROR, str(e).encode('utf-8')
+                        connection.send(response_type, response_payload)
+                except ConnectionClosed:
+                    pass
+                except socket.timeout:
+                    logger.info("Transport connection closed: handshake, frame or idle timeout.",
+                                extra={'event': 'transport_timeout', 'peer': str(self.client_address)})
+                except TransportError as e:
+                    logger.warning(f"Transport connection rejected: {e}", extra={'event': 'transport_failure', 'peer': str(self.client_address)})
+                except OSError:
+                    pass
+
+        if family == socket.AF_UNIX:
+            if os.path.exists(address):
+                os.unlink(address)
+            base_class = socketserver.ThreadingUnixStreamServer
+        else:
+            base_class = socketserver.ThreadingTCPServer
+
+        class Server(base_class):
+            allow_reuse_address = True
+            daemon_threads = True
+
+        self._server = Server(address, Handler)
+        self.address = self._server.server_address
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name="transport-server", daemon=True).start()
+        return self
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class TransportClient:
+    """
+    Cliente persistente do transporte interno. Reconecta sob demanda; as
+    requisições compartilham a mesma conexão e são serializadas por um lock.
+    """
+    def __init__(self, url: str, timeout: float = 5.0):
+        self.url = url
+        self.timeout = timeout
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> FramedConnection:
+        family, address = parse_address(self.url)
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(address)
+            if family == socket.AF_INET:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            connection = FramedConnection(sock, is_server=False)
+            connection.handshake(is_server=False)
+        except OSError:
+            sock.close()
+            raise
+        return connection
+
+    def request(self, frame_type: int, payload: bytes = b''):
+        """
+        Envia um frame e retorna (tipo, payload) da resposta. Se uma conexão
+        reutilizada já tiver sido encerrada pelo servidor (ex: por ociosidade),
+        reconecta e repete o envio uma vez.
+        """
+        with self._lock:
+            try:
+                if self._connection is not None:
+                    try:
+                        self._connection.send(frame_type, payload)
+                        return self._connection.recv()
+                    except (ConnectionClosed, ConnectionResetError, BrokenPipeError):
+                        self._close_locked()
+                self._connection = self._connect()
+                self._connection.send(frame_type, payload)
+                return self._connection.recv()
+            except OSError as e:
+                self._close_locked()
+                if isinstance(e, TransportError):
+                    raise
+                raise TransportError(f"Falha no transporte para {self.url}: {e}") from e
+
+    def push_entropy(self, entries: list) -> int:
+        """Envia (fonte, hash) ou (fonte, hash, min-entropia) ao mixer; retorna quantos foram aceitos."""
+        if any(len(entry) > 2 for entry in entries):
+            response_type, payload = self.request(FRAME_ENTROPY_PUSH_ESTIMATED, encode_entropy_entries(entries, estimated=True))
+        else:
+            response_type, payload = self.request(FRAME_ENTROPY_PUSH, encode_entropy_entries(entries))
+        if response_type == FRAME_ERROR:
+            raise FrameRejected(f"Mixer recusou a entropia: {payload.decode('utf-8', 'replace')}")
+        if response_type != FRAME_ACK:
+            raise TransportError(f"Resposta inesperada do mixer ao enviar entropia (frame {response_type}).")
+        return _COUNT.unpack(payload)[0]
+
+    def pull_seed(self) -> bytes:
+        response_type, payload = self.request(FRAME_SEED_PULL)
+        if response_type != FRAME_SEED:
+            raise TransportError(f"Mixer não forneceu semente: {payload.decode('utf-8', 'replace')}")
+        return payload
+
+    def _close_locked(self):
+        if self._connection is not None:
+            try:
+                self._connection.sock.close()
+            except OSError:
+                pass
+            self._connection = None
+
+    def close(self):
+        with self._lock:
+            self._close_locked()
+
+
+def ack(count: int):
+    """Resposta FRAME_ACK para `count` itens processados."""
+    return FRAME_ACK, _COUNT.pack(count)
@@ -0,0 +1,180 @@
+# Desenvolvido por: Leandro M. da Costa (HG Studios)
+#
+
+import os
+import json
+import glob
+import time
+import threading
+import logging
+from decimal import Decimal, InvalidOperation
+from math import gcd
+
+import numpy as np
+
+from sampling import AliasTable
+
+logger = logging.getLogger(__name__)
+
+# --- Configurações ---
+GAMES_DIR = os.getenv("GAMES_DIR", "/app/games")
+GAMES_RELOAD_INTERVAL = 5  # Segundos entre verificações de alterações nos arquivos de jogos
+PROBABILITY_TOLERANCE = Decimal("0.000001")  # Tolerância para a soma das probabilidades
+
+
+class Game:
+    """Jogo compilado a partir de um arquivo `games/<nome>.json`."""
+    def __init__(self, name: str, count: int, value_range: tuple, table: AliasTable):
+        self.name = name
+        self.count = count
+        self.range = value_range
+        self.table = table
+        self._values = np.asarray(table.names, dtype=np.int64)
+
+    def draw(self, rounds: int, csprng) -> np.ndarray:
+        """Sorteia `rounds` rodadas de `count` valores. Retorna um array (rounds, count)."""
+        indices = self.table.sample_indices(rounds * self.count, csprng)
+        return self._values[indices].reshape(rounds, self.count)
+
+
+def compile_game(name: str, config: dict) -> Game:
+    """
+    Valida a configuração de um jogo e a compila em uma tabela de alias.
+
+    As probabilidades são convertidas em pesos inteiros exatos a partir da sua
+    representação decimal, então 0.085 e 0.015 mantêm exatamente a proporção
+    definida no arquivo.
+    """
+    if not isinstance(config, dict):
+        raise ValueError("A configuração do jogo deve ser um objeto JSON.")
+
+    count = config.get("count")
+    if not isinstance(count, int) or isinstance(count, bool) or count <= 0:
+        raise ValueError("'count' deve ser um inteiro positivo.")
+
+    value_range = config.get("range")
+    if (not isinstance(value_range, list) or len(value_range) != 2
+            or not all(isinstance(v, int) and not isinstance(v, bool) for v in value_range)
+            or value_range[0] > value_range[1]):
+        raise ValueError("'range' deve ser um par [min, max] de inteiros com min <= max.")
+
+    probabilities = config.get("probabilities")
+    if not isinstance(probabilities, dict) or not probabilities:
+        raise ValueError("'probabilities' deve ser um mapa não vazio de valor -> probabilidade.")
+
+    values, decimals = [], []
+    for key, probability in probabilities.items():
+        try:
+            value = int(key)
+        except ValueError:
+            raise ValueError(f"Chave de probabilidade inválida: '{key}'.")
+        if not value_range[0] <= value <= value_range[1]:
+            raise ValueError(f"O valor {value} está fora do range {value_range}.")
+        if isinstance(probability, bool) or not isinstance(probability, (int, float)):
+            raise ValueError(f"A probabilidade do valor {value} deve ser numérica.")
+        try:
+            decimal = Decimal(str(probability))
+        except InvalidOperation:
+            raise ValueError(f"A probabilidade do valor {value} é inválida.")
+        if not decimal.is_finite() or decimal < 0:
+            raise ValueError(f"A probabilidade do valor {value} deve ser um número não negativo.")
+        if decimal > 0:
+            values.append(value)
+            decimals.append(decimal)
+
+    if len(set(values)) != len(values):
+        raise ValueError("'probabilities' contém valores duplicados.")
+    if not values or abs(sum(decimals) - 1) > PROBABILITY_TOLERANCE:
+        raise ValueError("A soma das probabilidades deve ser 1.")
+
+    # Escala todas as probabilidades pela mesma potência de 10 para obter inteiros exatos.
+    exponent = max(-d.as_tuple().exponent for d in decimals)
+    weights = [int(d.scaleb(exponent)) for d in decimals]
+    divisor = 0
+    for weight in weights:
+        divisor = gcd(divisor, weight)
+    weights = [weight // divisor for weight in weights]
+
+    return Game(name, count, (value_range[0], value_range[1]), AliasTable(values, weights))
+
+
+class GameCatalog:
+    """
+    Catálogo de jogos carregado de `GAMES_DIR/*.json`.
+
+    Cada arquivo é validado e compilado na carga por `compiler(nome, config)`
+    (padrão: `compile_game`). Uma thread de background recarrega arquivos
+    alterados; se um arquivo alterado for inválido, a versão compilada anterior
+    continua em uso.
+    """
+    def __init__(self, directory: str = GAMES_DIR, compiler=compile_game):
+        self.directory = directory
+        self.compiler = compiler
+        self._games = {}
+        self._signatures = {}
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+
+    def _scan(self) -> dict:
+        signatures = {}
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            signatures[path] = (stat.st_mtime_ns, stat.st_size)
+        return signatures
+
+    def reload(self) -> bool:
+        """Recarrega os arquivos novos ou alterados. Retorna True se houve mudanças."""
+        with self._reload_lock:
+            return self._reload()
+
+    def _reload(self) -> bool:
+        signatures = self._scan()
+        if signatures == self._signatures:
+            return False
+
+        games = dict(self._games)
+        for path in set(self._signatures) - set(signatures):
+            name = os.path.splitext(os.path.basename(path))[0]
+            games.pop(name, None)
+            logger.info(f"Game '{name}' removed from catalog.", extra={'event': 'game_removed', 'game': name})
+
+        for path, signature in signatures.items():
+            if self._signatures.get(path) == signature:
+                continue
+            name = os.path.splitext(os.path.basename(path))[0]
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    games[name] = self.compiler(name, json.load(f))
+                logger.info(f"Game '{name}' loaded into catalog.", extra={'event': 'game_loaded', 'game': name})
+            except (OSError, ValueError) as e:
+                logger.error(f"Invalid game file '{path}': {e}", extra={'event': 'game_load_failure', 'game': name})
+
+        with self._lock:
+            self._games = games
+            self._signatures = signatures
+        return True
+
+    def get(self, name: str):
+        with self._lock:
+            return self._games.get(name)
+
+    def names(self) -> list:
+        with self._lock:
+            return sorted(self._games)
+
+    def watch(self, interval: float = GAMES_RELOAD_INTERVAL):
+        """Inicia uma thread daemon que recarrega o catálogo periodicamente."""
+        def watch_forever():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.reload()
+                except Exception as e:
+                    logger.error(f"Error reloading game catalog: {e}", extra={'event': 'game_reload_failure'}, exc_info=True)
+
+        thread = threading.Thread(target=watch_forever, name="game-catalog-watcher", daemon=True)
+        thread.start()
+        return thread
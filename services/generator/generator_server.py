@@ -2,7 +2,8 @@
 #
 
 import os
-import hashlib
+import json
+import atexit
 from flask import Flask, request, jsonify, Response, send_from_directory
 import requests
 import time
@@ -10,92 +11,461 @@ from datetime import datetime
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.backends import default_backend
 import threading
+import itertools
+import numpy as np
 from functools import wraps
 import logging
 import logging.config
 from common.auth import create_hmac, verify_hmac
 from common.logging_config import LOGGING_CONFIG, LOG_DIR
+from common.audit_index import AuditLogIndex, parse_audit_time
+from common.transport import TransportClient, TransportError
+from common.metrics import Counter, Histogram, Gauge, REGISTRY, CONTENT_TYPE, LOCK_WAIT_BUCKETS, acquire_timed, instrument_app
+from sampling import draw_unbiased_numbers, draw_unbiased_array, perform_weighted_draw, perform_weighted_draw_indices, draw_weighted_indices, iter_packed_uints, shuffle_indices, sample_without_replacement
+import negotiation
+import replay
+from games import GameCatalog
+from slots import SLOTS_DIR, compile_slot
 
 # --- Configuração de Logging ---
 logging.config.dictConfig(LOGGING_CONFIG)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
+instrument_app(app)
 
 # --- Configurações ---
-MIXER_SERVER_URL = "http://mixer:5000"
+MIXER_SERVER_URL = os.getenv("MIXER_SERVER_URL", "http://mixer:5000")
+# Se definido (ex: tcp://mixer:5100), as sementes são buscadas pelo transporte binário interno
+MIXER_TRANSPORT_URL = os.getenv("MIXER_TRANSPORT_URL")
 REKEY_INTERVAL_MB = 100 # Re-key after 100MB of data generated
+REKEY_PREFETCH_RATIO = float(os.getenv("REKEY_PREFETCH_RATIO", "0.8"))  # Fração do intervalo em que a próxima semente é buscada
+REKEY_GRACE_MB = int(os.getenv("REKEY_GRACE_MB", "10"))  # Janela extra com a chave antiga enquanto a nova semente não chega
+SEED_FETCH_ATTEMPTS = 10  # Tentativas por busca de semente no mixer
+SEED_FETCH_RETRY_DELAY = 1  # Segundos entre tentativas
+# Espera máxima entre rodadas de tentativas das sementes iniciais (a inicialização nunca desiste)
+SEED_INIT_MAX_BACKOFF = float(os.getenv("SEED_INIT_MAX_BACKOFF", "60"))
+STREAM_MAX_BYTES = int(os.getenv("STREAM_MAX_BYTES", 16 * 1024 * 1024 * 1024))  # Limite (e padrão) de /api/v1/stream_entropy
+STREAM_DEFAULT_CHUNK = 64 * 1024
+STREAM_MIN_CHUNK = 1024
+STREAM_MAX_CHUNK = 1024 * 1024
+MAX_GAME_ROUNDS = 10000  # Número máximo de rodadas por requisição em /api/v1/games/<nome>
+MAX_SLOT_SPINS = int(os.getenv("MAX_SLOT_SPINS", "10000"))  # Giros por requisição em /api/v1/slots/<nome>/spin
+MAX_SYMBOL_DRAWS = int(os.getenv("MAX_SYMBOL_DRAWS", "1000000"))  # Sorteios por requisição em /api/v1/games/draw_symbols
+# Itens por requisição em /api/v1/rng/shuffle (count * n) e /api/v1/rng/sample (count * k)
+SHUFFLE_MAX_ITEMS = int(os.getenv("SHUFFLE_MAX_ITEMS", "1000000"))
+AUDIT_QUERY_MAX_RECORDS = 100000  # Limite (e padrão) de registros por consulta em /api/v1/audit/query
+KEYSTREAM_BUFFER_SIZE = 2 * 1024 * 1024  # Buffer circular de keystream pré-gerado (2 MiB)
+KEYSTREAM_REFILL_CHUNK = 256 * 1024  # Quantidade de keystream gerada por ciclo de reabastecimento
+AES_BLOCK_SIZE = 16
+SEED_ESCROW_DIR = os.getenv("SEED_ESCROW_DIR", "")  # Sementes de épocas encerradas (opcional; vazio: desativado)
+CSPRNG_SHARDS = int(os.getenv("CSPRNG_SHARDS", os.cpu_count() or 1))  # Instâncias independentes de AES-CTR
 
 # --- Global CSPRNG Instance ---
-# Esta variável irá conter nossa única instância thread-safe do CSPRNG.
+# Esta variável irá conter o pool de shards do CSPRNG (ver CSPRNGPool). Ela só é
+# atribuída uma vez, então as requisições podem lê-la sem adquirir `csprng_lock`.
 csprng_instance = None
 csprng_lock = threading.Lock()
+# Sementes das épocas encerradas, para a verificação de sorteios auditados (ver `replay`).
+# Ficam fora de LOG_DIR: quem lê os logs não deve poder ler material de chave.
+if SEED_ESCROW_DIR and os.path.commonpath([os.path.realpath(SEED_ESCROW_DIR), os.path.realpath(LOG_DIR)]) == os.path.realpath(LOG_DIR):
+    raise ValueError("SEED_ESCROW_DIR não pode ficar dentro de LOG_DIR. Use um volume separado, acessível só ao Generator.")
+seed_escrow = replay.SeedEscrow(SEED_ESCROW_DIR)
+
+# --- Catálogo de Jogos ---
+# Compilado a partir de games/*.json na inicialização e recarregado quando os arquivos mudam.
+game_catalog = GameCatalog()
+# Máquinas de slot (games/slots/*.json), com o mesmo recarregamento automático.
+slot_catalog = GameCatalog(SLOTS_DIR, compile_slot)
+
+# --- Métricas ---
+BYTES_GENERATED = Counter("csprng_bytes_generated_total", "Bytes de keystream entregues pelo CSPRNG.")
+LOCK_WAIT = Histogram("csprng_lock_wait_seconds", "Espera pelo lock do shard em DeterministicCSPRNG.generate (só aquisições disputadas).", buckets=LOCK_WAIT_BUCKETS)
+KEYSTREAM_STALLS = Counter("csprng_keystream_stalls_total", "Vezes em que generate esperou o buffer de keystream ser reabastecido.")
+REKEYS = Counter("csprng_rekeys_total", "Re-keys do CSPRNG (inclui a chave inicial de cada shard).")
+REKEY_DURATION = Histogram("csprng_rekey_duration_seconds", "Duração da troca de chave (derivação e limpeza do buffer), com o lock adquirido.", buckets=LOCK_WAIT_BUCKETS)
+SEED_FETCH_DURATION = Histogram("csprng_seed_fetch_duration_seconds", "Latência de cada tentativa de busca de semente no mixer.", ("result",))
+SEED_FETCH_RETRIES = Counter("csprng_seed_fetch_retries_total", "Tentativas de busca de semente que falharam e foram repetidas.")
+SEED_FETCH_FAILURES = Counter("csprng_seed_fetch_failures_total", "Buscas de semente que esgotaram todas as tentativas.")
+Gauge("csprng_shards", "Shards do pool de CSPRNG neste worker (0 enquanto inicializa).",
+      lambda: len(csprng_instance) if csprng_instance is not None else 0)
+
+# --- Índice de Auditoria ---
+# Indexa audit.log e os backups rotacionados sob demanda, para consultas filtradas.
+audit_index = AuditLogIndex(os.path.join(LOG_DIR, 'audit.log'))
 
 class DeterministicCSPRNG:
-    def __init__(self, seed: bytes):
+    """
+    CSPRNG baseado em AES-CTR com um buffer circular de keystream pré-gerado.
+
+    Uma thread de background preenche o buffer em blocos grandes com
+    `update_into`, de forma que `generate` apenas copia bytes já prontos
+    dentro de uma seção crítica curta. Os bytes entregues são apagados do
+    buffer para nunca serem servidos duas vezes.
+    """
+    def __init__(self, seed: bytes, domain: bytes = b''):
         self._seed = seed
-        self._bytes_generated = 0
+        self._domain = domain  # Separação de domínio na derivação de chave (ex: um shard do pool)
+        self._bytes_generated = 0  # Bytes entregues com a chave atual
+        self._bytes_produced = 0   # Bytes de keystream produzidos com a chave atual
         self._lock = threading.Lock()
-        self._rekey()
+        self._refill_wanted = threading.Condition(self._lock)
+        self._keystream_ready = threading.Condition(self._lock)
+        self._seed_ready = threading.Condition(self._lock)
+        self._next_seed = None  # Semente buscada antecipadamente para o próximo re-key
+        self._prefetch_active = False
+        # update_into exige um buffer de saída com (bloco - 1) bytes extras além da entrada,
+        # por isso o buffer tem uma cauda que nunca é usada para dados.
+        self._buffer = bytearray(KEYSTREAM_BUFFER_SIZE + AES_BLOCK_SIZE - 1)
+        self._buffer_view = memoryview(self._buffer)
+        self._zeros = memoryview(bytes(KEYSTREAM_BUFFER_SIZE))
+        self._read_pos = 0
+        self._available = 0
+        self._epoch = 0
+        self._closed = False
+        with self._lock:
+            self._rekey()
+        self._refill_thread = threading.Thread(target=self._refill_loop, name="csprng-refill", daemon=True)
+        self._refill_thread.start()
 
     def _rekey(self):
-        """Deriva uma nova chave e nonce da semente para ressincronização."""
-        self._key = hashlib.sha256(self._seed).digest()
-        self._nonce = hashlib.sha512(self._seed).digest()[32:48]
+        """Deriva uma nova chave e nonce da semente para ressincronização.
+
+        Deve ser chamado com `_lock` adquirido. Todo
+        keystream pendente da chave anterior é apagado do buffer.
+        """
+        started = time.perf_counter()
+        self._key, self._nonce = replay.derive_key(self._seed, self._domain)
+        self._commitment = replay.seed_commitment(self._seed, self._domain)
         self._backend = default_backend()
         
         cipher = Cipher(algorithms.AES(self._key), modes.CTR(self._nonce), backend=self._backend)
         self._encryptor = cipher.encryptor()
         
+        self._buffer_view[:KEYSTREAM_BUFFER_SIZE] = self._zeros
+        self._read_pos = 0
+        self._available = 0
         self._bytes_generated = 0
-        logger.info("CSPRNG re-keyed with a new seed.", extra={'event': 'rekey'})
+        self._bytes_produced = 0
+        self._epoch += 1
+        self._refill_wanted.notify()
+        REKEYS.inc()
+        REKEY_DURATION.observe(time.perf_counter() - started)
+        logger.info("CSPRNG re-keyed with a new seed.", extra={'event': 'rekey', 'domain': self._domain.decode('ascii', 'replace'), 'worker': os.getpid(),
+                                                                'commitment': self._commitment, 'epoch': self._epoch})
+
+    def _end_epoch(self):
+        """
+        Guarda a semente da época atual na custódia (SEED_ESCROW_DIR) quando ela
+        termina (re-key ou encerramento do worker), para que os sorteios da época
+        possam ser verificados. Nunca é chamado com a época aberta: a semente
+        permitiria prever as saídas ainda não entregues.
+        Deve ser chamado com `_lock` adquirido.
+        """
+        if self._seed is None:
+            return
+        try:
+            seed_escrow.store(self._seed, self._domain, self._epoch, self._bytes_generated)
+        except OSError as e:
+            logger.error(f"Could not escrow CSPRNG seed: {e}", extra={'event': 'seed_escrow_failure', 'commitment': self._commitment})
+
+    def epoch_material(self, commitment: str):
+        """(semente, domínio, bytes entregues) se `commitment` for a época atual deste shard; senão None."""
+        with self._lock:
+            if self._closed or commitment != self._commitment:
+                return None
+            return self._seed, self._domain, self._bytes_generated
+
+    def _start_seed_prefetch(self):
+        """Inicia a busca da próxima semente em background. Deve ser chamado com `_lock` adquirido."""
+        if self._prefetch_active or self._next_seed is not None or self._closed:
+            return
+        self._prefetch_active = True
+        logger.info("Prefetching next CSPRNG seed.", extra={'event': 'seed_prefetch_start', 'domain': self._domain.decode('ascii', 'replace')})
+        threading.Thread(target=self._prefetch_seed, name="csprng-seed-prefetch", daemon=True).start()
+
+    def _prefetch_seed(self):
+        new_seed = fetch_new_seed_with_retry()
+        with self._lock:
+            self._prefetch_active = False
+            if new_seed:
+                self._next_seed = new_seed
+            self._seed_ready.notify_all()
+
+    def _check_rekey(self):
+        """
+        Aplica a política de re-key antes de servir bytes. Deve ser chamado com `_lock` adquirido.
+
+        A próxima semente é buscada em background a partir de REKEY_PREFETCH_RATIO do
+        intervalo e trocada atomicamente ao atingir o limite. Se ela ainda não chegou,
+        a chave atual continua em uso por até REKEY_GRACE_MB; só depois disso a
+        requisição bloqueia, e falha se a busca falhar.
+        """
+        rekey_limit = REKEY_INTERVAL_MB * 1024 * 1024
+        if self._bytes_generated >= rekey_limit * REKEY_PREFETCH_RATIO:
+            self._start_seed_prefetch()
+        if self._bytes_generated < rekey_limit:
+            return
+
+        if self._next_seed is None and self._bytes_generated >= rekey_limit + REKEY_GRACE_MB * 1024 * 1024:
+            logger.warning(f"Rekey grace window of {REKEY_GRACE_MB}MB exhausted. Waiting for new seed.", extra={'event': 'rekey_blocked'})
+            self._start_seed_prefetch()
+            while self._next_seed is None and self._prefetch_active:
+                self._seed_ready.wait()
+            if self._next_seed is None:
+                raise RuntimeError("Falha crítica ao re-sincronizar a chave do CSPRNG após múltiplas tentativas.")
+
+        if self._next_seed is not None:
+            self._end_epoch()
+            self._seed = self._next_seed
+            self._next_seed = None
+            self._rekey()
+
+    def _refill_loop(self):
+        """Mantém o buffer de keystream cheio, gerando fora da seção crítica."""
+        # O keystream de uma chave pode ser usado até o fim da janela de tolerância.
+        rekey_limit = (REKEY_INTERVAL_MB + REKEY_GRACE_MB) * 1024 * 1024
+        while True:
+            with self._lock:
+                while True:
+                    if self._closed:
+                        return
+                    free = KEYSTREAM_BUFFER_SIZE - self._available
+                    remaining = rekey_limit - self._bytes_produced
+                    if remaining > 0 and free >= min(KEYSTREAM_REFILL_CHUNK, remaining):
+                        break
+                    self._refill_wanted.wait()
+
+                write_pos = (self._read_pos + self._available) % KEYSTREAM_BUFFER_SIZE
+                size = min(KEYSTREAM_REFILL_CHUNK, free, remaining, KEYSTREAM_BUFFER_SIZE - write_pos)
+                encryptor = self._encryptor
+                epoch = self._epoch
+
+            # A região [write_pos, write_pos + size) está fora da área legível,
+            # então pode ser preenchida sem segurar o lock.
+            encryptor.update_into(self._zeros[:size], self._buffer_view[write_pos:write_pos + size + AES_BLOCK_SIZE - 1])
+
+            with self._lock:
+                if epoch != self._epoch or self._closed:
+                    # Houve re-key (ou encerramento) durante o preenchimento: descarta o keystream antigo.
+                    self._buffer_view[write_pos:write_pos + size] = self._zeros[:size]
+                    continue
+                self._available += size
+                self._bytes_produced += size
+                self._keystream_ready.notify_all()
 
     def generate(self, num_bytes: int) -> bytes:
+        output = bytearray(num_bytes)
+        filled = 0
+        segments = replay.active_segments()
+        waited = acquire_timed(self._lock)
+        try:
+            while filled < num_bytes:
+                if self._closed:
+                    raise RuntimeError("CSPRNG instance is closed.")
+
+                self._check_rekey()
+
+                if self._available == 0:
+                    KEYSTREAM_STALLS.inc()
+                    self._refill_wanted.notify()
+                    self._keystream_ready.wait()
+                    continue
+
+                # O buffer só contém keystream da chave atual. Cada cópia para no limite de
+                # re-key, então a troca de chave acontece exatamente no byte do limite.
+                size = min(num_bytes - filled, self._available, KEYSTREAM_BUFFER_SIZE - self._read_pos)
+                rekey_limit = REKEY_INTERVAL_MB * 1024 * 1024
+                if self._bytes_generated < rekey_limit:
+                    size = min(size, rekey_limit - self._bytes_generated)
+                end = self._read_pos + size
+                output[filled:filled + size] = self._buffer_view[self._read_pos:end]
+                self._buffer_view[self._read_pos:end] = self._zeros[:size]
+                self._read_pos = end % KEYSTREAM_BUFFER_SIZE
+                self._available -= size
+                if segments is not None:
+                    replay.append_segment(segments, self._commitment, self._epoch, self._bytes_generated, size)
+                self._bytes_generated += size
+                filled += size
+
+            if self._available <= KEYSTREAM_BUFFER_SIZE - KEYSTREAM_REFILL_CHUNK:
+                self._refill_wanted.notify()
+        finally:
+            self._lock.release()
+        if waited:
+            LOCK_WAIT.observe(waited)
+        BYTES_GENERATED.inc(num_bytes)
+        return bytes(output)
+
+    def wipe(self):
+        """Apaga chave e keystream sem adquirir o lock (usado no filho após um fork)."""
+        self._closed = True
+        self._buffer_view[:KEYSTREAM_BUFFER_SIZE] = self._zeros
+        self._available = 0
+        self._key = self._nonce = self._seed = self._next_seed = None
+        self._encryptor = None
+
+    def close(self):
+        """Interrompe a thread de reabastecimento, guarda a semente da época e apaga o keystream pendente."""
         with self._lock:
-            if self._bytes_generated >= REKEY_INTERVAL_MB * 1024 * 1024:
-                logger.warning(f"Rekey threshold of {REKEY_INTERVAL_MB}MB reached. Fetching new seed.", extra={'event': 'rekey_threshold'})
-                new_seed = fetch_new_seed_with_retry()
-                if new_seed:
-                    self._seed = new_seed
-                    self._rekey()
-                else:
-                    raise RuntimeError("Falha crítica ao re-sincronizar a chave do CSPRNG após múltiplas tentativas.")
-
-            chunk = self._encryptor.update(b'\x00' * num_bytes)
-            self._bytes_generated += len(chunk)
-            return chunk
+            if not self._closed:
+                self._end_epoch()
+            self._closed = True
+            self._buffer_view[:KEYSTREAM_BUFFER_SIZE] = self._zeros
+            self._available = 0
+            self._refill_wanted.notify_all()
+            self._keystream_ready.notify_all()
+            self._seed_ready.notify_all()
+
+class CSPRNGPool:
+    """
+    Pool de shards independentes de `DeterministicCSPRNG`.
+
+    Cada shard tem sua própria semente do mixer, uma chave derivada com separação
+    de domínio pelo índice do shard, seu próprio lock e sua própria contabilidade
+    de re-key. Cada thread é atribuída a um shard (round-robin na primeira
+    utilização), então threads diferentes não disputam o mesmo lock.
+    """
+    def __init__(self, seeds: list):
+        self._shards = [DeterministicCSPRNG(seed, domain=b"CSPRNG-SHARD-%d-V1" % i) for i, seed in enumerate(seeds)]
+        self._assignments = itertools.count()
+        self._local = threading.local()
+
+    def __len__(self):
+        return len(self._shards)
+
+    def shard(self) -> DeterministicCSPRNG:
+        """Retorna o shard atribuído à thread atual."""
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._shards[next(self._assignments) % len(self._shards)]
+            self._local.shard = shard
+        return shard
+
+    def generate(self, num_bytes: int) -> bytes:
+        return self.shard().generate(num_bytes)
+
+    def epoch_material(self, commitment: str):
+        """Material da época `commitment` se ela estiver ativa em algum shard deste processo."""
+        for shard in self._shards:
+            material = shard.epoch_material(commitment)
+            if material is not None:
+                return material
+        return None
+
+    def close(self):
+        for shard in self._shards:
+            shard.close()
+
+    def wipe(self):
+        for shard in self._shards:
+            shard.wipe()
+
+mixer_transport = TransportClient(MIXER_TRANSPORT_URL) if MIXER_TRANSPORT_URL else None
 
 def fetch_new_seed_with_retry():
-    retries = 10
+    retries = SEED_FETCH_ATTEMPTS
     while retries > 0:
+        started = time.perf_counter()
+        if mixer_transport is not None:
+            try:
+                new_seed = mixer_transport.pull_seed()
+                SEED_FETCH_DURATION.labels("success").observe(time.perf_counter() - started)
+                logger.info("Successfully fetched new seed from mixer.", extra={'event': 'fetch_seed_success', 'transport': 'binary'})
+                return new_seed
+            except TransportError as e:
+                retries -= 1
+                SEED_FETCH_DURATION.labels("failure").observe(time.perf_counter() - started)
+                SEED_FETCH_RETRIES.inc()
+                logger.error(f"Failed to fetch seed from mixer: {e}. Retries left: {retries}", extra={'event': 'fetch_seed_failure', 'transport': 'binary'})
+                time.sleep(SEED_FETCH_RETRY_DELAY)
+                continue
         try:
             hmac_digest = create_hmac(b'')
             headers = {'X-RNG-Auth': hmac_digest}
             
             response = requests.get(f"{MIXER_SERVER_URL}/api/v1/seed", headers=headers, timeout=5)
             response.raise_for_status()
+            SEED_FETCH_DURATION.labels("success").observe(time.perf_counter() - started)
             logger.info("Successfully fetched new seed from mixer.", extra={'event': 'fetch_seed_success'})
             new_seed = response.content
             return new_seed
         except requests.exceptions.RequestException as e:
             retries -= 1
+            SEED_FETCH_DURATION.labels("failure").observe(time.perf_counter() - started)
+            SEED_FETCH_RETRIES.inc()
             logger.error(f"Failed to fetch seed from mixer: {e}. Retries left: {retries}", extra={'event': 'fetch_seed_failure'})
-            time.sleep(1)
+            time.sleep(SEED_FETCH_RETRY_DELAY)
     
+    SEED_FETCH_FAILURES.inc()
     logger.critical("CRITICAL: Could not connect to Mixer after multiple retries.", extra={'event': 'fetch_seed_critical_failure'})
     return None
 
 def initialize_csprng():
-    """Inicializa a instância global do CSPRNG em uma thread de background."""
+    """
+    Inicializa a instância global do CSPRNG em uma thread de background.
+
+    Nunca desiste: se o mixer ainda não tem entropia suficiente (ou está fora do
+    ar), as tentativas continuam com espera exponencial até SEED_INIT_MAX_BACKOFF.
+    """
     global csprng_instance
-    logger.info("Tentando inicializar a instância global do CSPRNG...")
-    initial_seed = fetch_new_seed_with_retry()
-    if initial_seed:
-        with csprng_lock:
-            csprng_instance = DeterministicCSPRNG(initial_seed)
-        logger.info("Instância global do CSPRNG inicializada com sucesso.")
-    else:
-        logger.critical("Falha ao inicializar a instância global do CSPRNG. O serviço não poderá gerar números.")
+    logger.info(f"Tentando inicializar a instância global do CSPRNG com {CSPRNG_SHARDS} shards...")
+    # Cada shard recebe sua própria semente do mixer.
+    seeds = []
+    backoff = SEED_FETCH_RETRY_DELAY
+    while len(seeds) < CSPRNG_SHARDS:
+        seed = fetch_new_seed_with_retry()
+        if seed:
+            seeds.append(seed)
+            continue
+        logger.error(f"Ainda sem sementes para o CSPRNG ({len(seeds)}/{CSPRNG_SHARDS}); nova tentativa em {backoff:.0f}s.",
+                     extra={'event': 'csprng_init_retry', 'backoff': backoff})
+        time.sleep(backoff)
+        backoff = min(backoff * 2, SEED_INIT_MAX_BACKOFF)
+
+    with csprng_lock:
+        csprng_instance = CSPRNGPool(seeds)
+    logger.info("Instância global do CSPRNG inicializada com sucesso.")
+
+def _discard_inherited_csprng():
+    """
+    Executado no processo filho após um fork: o material de chave copiado do pai
+    é apagado e descartado, e o filho precisa buscar suas próprias sementes.
+    """
+    global csprng_instance
+    inherited = csprng_instance
+    csprng_instance = None
+    if inherited is not None:
+        inherited.wipe()
+
+os.register_at_fork(after_in_child=_discard_inherited_csprng)
+
+def shutdown_csprng():
+    """
+    Encerra o pool do CSPRNG do processo, guardando na custódia o total
+    entregue em cada época aberta. Chamado na saída do worker (hook
+    `worker_exit` do gunicorn) ou do servidor de desenvolvimento (atexit).
+    """
+    pool = csprng_instance
+    if pool is not None:
+        pool.close()
+        logger.info("CSPRNG pool closed.", extra={'event': 'csprng_shutdown', 'worker': os.getpid()})
+
+def start_background_tasks():
+    """
+    Carrega o catálogo de jogos e inicia a inicialização do CSPRNG em background.
+
+    Deve ser chamado uma vez por processo que atende requisições (no modo
+    multiprocesso, em cada worker após o fork), para que cada worker tenha suas
+    próprias sementes e nunca compartilhe material de chave.
+    """
+    game_catalog.reload()
+    game_catalog.watch()
+    slot_catalog.reload()
+    slot_catalog.watch()
+    # A inicialização do CSPRNG roda em background para não bloquear o servidor
+    init_thread = threading.Thread(target=initialize_csprng, daemon=True)
+    init_thread.start()
 
 def auth_required(f):
     """Decorator para proteger endpoints com autenticação HMAC."""
@@ -117,151 +487,215 @@ def auth_required(f):
     return decorated_function
 
 
-def perform_weighted_draw(symbols: list, num_draws: int, csprng: DeterministicCSPRNG):
-    """
-    Realiza um sorteio ponderado de símbolos usando o CSPRNG, evitando o viés de módulo.
-    """
-    drawn_symbols = []
-    
-    weighted_list = []
-    for symbol in symbols:
-        # Validação de entrada para garantir a integridade dos dados
-        if not isinstance(symbol.get('name'), str) or not isinstance(symbol.get('weight'), int) or symbol.get('weight') <= 0:
-            raise ValueError("Cada símbolo deve ter um 'name' (string) e um 'weight' (inteiro positivo).")
-        weighted_list.extend([symbol['name']] * symbol['weight'])
-        
-    list_size = len(weighted_list)
-    if list_size == 0:
-        return []
-
-    # Calcula o número de bits necessários para representar o índice máximo
-    # e os bytes correspondentes. Isso otimiza o uso de bytes aleatórios.
-    num_bits = list_size.bit_length()
-    num_bytes_per_draw = (num_bits + 7) // 8
-
-    # O maior valor que podemos gerar com num_bytes
-    range_size = 1 << (num_bytes_per_draw * 8)
-    # O maior múltiplo de list_size que é menor que range_size para evitar o viés
-    max_valid_value = (range_size // list_size) * list_size
-
-    for _ in range(num_draws):
-        while True:
-            random_bytes = csprng.generate(num_bytes_per_draw)
-            random_value = int.from_bytes(random_bytes, 'big')
-            
-            # Rejection sampling: descarta valores que introduziriam viés
-            if random_value < max_valid_value:
-                index = random_value % list_size
-                drawn_symbols.append(weighted_list[index])
-                break
-    
-    return drawn_symbols
-
-def generate_unbiased_number(min_val: int, max_val: int, csprng: DeterministicCSPRNG) -> int:
-    """
-    Gera um único número inteiro no intervalo [min_val, max_val] (inclusivo)
-    usando rejection sampling para evitar viés de módulo.
-    """
-    if min_val > max_val:
-        raise ValueError("O valor mínimo não pode ser maior que o valor máximo.")
-    
-    range_size = max_val - min_val + 1
-    if range_size == 0:
-        return min_val
-
-    # Calcula o número de bits e bytes necessários para representar o range.
-    num_bits = range_size.bit_length()
-    num_bytes = (num_bits + 7) // 8
-
-    # O maior valor que podemos gerar com num_bytes
-    max_gen_val = (1 << (num_bytes * 8)) - 1
-    # O maior múltiplo de range_size que é menor ou igual a max_gen_val
-    max_valid_val = (max_gen_val // range_size) * range_size
-
-    while True:
-        random_bytes = csprng.generate(num_bytes)
-        random_value = int.from_bytes(random_bytes, 'big')
-        
-        if random_value < max_valid_val:
-            return min_val + (random_value % range_size)
-
-
 @app.before_request
 def check_csprng_initialized():
     """Antes de cada requisição, verifica se o CSPRNG está pronto."""
     # Permite que os endpoints de health check e logs passem sem a verificação
-    if request.endpoint in ['health_check', 'get_audit_log']:
+    if request.endpoint in ['health_check', 'get_metrics', 'get_audit_log', 'query_audit_log', 'verify_audit_draw']:
         return
-    with csprng_lock:
-        if csprng_instance is None:
-            logger.error("CSPRNG não está inicializado. Não é possível processar a requisição.", extra={'event': 'csprng_not_ready', 'path': request.path})
-            return jsonify({"status": "error", "message": "Serviço do gerador não está pronto. Tente novamente mais tarde."}), 503
+    if csprng_instance is None:
+        logger.error("CSPRNG não está inicializado. Não é possível processar a requisição.", extra={'event': 'csprng_not_ready', 'path': request.path})
+        return jsonify({"status": "error", "message": "Serviço do gerador não está pronto. Tente novamente mais tarde."}), 503
 
 @app.route("/api/v1/health", methods=["GET"])
 def health_check():
     """Verifica se o serviço está ativo e se o CSPRNG foi inicializado."""
-    with csprng_lock:
-        is_ready = csprng_instance is not None
-    
+    is_ready = csprng_instance is not None
+
+    # `worker` identifica o processo que respondeu no modo multiprocesso.
     if is_ready:
-        return jsonify({"status": "ok", "message": "Gerador está pronto."}), 200
+        return jsonify({"status": "ok", "message": "Gerador está pronto.", "worker": os.getpid()}), 200
     else:
-        return jsonify({"status": "error", "message": "Gerador está inicializando."}), 503
+        return jsonify({"status": "error", "message": "Gerador está inicializando.", "worker": os.getpid()}), 503
+
+@app.route("/api/v1/metrics", methods=["GET"])
+def get_metrics():
+    """Métricas do worker que respondeu, no formato de texto do Prometheus."""
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
 
-@app.route("/api/v1/games/slot_5x3", methods=["GET"])
+@app.route("/api/v1/games/<game_name>", methods=["GET"])
 @auth_required
-def get_slot_5x3_numbers():
+def draw_game_rounds(game_name):
+    """
+    Sorteia rodadas de um jogo do catálogo (games/<nome>.json) usando as
+    probabilidades definidas no arquivo. Aceita `?rounds=N` para lotes.
+    """
     audit_log = {
         'event': 'api_request',
         'endpoint': request.path,
         'method': request.method,
-        'ip': request.remote_addr
+        'ip': request.remote_addr,
+        'game': game_name
     }
-    # Gera 15 números na faixa de 0-9 (10-1) sem viés
-    drawn_numbers = [generate_unbiased_number(0, 9, csprng_instance) for _ in range(15)]
-    
-    audit_log['status'] = 'success'
-    logger.info("Slot 5x3 request processed.", extra=audit_log)
+
+    game = game_catalog.get(game_name)
+    if game is None:
+        audit_log.update({'status': 'failure', 'reason': 'Unknown game'})
+        logger.warning(f"Unknown game requested: {game_name}", extra=audit_log)
+        return jsonify({"status": "error", "message": f"Jogo '{game_name}' não encontrado."}), 404
+
+    try:
+        rounds = int(request.args.get("rounds", 1))
+    except ValueError:
+        rounds = 0
+    if not 1 <= rounds <= MAX_GAME_ROUNDS:
+        msg = f"'rounds' deve ser um inteiro entre 1 e {MAX_GAME_ROUNDS}."
+        audit_log.update({'status': 'failure', 'reason': msg})
+        logger.warning(msg, extra=audit_log)
+        return jsonify({"status": "error", "message": msg}), 400
+
+    with replay.recording() as segments:
+        drawn = game.draw(rounds, csprng_instance).tolist()
+    # Uma única rodada mantém o formato plano original de `drawn_numbers`.
+    drawn_numbers = drawn[0] if rounds == 1 else drawn
+
+    audit_log.update({'status': 'success', 'rounds': rounds, 'result': drawn, 'draw': 'game', 'keystream': segments})
+    logger.info("Game draw request processed.", extra=audit_log)
     return jsonify({
-        "game": "slot_5x3",
+        "game": game_name,
+        "rounds": rounds,
         "drawn_numbers": drawn_numbers,
         "status": "success"
     })
 
+@app.route("/api/v1/slots/<slot_name>/spin", methods=["GET"])
+@auth_required
+def spin_slot(slot_name):
+    """
+    Gira uma máquina de slot do catálogo (games/slots/<nome>.json) `?spins=N`
+    vezes. Cada giro traz as paradas dos rolos, a janela visível (por linha),
+    as linhas premiadas e o prêmio do scatter. Responde em JSON (padrão) ou
+    MessagePack, conforme o `Accept`.
+    """
+    audit_log = {
+        'event': 'api_request',
+        'endpoint': request.path,
+        'method': request.method,
+        'ip': request.remote_addr,
+        'slot': slot_name
+    }
+
+    machine = slot_catalog.get(slot_name)
+    if machine is None:
+        audit_log.update({'status': 'failure', 'reason': 'Unknown slot'})
+        logger.warning(f"Unknown slot requested: {slot_name}", extra=audit_log)
+        return jsonify({"status": "error", "message": f"Slot '{slot_name}' não encontrado."}), 404
+
+    try:
+        spins = int(request.args.get("spins", 1))
+    except ValueError:
+        spins = 0
+    if not 1 <= spins <= MAX_SLOT_SPINS:
+        msg = f"'spins' deve ser um inteiro entre 1 e {MAX_SLOT_SPINS}."
+        audit_log.update({'status': 'failure', 'reason': msg})
+        logger.warning(msg, extra=audit_log)
+        return jsonify({"status": "error", "message": msg}), 400
+
+    response_format = negotiation.response_format(request.accept_mimetypes, packed=False)
+    with replay.recording() as segments:
+        outcome = machine.spin(spins, csprng_instance)
+    symbols = np.array(machine.symbols, dtype=object)
+    stops = outcome["stops"].tolist()
+    wins = outcome["wins"].tolist()
+    # (giros, rolos, linhas) -> uma lista de nomes por linha da janela, como aparece na tela
+    windows = symbols[outcome["window"].transpose(0, 2, 1)].tolist()
+    line_wins = outcome["line_wins"]
+    spin_index, line_index = np.nonzero(line_wins)
+    paid_lines = [[] for _ in range(spins)]
+    for spin, line, symbol, count, win in zip(spin_index.tolist(), line_index.tolist(),
+                                              outcome["line_symbols"][spin_index, line_index].tolist(),
+                                              outcome["line_counts"][spin_index, line_index].tolist(),
+                                              line_wins[spin_index, line_index].tolist()):
+        paid_lines[spin].append({"line": line, "symbol": machine.symbols[symbol], "count": count, "win": win})
+    scatter_wins = outcome["scatter_wins"].tolist()
+    results = [
+        {"stops": stops[i], "window": windows[i], "win": wins[i], "line_wins": paid_lines[i], "scatter_win": scatter_wins[i]}
+        for i in range(spins)
+    ]
+    total_win = sum(wins)
+
+    audit_log.update({'status': 'success', 'spins': spins, 'bet': machine.bet, 'total_win': total_win,
+                      'result': {'stops': stops, 'wins': wins}, 'draw': 'slot', 'keystream': segments})
+    logger.info("Slot spin request processed.", extra=audit_log)
+    return negotiation.render(response_format, {
+        "game": slot_name,
+        "spins": spins,
+        "bet": machine.bet,
+        "total_win": total_win,
+        "results": results,
+        "status": "success"
+    })
+
+def _negotiate(decode):
+    """
+    Decodifica o corpo da requisição no formato do `Content-Type` e escolhe o
+    formato da resposta pelo `Accept`. Retorna (dados, formato da resposta,
+    erro), onde o erro é None ou (mensagem, status HTTP).
+    """
+    try:
+        request_data = decode(negotiation.request_format(request.mimetype), request.get_data())
+    except negotiation.UnsupportedFormat as e:
+        return None, None, (str(e), 415)
+    except ValueError as e:
+        return None, None, (str(e), 400)
+    return request_data, negotiation.response_format(request.accept_mimetypes), None
+
 @app.route("/api/v1/rng/draw_numbers", methods=["POST"])
 @auth_required
 def draw_numbers_in_ranges():
     """
     Recebe uma lista de ranges [[min, max], ...] e retorna um número aleatório para cada range.
+    Aceita e responde JSON (padrão), MessagePack ou o layout compacto (ver `negotiation`).
     """
-    request_data = request.json
-    ranges = request_data.get("ranges")
     audit_log = {
         'event': 'api_request',
         'endpoint': request.path,
         'method': request.method,
         'ip': request.remote_addr,
-        'request_body': request_data
     }
+    request_data, response_format, error = _negotiate(negotiation.decode_numbers_request)
+    if error is not None:
+        msg, status = error
+        audit_log.update({'status': 'failure', 'reason': msg})
+        logger.warning(msg, extra=audit_log)
+        return jsonify({"status": "error", "message": msg}), status
+    ranges = request_data.get("ranges")
+    packed_ranges = isinstance(ranges, np.ndarray)
+    audit_log['request_body'] = {"ranges": ranges.tolist()} if packed_ranges else request_data
 
-    if not isinstance(ranges, list) or not all(isinstance(r, list) and len(r) == 2 for r in ranges):
+    if not packed_ranges and (not isinstance(ranges, list) or not all(isinstance(r, list) and len(r) == 2 for r in ranges)):
         msg = "A chave 'ranges' deve ser uma lista de listas, onde cada sublista é um par [min, max]."
         audit_log.update({'status': 'failure', 'reason': msg})
         logger.warning(msg, extra=audit_log)
         return jsonify({"status": "error", "message": msg}), 400
 
     try:
-        drawn_numbers = []
-        for r in ranges:
-            min_val, max_val = int(r[0]), int(r[1])
-            drawn_numbers.append(generate_unbiased_number(min_val, max_val, csprng_instance))
+        if response_format == negotiation.PACKED and not packed_ranges:
+            # A resposta compacta é int64, então os ranges também precisam caber em int64
+            try:
+                ranges = np.array(ranges, dtype=np.int64).reshape(-1, 2)
+            except OverflowError:
+                msg = "O layout compacto só aceita ranges dentro do intervalo int64."
+                audit_log.update({'status': 'failure', 'reason': msg})
+                logger.warning(msg, extra=audit_log)
+                return jsonify({"status": "error", "message": msg}), 406
+            packed_ranges = True
 
-        audit_log.update({'status': 'success', 'result': drawn_numbers})
+        # Todos os ranges são sorteados em lote a partir de um único bloco de keystream
+        with replay.recording() as segments:
+            if packed_ranges:
+                drawn = draw_unbiased_array(ranges[:, 0], ranges[:, 1], csprng_instance)
+                drawn_numbers = drawn.tolist()
+            else:
+                drawn = None
+                drawn_numbers = draw_unbiased_numbers(ranges, csprng_instance)
+
+        audit_log.update({'status': 'success', 'result': drawn_numbers, 'draw': 'numbers', 'keystream': segments})
         logger.info("draw_numbers request processed.", extra=audit_log)
-        return jsonify({
+        return negotiation.render(response_format, {
             "status": "success",
             "drawn_numbers": drawn_numbers
-        })
+        }, drawn)
     except (ValueError, TypeError) as e:
         audit_log.update({'status': 'failure', 'reason': str(e)})
         logger.error(f"Error during number draw: {e}", extra=audit_log, exc_info=True)
@@ -270,51 +704,249 @@ def draw_numbers_in_ranges():
 @app.route("/api/v1/games/draw_symbols", methods=["POST"])
 @auth_required
 def draw_symbols_from_config():
-    request_data = request.json
-    symbols_config = request_data.get("symbols")
-    num_draws = request_data.get("num_draws", 15) # Pega o número de sorteios, com padrão 15
+    """
+    Sorteio ponderado de símbolos. Em JSON responde com os nomes sorteados; em
+    MessagePack e no layout compacto, com os índices na lista de símbolos.
+    """
     audit_log = {
         'event': 'api_request',
         'endpoint': request.path,
         'method': request.method,
         'ip': request.remote_addr,
-        'request_body': request_data
     }
-    
-    if not symbols_config or not isinstance(symbols_config, list):
+    request_data, response_format, error = _negotiate(negotiation.decode_symbols_request)
+    if error is not None:
+        msg, status = error
+        audit_log.update({'status': 'failure', 'reason': msg})
+        logger.warning(msg, extra=audit_log)
+        return jsonify({"status": "error", "message": msg}), status
+    weights = request_data.get("weights")
+    symbols_config = request_data.get("symbols")
+    num_draws = request_data.get("num_draws", 15) # Pega o número de sorteios, com padrão 15
+    audit_log['request_body'] = {"weights": weights.tolist(), "num_draws": num_draws} if weights is not None else request_data
+
+    if weights is None and (not symbols_config or not isinstance(symbols_config, list)):
         audit_log.update({'status': 'failure', 'reason': 'Invalid symbols configuration'})
         logger.warning("Invalid symbols configuration provided.", extra=audit_log)
         return jsonify({"status": "error", "message": "Invalid symbols configuration provided."}), 400
     
-    if not isinstance(num_draws, int) or num_draws <= 0:
+    if weights is not None and not np.all(weights > 0):
+        audit_log.update({'status': 'failure', 'reason': 'Invalid weights'})
+        logger.warning("Invalid weights provided. Must be positive integers.", extra=audit_log)
+        return jsonify({"status": "error", "message": "Invalid weights. Must be positive integers."}), 400
+
+    if not isinstance(num_draws, int) or not 0 < num_draws <= MAX_SYMBOL_DRAWS:
         audit_log.update({'status': 'failure', 'reason': 'Invalid num_draws value'})
-        logger.warning("Invalid num_draws value provided. Must be a positive integer.", extra=audit_log)
-        return jsonify({"status": "error", "message": "Invalid 'num_draws' value. Must be a positive integer."}), 400
+        logger.warning(f"Invalid num_draws value provided. Must be an integer between 1 and {MAX_SYMBOL_DRAWS}.", extra=audit_log)
+        return jsonify({"status": "error", "message": f"Invalid 'num_draws' value. Must be an integer between 1 and {MAX_SYMBOL_DRAWS}."}), 400
 
     try:
         # Usa a instância global diretamente
-        drawn_symbols = perform_weighted_draw(symbols_config, num_draws, csprng_instance)
-        
-        audit_log.update({'status': 'success', 'result': drawn_symbols})
+        if response_format == negotiation.JSON and weights is None:
+            with replay.recording() as segments:
+                drawn_symbols = perform_weighted_draw(symbols_config, num_draws, csprng_instance)
+            audit_log.update({'status': 'success', 'result': drawn_symbols, 'draw': 'symbols', 'keystream': segments})
+            logger.info("Symbol draw request processed.", extra=audit_log)
+            return jsonify({
+                "status": "success",
+                "drawn_symbols": drawn_symbols
+            })
+
+        with replay.recording() as segments:
+            if weights is not None:
+                num_symbols = len(weights)
+                indices = draw_weighted_indices(weights, num_draws, csprng_instance)
+            else:
+                num_symbols = len(symbols_config)
+                indices = perform_weighted_draw_indices(symbols_config, num_draws, csprng_instance)
+        drawn_indices = indices.tolist()
+        audit_log.update({'status': 'success', 'result': drawn_indices, 'draw': 'symbols', 'keystream': segments})
         logger.info("Symbol draw request processed.", extra=audit_log)
-        return jsonify({
+        return negotiation.render(response_format, {
             "status": "success",
-            "drawn_symbols": drawn_symbols
-        })
+            "drawn_indices": drawn_indices
+        }, indices.astype(negotiation.index_dtype(num_symbols)))
     except Exception as e:
         audit_log.update({'status': 'failure', 'reason': str(e)})
         logger.error(f"Error during symbol draw: {e}", extra=audit_log, exc_info=True)
         return jsonify({"status": "error", "message": str(e)}), 500
 
+def _draw_without_replacement(result_key: str):
+    """
+    Corpo comum de /rng/shuffle e /rng/sample: lê `n`, `k` (só no sample),
+    `count` e `start` da query string, valida os limites e sorteia todas as
+    linhas de uma vez. Os valores vão de `start` a `start + n - 1`.
+    """
+    audit_log = {
+        'event': 'api_request',
+        'endpoint': request.path,
+        'method': request.method,
+        'ip': request.remote_addr,
+        'request_args': request.args.to_dict()
+    }
+    is_sample = result_key == "samples"
+    try:
+        n = int(request.args["n"])
+        k = int(request.args["k"]) if is_sample else n
+        count = int(request.args.get("count", 1))
+        start = int(request.args.get("start", 0))
+    except (KeyError, ValueError):
+        msg = "'n' (e 'k' no sample) são obrigatórios; 'n', 'k', 'count' e 'start' devem ser inteiros."
+        audit_log.update({'status': 'failure', 'reason': msg})
+        logger.warning(msg, extra=audit_log)
+        return jsonify({"status": "error", "message": msg}), 400
+
+    msg = None
+    if n < 1 or count < 1 or not 1 <= k <= n:
+        msg = "'n' e 'count' devem ser positivos e 'k' deve estar entre 1 e 'n'."
+    elif start < 0 or start + n - 1 > np.iinfo(np.int64).max:
+        msg = "'start' deve ser não negativo e 'start + n - 1' deve caber em int64."
+    elif count * k > SHUFFLE_MAX_ITEMS:
+        msg = f"'count' * {'k' if is_sample else 'n'} deve ser no máximo {SHUFFLE_MAX_ITEMS}."
+    if msg:
+        audit_log.update({'status': 'failure', 'reason': msg})
+        logger.warning(msg, extra=audit_log)
+        return jsonify({"status": "error", "message": msg}), 400
+
+    response_format = negotiation.response_format(request.accept_mimetypes)
+    with replay.recording() as segments:
+        drawn = sample_without_replacement(n, k, count, csprng_instance) if is_sample else shuffle_indices(n, count, csprng_instance)
+    if start:
+        drawn = drawn + start
+    rows = drawn.tolist()
+
+    audit_log.update({'status': 'success', 'result': rows, 'draw': 'sample' if is_sample else 'shuffle', 'keystream': segments})
+    logger.info(f"{result_key} request processed.", extra=audit_log)
+    payload = {"status": "success", "n": n, "count": count, result_key: rows}
+    if is_sample:
+        payload["k"] = k
+    return negotiation.render(response_format, payload, drawn.astype(negotiation.index_dtype(start + n)))
+
+@app.route("/api/v1/rng/shuffle", methods=["GET"])
+@auth_required
+def shuffle_decks():
+    """
+    `count` permutações independentes de `n` elementos (`?n=52&count=10000&start=0`),
+    por Fisher–Yates vetorizado entre os baralhos. Responde em JSON (padrão),
+    MessagePack ou no layout compacto, conforme o `Accept`.
+    """
+    return _draw_without_replacement("permutations")
+
+@app.route("/api/v1/rng/sample", methods=["GET"])
+@auth_required
+def sample_without_replacement_draws():
+    """
+    `count` amostras independentes de `k` elementos distintos entre `n`
+    (`?n=60&k=6&count=1&start=1`), em ordem de sorteio. Usa o algoritmo de
+    Floyd para k pequeno em relação a n e Fisher–Yates parcial nos demais casos.
+    """
+    return _draw_without_replacement("samples")
+
+def iter_keystream(csprng, total_bytes: int, chunk_size: int):
+    """
+    Gera `total_bytes` de keystream em blocos de até `chunk_size` bytes.
+
+    Cada stream usa sua própria instância AES-CTR, com chave e nonce sorteados do
+    CSPRNG global e renovados a cada REKEY_INTERVAL_MB. O stream não segura o lock
+    do CSPRNG global durante sua duração e gera com `update_into` em buffers
+    reutilizados, que são apagados ao final.
+    """
+    rekey_interval = REKEY_INTERVAL_MB * 1024 * 1024
+    zeros = memoryview(bytes(chunk_size))
+    buffer = bytearray(chunk_size + AES_BLOCK_SIZE - 1)
+    view = memoryview(buffer)
+    encryptor = None
+    key_bytes = 0
+    remaining = total_bytes
+    try:
+        while remaining > 0:
+            if encryptor is None or key_bytes >= rekey_interval:
+                material = csprng.generate(48)
+                encryptor = Cipher(algorithms.AES(material[:32]), modes.CTR(material[32:]), backend=default_backend()).encryptor()
+                key_bytes = 0
+            size = min(chunk_size, remaining, rekey_interval - key_bytes)
+            encryptor.update_into(zeros[:size], view[:size + AES_BLOCK_SIZE - 1])
+            key_bytes += size
+            remaining -= size
+            yield bytes(view[:size])
+    finally:
+        view[:chunk_size] = zeros
+
 @app.route("/api/v1/stream_entropy", methods=["GET"])
 @auth_required
 def get_raw_entropy_stream():
-    logger.info("Requisição de stream de entropia iniciada.", extra={'event': 'stream_start', 'ip': request.remote_addr})
-    def generate_stream_forever():
-        while True:
-            yield csprng_instance.generate(1024)
+    """
+    Stream de bytes brutos do CSPRNG. Aceita `?bytes=N` (padrão e máximo
+    STREAM_MAX_BYTES) e `?chunk=C` (tamanho dos blocos, de 1 KiB a 1 MiB).
+    """
+    try:
+        total_bytes = int(request.args.get("bytes", STREAM_MAX_BYTES))
+        chunk_size = int(request.args.get("chunk", STREAM_DEFAULT_CHUNK))
+    except ValueError:
+        return jsonify({"status": "error", "message": "'bytes' e 'chunk' devem ser inteiros."}), 400
+    if not 1 <= total_bytes <= STREAM_MAX_BYTES:
+        return jsonify({"status": "error", "message": f"'bytes' deve estar entre 1 e {STREAM_MAX_BYTES}."}), 400
+    if not STREAM_MIN_CHUNK <= chunk_size <= STREAM_MAX_CHUNK:
+        return jsonify({"status": "error", "message": f"'chunk' deve estar entre {STREAM_MIN_CHUNK} e {STREAM_MAX_CHUNK}."}), 400
+
+    logger.info("Requisição de stream de entropia iniciada.", extra={'event': 'stream_start', 'ip': request.remote_addr, 'bytes': total_bytes, 'chunk': chunk_size})
+    response = Response(iter_keystream(csprng_instance, total_bytes, chunk_size), mimetype='application/octet-stream')
+    response.content_length = total_bytes
+    return response
+
+class StreamCSPRNG:
+    """
+    AES-CTR privado de uma exportação longa, com chave e nonce sorteados do
+    CSPRNG global e renovados a cada REKEY_INTERVAL_MB, como em `iter_keystream`.
+    Expõe `generate` para os amostradores vetorizados sem disputar os shards.
+    """
+    def __init__(self, csprng):
+        self._csprng = csprng
+        self._rekey_interval = REKEY_INTERVAL_MB * 1024 * 1024
+        self._encryptor = None
+        self._key_bytes = 0
+
+    def generate(self, num_bytes: int) -> bytes:
+        parts = []
+        while num_bytes > 0:
+            if self._encryptor is None or self._key_bytes >= self._rekey_interval:
+                material = self._csprng.generate(48)
+                self._encryptor = Cipher(algorithms.AES(material[:32]), modes.CTR(material[32:]), backend=default_backend()).encryptor()
+                self._key_bytes = 0
+            size = min(num_bytes, self._rekey_interval - self._key_bytes)
+            parts.append(self._encryptor.update(bytes(size)))
+            self._key_bytes += size
+            num_bytes -= size
+        return parts[0] if len(parts) == 1 else b''.join(parts)
 
-    return Response(generate_stream_forever(), mimetype='application/octet-stream')
+@app.route("/api/v1/rng/uint", methods=["GET"])
+@auth_required
+def get_packed_uints():
+    """
+    Inteiros uniformes sem viés em [min, max] como array compacto de uint8,
+    uint16, uint32 ou uint64 little-endian (`?bits=32&count=N&min=&max=`), sem
+    JSON. `min` e `max` padrão cobrem todo o tipo e `count` vai até
+    STREAM_MAX_BYTES / (bits / 8). Os valores são gerados e enviados em lotes.
+    """
+    try:
+        bits = int(request.args.get("bits", 32))
+        count = int(request.args.get("count", 1))
+        min_val = int(request.args.get("min", 0))
+        max_val = int(request.args["max"]) if "max" in request.args else None
+    except ValueError:
+        return jsonify({"status": "error", "message": "'bits', 'count', 'min' e 'max' devem ser inteiros."}), 400
+    try:
+        chunks = iter_packed_uints(bits, count, min_val, max_val, StreamCSPRNG(csprng_instance))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    total_bytes = count * (bits // 8)
+    if total_bytes > STREAM_MAX_BYTES:
+        return jsonify({"status": "error", "message": f"'count' deve ser no máximo {STREAM_MAX_BYTES // (bits // 8)} para {bits} bits."}), 400
+
+    logger.info("Exportação de inteiros compactos iniciada.", extra={'event': 'uint_export_start', 'ip': request.remote_addr, 'bits': bits, 'count': count, 'min': min_val, 'max': request.args.get("max")})
+    response = Response(chunks, mimetype='application/octet-stream')
+    response.content_length = total_bytes
+    return response
 
 @app.route("/api/v1/audit/logs", methods=["GET"])
 @auth_required
@@ -327,10 +959,173 @@ def get_audit_log():
     except FileNotFoundError:
         return jsonify({"error": "Audit log file not found."}), 404
 
+@app.route("/api/v1/audit/query", methods=["GET"])
+@auth_required
+def query_audit_log():
+    """
+    Consulta os registros de auditoria, incluindo os arquivos rotacionados.
+    Filtros (todos opcionais): `start` e `end` (ISO-8601), `event`, `endpoint`,
+    `ip` e `limit`. Responde em NDJSON, um registro por linha, do mais antigo
+    ao mais recente; só os blocos indexados que podem conter resultados são lidos.
+    """
+    filters = {key: request.args.get(key) for key in ('start', 'end', 'event', 'endpoint', 'ip')}
+    try:
+        start = parse_audit_time(filters['start'])
+        end = parse_audit_time(filters['end'])
+        limit = int(request.args.get("limit", AUDIT_QUERY_MAX_RECORDS))
+    except ValueError:
+        return jsonify({"status": "error", "message": "'start' e 'end' devem estar no formato ISO-8601 e 'limit' deve ser um inteiro."}), 400
+    if not 1 <= limit <= AUDIT_QUERY_MAX_RECORDS:
+        return jsonify({"status": "error", "message": f"'limit' deve estar entre 1 e {AUDIT_QUERY_MAX_RECORDS}."}), 400
+
+    logger.info("Audit log queried.", extra={'event': 'audit_log_query', 'ip': request.remote_addr, 'filters': filters, 'limit': limit})
+    records = audit_index.query(start, end, filters['event'], filters['endpoint'], filters['ip'], limit)
+    return Response(records, mimetype='application/x-ndjson')
+
+def _replay_game(record: dict, csprng):
+    game = game_catalog.get(record["game"])
+    if game is None:
+        raise LookupError(f"Jogo '{record['game']}' não encontrado no catálogo.")
+    return game.draw(int(record["rounds"]), csprng).tolist()
+
+def _replay_slot(record: dict, csprng):
+    machine = slot_catalog.get(record["slot"])
+    if machine is None:
+        raise LookupError(f"Slot '{record['slot']}' não encontrado no catálogo.")
+    stops = machine.draw_stops(int(record["spins"]), csprng)
+    return {"stops": stops.tolist(), "wins": machine.evaluate(stops)["wins"].tolist()}
+
+def _replay_numbers(record: dict, csprng):
+    return draw_unbiased_numbers(record["request_body"]["ranges"], csprng)
+
+def _replay_symbols(record: dict, csprng):
+    body = record["request_body"]
+    num_draws = body.get("num_draws", 15)
+    if not isinstance(num_draws, int) or not 0 < num_draws <= MAX_SYMBOL_DRAWS:
+        raise ValueError(f"'num_draws' deve ser um inteiro entre 1 e {MAX_SYMBOL_DRAWS}.")
+    if "weights" in body:
+        return draw_weighted_indices(np.array(body["weights"], dtype=np.uint64), num_draws, csprng).tolist()
+    indices = perform_weighted_draw_indices(body["symbols"], num_draws, csprng).tolist()
+    # Em JSON o resultado auditado são os nomes; nos formatos compactos, os índices.
+    if record["result"] and isinstance(record["result"][0], str):
+        return [body["symbols"][i]["name"] for i in indices]
+    return indices
+
+def _replay_without_replacement(record: dict, csprng):
+    args = record["request_args"]
+    n, count, start = int(args["n"]), int(args.get("count", 1)), int(args.get("start", 0))
+    if record["draw"] == "sample":
+        drawn = sample_without_replacement(n, int(args["k"]), count, csprng)
+    else:
+        drawn = shuffle_indices(n, count, csprng)
+    return (drawn + start).tolist()
+
+# Recalcula cada tipo de sorteio auditado (campo `draw`) a partir dos parâmetros do registro.
+DRAW_REPLAYERS = {
+    "game": _replay_game,
+    "slot": _replay_slot,
+    "numbers": _replay_numbers,
+    "symbols": _replay_symbols,
+    "shuffle": _replay_without_replacement,
+    "sample": _replay_without_replacement,
+}
+
+def verify_audit_record(record: dict, lookup) -> dict:
+    """
+    Recalcula o sorteio de um registro de auditoria e o compara com o
+    resultado registrado. O keystream de cada trecho (`keystream`) é gerado
+    direto no seu offset, com o contador do CTR posicionado (ver `replay`),
+    então o custo depende só do tamanho do sorteio, e não de quanto foi gerado
+    na época antes dele. `lookup(compromisso)` fornece a semente de cada época.
+
+    Levanta ValueError para registros inválidos e LookupError quando a
+    semente, o jogo ou o slot não estão disponíveis. Jogos e slots são
+    recalculados com a definição atual do catálogo.
+    """
+    if not isinstance(record, dict) or record.get("draw") not in DRAW_REPLAYERS or "result" not in record:
+        raise ValueError("O registro não é um sorteio auditado ('draw', 'keystream' e 'result').")
+    started = time.perf_counter()
+    keystream = replay.replay_keystream(record.get("keystream"), lookup)
+    csprng = replay.ReplayCSPRNG(keystream)
+    reason = None
+    try:
+        recomputed = DRAW_REPLAYERS[record["draw"]](record, csprng)
+    except replay.KeystreamExhausted as e:
+        recomputed, reason = None, str(e)
+    except (KeyError, TypeError, IndexError, ValueError) as e:
+        raise ValueError(f"Parâmetros do sorteio ausentes ou inválidos no registro: {e}") from e
+    if reason is None and recomputed != record["result"]:
+        reason = "O resultado recalculado difere do resultado auditado."
+    elif reason is None and csprng.remaining:
+        reason = f"O sorteio recalculado deixou {csprng.remaining} bytes do keystream registrado sem uso."
+    # O resultado recalculado não é devolvido: ele é derivado do keystream reconstruído.
+    return {
+        "draw": record["draw"],
+        "verified": reason is None,
+        "reason": reason,
+        "keystream_bytes": len(keystream),
+        "elapsed_ms": (time.perf_counter() - started) * 1000,
+    }
+
+def _is_audited(record: dict) -> bool:
+    """True se o registro consta, idêntico, no log de auditoria (inclusive nos arquivos rotacionados)."""
+    timestamp = record.get('asctime')
+    if not isinstance(timestamp, str):
+        return False
+    filters = [value if isinstance(value, str) else None for value in (record.get('event'), record.get('endpoint'), record.get('ip'))]
+    for line in audit_index.query(timestamp, timestamp, *filters):
+        if json.loads(line) == record:
+            return True
+    return False
+
+def _epoch_material(commitment: str):
+    """Semente de uma época: ativa em um shard deste processo ou já encerrada, na custódia."""
+    material = csprng_instance.epoch_material(commitment) if csprng_instance is not None else None
+    return material if material is not None else seed_escrow.load(commitment)
+
+@app.route("/api/v1/audit/verify", methods=["POST"])
+@auth_required
+def verify_audit_draw():
+    """
+    Verifica um sorteio auditado. O corpo é um registro de /api/v1/audit/query
+    (JSON), que precisa constar, idêntico, no log de auditoria: trechos de
+    keystream escolhidos pelo cliente não são aceitos. A resposta traz só se o
+    sorteio confere (`verified`) e o motivo (`reason`); nem o keystream nem o
+    resultado recalculado a partir dele são devolvidos.
+    """
+    audit_log = {
+        'event': 'audit_verify',
+        'endpoint': request.path,
+        'method': request.method,
+        'ip': request.remote_addr,
+    }
+    record = request.get_json(silent=True)
+    if not isinstance(record, dict) or not _is_audited(record):
+        message = "O registro não foi encontrado no log de auditoria."
+        audit_log.update({'status': 'failure', 'reason': message})
+        logger.warning(message, extra=audit_log)
+        return jsonify({"status": "error", "message": message}), 404
+    try:
+        outcome = verify_audit_record(record, _epoch_material)
+    except LookupError as e:
+        audit_log.update({'status': 'failure', 'reason': str(e)})
+        logger.warning(str(e), extra=audit_log)
+        return jsonify({"status": "error", "message": str(e)}), 404
+    except ValueError as e:
+        audit_log.update({'status': 'failure', 'reason': str(e)})
+        logger.warning(str(e), extra=audit_log)
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    audit_log.update({'status': 'success', 'verified_draw': outcome['draw'], 'verified': outcome['verified'],
+                      'commitments': sorted({segment['commitment'] for segment in record['keystream']})})
+    logger.info("Audited draw verified." if outcome['verified'] else "Audited draw verification failed.", extra=audit_log)
+    return jsonify({"status": "success", "verified": outcome['verified'], "reason": outcome['reason']})
+
 if __name__ == "__main__":
+    # Servidor de desenvolvimento com um único processo. Em produção use o modo
+    # multiprocesso: gunicorn -c gunicorn.conf.py generator_server:app
     logger.info("Generator service starting up...")
-    # Inicia a inicialização do CSPRNG em uma thread de background para não bloquear o servidor
-    init_thread = threading.Thread(target=initialize_csprng, daemon=True)
-    init_thread.start()
+    atexit.register(shutdown_csprng)
+    start_background_tasks()
     # Inicia o servidor Flask (debug=False é crucial para produção)
     app.run(host="0.0.0.0", port=5001, debug=False)
\ No newline at end of file
@@ -0,0 +1,33 @@
+# Configuração do modo de produção multiprocesso do Generator.
+# Uso: gunicorn -c gunicorn.conf.py generator_server:app
+#
+# Cada worker é um processo independente que busca suas próprias sementes no
+# mixer depois do fork (post_worker_init). `preload_app` fica desligado para que
+# nenhum estado do CSPRNG exista no processo master. Um SIGHUP no master faz um
+# reload gracioso: novos workers são criados (com novas sementes) e os antigos
+# terminam as requisições em andamento antes de sair. Na saída de cada worker
+# (worker_exit), o pool do CSPRNG é fechado e o total entregue em cada época é
+# registrado na custódia de sementes.
+
+import os
+
+bind = os.getenv("GENERATOR_BIND", "0.0.0.0:5001")
+workers = int(os.getenv("GENERATOR_WORKERS", os.cpu_count() or 1))
+worker_class = "gthread"
+threads = int(os.getenv("GENERATOR_THREADS", "4"))
+# Um shard do CSPRNG por thread do worker (em vez de um por CPU em cada worker).
+os.environ.setdefault("CSPRNG_SHARDS", str(threads))
+preload_app = False
+graceful_timeout = 30
+timeout = 120  # Streams longos de entropia mantêm a requisição aberta
+
+
+def post_worker_init(worker):
+    import generator_server
+    generator_server.start_background_tasks()
+    worker.log.info(f"Generator worker {worker.pid} initialized.")
+
+
+def worker_exit(server, worker):
+    import generator_server
+    generator_server.shutdown_csprng()
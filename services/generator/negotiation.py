@@ -0,0 +1,134 @@
+"""
+Negociação de formato dos endpoints de sorteio (draw_numbers e draw_symbols).
+
+O formato da requisição vem do `Content-Type` e o da resposta do `Accept`;
+sem eles, ou com `*/*`, o formato é JSON, como antes. Os formatos compactos
+evitam montar e serializar listas grandes de objetos Python:
+
+- MessagePack (`application/msgpack` ou `application/x-msgpack`): a mesma
+  estrutura do JSON. Requer o pacote opcional `msgpack`; sem ele o formato não
+  é aceito (415) nem oferecido (a resposta sai em JSON).
+- Layout compacto (`application/vnd.rng.packed`): arrays little-endian sem
+  envelope.
+    - draw_numbers: requisição com pares int64 [min, max]; resposta com um
+      int64 por par.
+    - draw_symbols: requisição com num_draws (uint32) seguido de um peso uint64
+      por símbolo; resposta com um índice por sorteio, no menor tipo sem sinal
+      que comporta os índices (uint8, uint16 ou uint32), informado no
+      cabeçalho `X-RNG-Dtype` (ex: `|u1`, `<u2`).
+
+Nos formatos compactos, os símbolos sorteados são devolvidos como índices na
+lista de símbolos da requisição (`drawn_indices` no MessagePack), e não como
+nomes repetidos. Erros continuam em JSON. O HMAC de `auth_required` cobre os
+bytes brutos do corpo em qualquer formato.
+"""
+import json
+
+import numpy as np
+from flask import Response, jsonify
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = "json"
+MSGPACK = "msgpack"
+PACKED = "packed"
+
+JSON_MIMETYPE = "application/json"
+MSGPACK_MIMETYPE = "application/msgpack"
+PACKED_MIMETYPE = "application/vnd.rng.packed"
+_MIMETYPES = {
+    JSON_MIMETYPE: JSON,
+    MSGPACK_MIMETYPE: MSGPACK,
+    "application/x-msgpack": MSGPACK,
+    PACKED_MIMETYPE: PACKED,
+}
+
+_RANGE_DTYPE = np.dtype("<i8")
+_NUM_DRAWS_DTYPE = np.dtype("<u4")
+_WEIGHT_DTYPE = np.dtype("<u8")
+
+
+class UnsupportedFormat(ValueError):
+    """Formato de requisição desconhecido ou indisponível (415)."""
+
+
+def request_format(mimetype: str) -> str:
+    """Formato do corpo da requisição a partir do `Content-Type` (vazio: JSON)."""
+    if not mimetype:
+        return JSON
+    fmt = _MIMETYPES.get(mimetype)
+    if fmt is None or (fmt == MSGPACK and msgpack is None):
+        raise UnsupportedFormat(f"Content-Type não suportado: '{mimetype}'.")
+    return fmt
+
+
+def response_format(accept, packed: bool = True) -> str:
+    """
+    Formato da resposta a partir do `Accept` (`request.accept_mimetypes`).
+    Com `packed=False` o layout compacto não é oferecido (endpoints cuja
+    resposta não cabe em um único array).
+    """
+    offered = [JSON_MIMETYPE, PACKED_MIMETYPE] if packed else [JSON_MIMETYPE]
+    if msgpack is not None:
+        offered[1:1] = [MSGPACK_MIMETYPE, "application/x-msgpack"]
+    return _MIMETYPES[accept.best_match(offered, default=JSON_MIMETYPE)]
+
+
+def _decode_document(fmt: str, body: bytes) -> dict:
+    try:
+        data = json.loads(body) if fmt == JSON else msgpack.unpackb(body, raw=False)
+    except Exception as e:
+        raise ValueError(f"Corpo da requisição inválido: {e}") from e
+    if not isinstance(data, dict):
+        raise ValueError("O corpo da requisição deve ser um objeto.")
+    return data
+
+
+def decode_numbers_request(fmt: str, body: bytes) -> dict:
+    """
+    Corpo de draw_numbers como {"ranges": ...}. No layout compacto, `ranges` é
+    um array int64 de forma (n, 2); nos demais, a lista recebida.
+    """
+    if fmt != PACKED:
+        return _decode_document(fmt, body)
+    if not body or len(body) % (2 * _RANGE_DTYPE.itemsize):
+        raise ValueError("O corpo compacto deve conter pares int64 [min, max].")
+    return {"ranges": np.frombuffer(body, dtype=_RANGE_DTYPE).reshape(-1, 2)}
+
+
+def decode_symbols_request(fmt: str, body: bytes) -> dict:
+    """
+    Corpo de draw_symbols. No layout compacto retorna {"num_draws": int,
+    "weights": array uint64}; nos demais, o objeto recebido ({"symbols", "num_draws"}).
+    """
+    if fmt != PACKED:
+        return _decode_document(fmt, body)
+    header = _NUM_DRAWS_DTYPE.itemsize
+    if len(body) <= header or (len(body) - header) % _WEIGHT_DTYPE.itemsize:
+        raise ValueError("O corpo compacto deve conter num_draws (uint32) seguido de pesos uint64.")
+    return {
+        "num_draws": int(np.frombuffer(body, dtype=_NUM_DRAWS_DTYPE, count=1)[0]),
+        "weights": np.frombuffer(body, dtype=_WEIGHT_DTYPE, offset=header),
+    }
+
+
+def index_dtype(num_symbols: int) -> np.dtype:
+    """Menor tipo sem sinal que comporta os índices de `num_symbols` símbolos."""
+    for dtype in ("<u1", "<u2", "<u4"):
+        if num_symbols <= np.iinfo(dtype).max + 1:
+            return np.dtype(dtype)
+    return np.dtype("<u8")
+
+
+def render(fmt: str, payload: dict, packed: np.ndarray = None) -> Response:
+    """Resposta no formato negociado: `payload` em JSON/MessagePack ou `packed` como array cru."""
+    if fmt == PACKED:
+        response = Response(packed.tobytes(), mimetype=PACKED_MIMETYPE)
+        response.headers["X-RNG-Dtype"] = packed.dtype.str
+        return response
+    if fmt == MSGPACK:
+        return Response(msgpack.packb(payload), mimetype=MSGPACK_MIMETYPE)
+    return jsonify(payload)
@@ -0,0 +1,200 @@
+# Desenvolvido por: Leandro M. da Costa (HG Studios)
+#
+
+import os
+import json
+import time
+import hashlib
+import threading
+from contextlib import contextmanager
+
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.backends import default_backend
+
+# --- Configurações ---
+AES_BLOCK_SIZE = 16
+COUNTER_MODULUS = 1 << 128  # O contador do CTR ocupa o bloco inteiro de 128 bits (big-endian)
+COMMITMENT_PREFIX = b"CSPRNG-SEED-COMMITMENT-V1"
+REPLAY_MAX_BYTES = 64 * 1024 * 1024  # Keystream máximo reconstruído por verificação
+
+
+class _Recording(threading.local):
+    segments = None  # Padrão de classe: a leitura fora de um `recording()` não levanta AttributeError
+
+
+_local = _Recording()
+
+
+def derive_key(seed: bytes, domain: bytes = b'') -> tuple:
+    """Chave e nonce do AES-CTR de uma época, derivados da semente (a mesma derivação do `DeterministicCSPRNG`)."""
+    key = hashlib.sha256(domain + seed).digest()
+    nonce = hashlib.sha512(domain + seed).digest()[32:48]
+    return key, nonce
+
+
+def seed_commitment(seed: bytes, domain: bytes = b'') -> str:
+    """
+    Compromisso público com a semente de uma época (SHA-256 em hex). Identifica
+    a época nos registros de auditoria sem revelar a semente, e permite
+    conferir a semente revelada depois.
+    """
+    return hashlib.sha256(COMMITMENT_PREFIX + domain + seed).hexdigest()
+
+
+def keystream_at(key: bytes, nonce: bytes, offset: int, length: int) -> bytes:
+    """
+    `length` bytes de keystream a partir do byte `offset` da época, em tempo
+    proporcional a `length`: o contador do CTR começa em nonce + offset // 16,
+    sem gerar o keystream anterior.
+    """
+    counter = (int.from_bytes(nonce, 'big') + offset // AES_BLOCK_SIZE) % COUNTER_MODULUS
+    encryptor = Cipher(algorithms.AES(key), modes.CTR(counter.to_bytes(AES_BLOCK_SIZE, 'big')), backend=default_backend()).encryptor()
+    skip = offset % AES_BLOCK_SIZE
+    return encryptor.update(bytes(skip + length))[skip:]
+
+
+# --- Registro dos trechos de keystream consumidos por um sorteio ---
+
+@contextmanager
+def recording():
+    """
+    Registra, na thread atual, os trechos de keystream entregues pelo CSPRNG
+    dentro do bloco. Produz a lista de trechos ({"commitment", "epoch",
+    "offset", "length"}), na ordem de consumo; trechos contíguos da mesma época
+    são unidos.
+    """
+    segments = []
+    previous = _local.segments
+    _local.segments = segments
+    try:
+        yield segments
+    finally:
+        _local.segments = previous
+
+
+def active_segments():
+    """Lista de trechos do `recording()` ativo na thread atual, ou None."""
+    return _local.segments
+
+
+def append_segment(segments: list, commitment: str, epoch: int, offset: int, length: int):
+    last = segments[-1] if segments else None
+    if last is not None and last["commitment"] == commitment and last["offset"] + last["length"] == offset:
+        last["length"] += length
+    else:
+        segments.append({"commitment": commitment, "epoch": epoch, "offset": offset, "length": length})
+
+
+class KeystreamExhausted(ValueError):
+    """O sorteio recalculado pediu mais keystream do que o registro contém."""
+
+
+class ReplayCSPRNG:
+    """Entrega um keystream já reconstruído, na ordem, no lugar do CSPRNG (mesma interface `generate`)."""
+    def __init__(self, keystream: bytes):
+        self._keystream = memoryview(keystream)
+        self.position = 0
+
+    @property
+    def remaining(self) -> int:
+        return len(self._keystream) - self.position
+
+    def generate(self, num_bytes: int) -> bytes:
+        if num_bytes > self.remaining:
+            raise KeystreamExhausted("O sorteio recalculado consumiu mais keystream do que o registrado na auditoria.")
+        data = self._keystream[self.position:self.position + num_bytes].tobytes()
+        self.position += num_bytes
+        return data
+
+
+# --- Custódia das sementes de épocas encerradas ---
+
+class SeedEscrow:
+    """
+    Guarda a semente de cada época encerrada em `<directory>/<compromisso>.json`
+    (permissão 0600, diretório 0700), com o número de bytes entregues. A
+    semente só é gravada quando a época termina (re-key ou encerramento do
+    worker), então ela nunca permite prever saídas ainda não entregues. Sem
+    diretório, nada é guardado.
+    """
+    def __init__(self, directory: str):
+        self.directory = directory or None
+
+    def _path(self, commitment: str) -> str:
+        if len(commitment) != 64 or any(c not in "0123456789abcdef" for c in commitment):
+            raise ValueError(f"Compromisso de semente inválido: '{commitment}'.")
+        return os.path.join(self.directory, f"{commitment}.json")
+
+    def store(self, seed: bytes, domain: bytes, epoch: int, bytes_served: int):
+        if self.directory is None:
+            return
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        commitment = seed_commitment(seed, domain)
+        record = {
+            "commitment": commitment,
+            "domain": domain.hex(),
+            "seed": seed.hex(),
+            "epoch": epoch,
+            "bytes_served": bytes_served,
+            "worker": os.getpid(),
+            "closed_at": time.time(),
+        }
+        path = self._path(commitment)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(record, f)
+        os.replace(tmp_path, path)
+
+    def load(self, commitment: str):
+        """Retorna (semente, domínio, bytes entregues) da época, ou None se ela não estiver guardada."""
+        if self.directory is None:
+            return None
+        try:
+            with open(self._path(commitment), 'r') as f:
+                record = json.load(f)
+        except FileNotFoundError:
+            return None
+        return bytes.fromhex(record["seed"]), bytes.fromhex(record["domain"]), record["bytes_served"]
+
+
+def replay_keystream(segments: list, lookup) -> bytes:
+    """
+    Reconstrói o keystream dos `segments` de um registro de auditoria.
+    `lookup(compromisso)` retorna (semente, domínio, bytes entregues) ou None.
+    Cada semente é conferida contra o compromisso, e só bytes já entregues na
+    época podem ser reconstruídos.
+    Levanta LookupError se a semente de alguma época não estiver disponível.
+    """
+    if not isinstance(segments, list) or not segments:
+        raise ValueError("O registro não contém trechos de keystream ('keystream').")
+    parts = []
+    epochs = {}
+    total = 0
+    for segment in segments:
+        try:
+            commitment = segment["commitment"]
+            offset = int(segment["offset"])
+            length = int(segment["length"])
+        except (TypeError, KeyError, ValueError):
+            commitment = None
+        if not isinstance(commitment, str):
+            raise ValueError("Cada trecho de keystream deve ter 'commitment', 'offset' e 'length'.")
+        if offset < 0 or length <= 0:
+            raise ValueError("'offset' deve ser não negativo e 'length' positivo.")
+        if commitment not in epochs:
+            material = lookup(commitment)
+            if material is None:
+                raise LookupError(f"A semente da época '{commitment}' não está disponível (época ainda ativa em outro processo ou custódia desativada).")
+            seed, domain, served = material
+            if seed_commitment(seed, domain) != commitment:
+                raise ValueError(f"A semente guardada não corresponde ao compromisso '{commitment}'.")
+            epochs[commitment] = derive_key(seed, domain) + (served,)
+        key, nonce, served = epochs[commitment]
+        total += length
+        if total > REPLAY_MAX_BYTES:
+            raise ValueError(f"O registro pede mais de {REPLAY_MAX_BYTES} bytes de keystream.")
+        if offset + length > served:
+            raise ValueError(f"O trecho [{offset}, {offset + length}) vai além dos {served} bytes entregues na época.")
+        parts.append(keystream_at(key, nonce, offset, length))
+    return b''.join(parts)
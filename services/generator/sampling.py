@@ -0,0 +1,486 @@
+# Desenvolvido por: Leandro M. da Costa (HG Studios)
+#
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from common.metrics import Counter
+
+INT64_MIN = -(1 << 63)
+INT64_MAX = (1 << 63) - 1
+UINT32_SPAN = 1 << 32
+UINT64_SPAN = 1 << 64
+ALIAS_CACHE_SIZE = 256  # Número máximo de tabelas de alias compiladas mantidas em memória
+UINT_WIDTHS = (8, 16, 32, 64)  # Larguras aceitas na saída compacta de inteiros
+UINT_BATCH_BYTES = 1024 * 1024  # Bytes de saída gerados por lote em `iter_packed_uints`
+SAMPLE_DENSE_MAX_ITEMS = 1 << 24  # Itens (count * n) até os quais o sample usa Fisher–Yates parcial
+FLOYD_VECTOR_MAX_K = 64  # Até este k, o teste de repetição do Floyd é vetorizado entre as amostras
+
+# --- Métricas ---
+# A razão de descarte da rejeição é rejected / candidates, por método.
+SAMPLING_CANDIDATES = Counter("csprng_sampling_candidates_total", "Valores sorteados pelo rejection sampling, incluindo os descartados.", ("method",))
+SAMPLING_REJECTED = Counter("csprng_sampling_rejected_total", "Valores descartados pelo rejection sampling.", ("method",))
+_lemire_candidates, _lemire_rejected = SAMPLING_CANDIDATES.labels("lemire"), SAMPLING_REJECTED.labels("lemire")
+_bitmask_candidates, _bitmask_rejected = SAMPLING_CANDIDATES.labels("bitmask"), SAMPLING_REJECTED.labels("bitmask")
+_scalar_candidates, _scalar_rejected = SAMPLING_CANDIDATES.labels("scalar"), SAMPLING_REJECTED.labels("scalar")
+
+
+def generate_unbiased_number(min_val: int, max_val: int, csprng) -> int:
+    """
+    Gera um único número inteiro no intervalo [min_val, max_val] (inclusivo)
+    usando rejection sampling com máscara de bits para evitar viés de módulo.
+
+    Suporta inteiros de tamanho arbitrário; para lotes use `draw_unbiased_numbers`.
+    """
+    if min_val > max_val:
+        raise ValueError("O valor mínimo não pode ser maior que o valor máximo.")
+
+    range_size = max_val - min_val + 1
+    if range_size == 1:
+        return min_val
+
+    # Descarta apenas os bits excedentes do último byte, limitando a rejeição a < 50%.
+    num_bits = (range_size - 1).bit_length()
+    num_bytes = (num_bits + 7) // 8
+    mask = (1 << num_bits) - 1
+
+    attempts = 0
+    while True:
+        attempts += 1
+        random_bytes = csprng.generate(num_bytes)
+        random_value = int.from_bytes(random_bytes, 'big') & mask
+
+        if random_value < range_size:
+            _scalar_candidates.inc(attempts)
+            if attempts > 1:
+                _scalar_rejected.inc(attempts - 1)
+            return min_val + random_value
+
+
+def _lemire_offsets(spans: np.ndarray, csprng) -> np.ndarray:
+    """
+    Caso comum de `sample_offsets`, com todos os spans (limite + 1) em [1, 2^32]:
+    a primeira rodada preenche o resultado inteiro sem indexação. Como no
+    algoritmo original de Lemire, o limiar (2^32 - span) % span só é calculado
+    onde a parte baixa do produto é menor que o span, o único caso em que pode
+    haver rejeição.
+    """
+    words = np.frombuffer(csprng.generate(spans.size * 4), dtype='<u4').astype(np.uint64)
+    products = words * spans
+    result = products >> np.uint64(32)
+    low_mask = np.uint64(0xFFFFFFFF)
+    suspects = np.flatnonzero((products & low_mask) < spans)
+    suspect_spans = spans[suspects]
+    pending = suspects[(products[suspects] & low_mask) < (np.uint64(UINT32_SPAN) - suspect_spans) % suspect_spans]
+    drawn = spans.size
+
+    while pending.size:
+        drawn += pending.size
+        words = np.frombuffer(csprng.generate(pending.size * 4), dtype='<u4').astype(np.uint64)
+        pending_spans = spans[pending]
+        products = words * pending_spans
+        accepted = (products & low_mask) >= (np.uint64(UINT32_SPAN) - pending_spans) % pending_spans
+        result[pending[accepted]] = products[accepted] >> np.uint64(32)
+        pending = pending[~accepted]
+
+    _lemire_candidates.inc(drawn)
+    _lemire_rejected.inc(drawn - spans.size)
+    return result
+
+
+def sample_offsets(limits: np.ndarray, csprng) -> np.ndarray:
+    """
+    Para cada limite `l` em `limits` (uint64), sorteia um deslocamento uniforme em [0, l].
+
+    Limites menores que 2^32 usam o método de Lemire (multiplicação 32x32 -> 64 bits
+    com rejeição exata); os demais usam rejeição por máscara de bits sobre palavras
+    de 64 bits. Cada rodada consome um único bloco de keystream e apenas as posições
+    rejeitadas são sorteadas novamente.
+    """
+    limits = np.asarray(limits, dtype=np.uint64)
+    small = limits < UINT32_SPAN
+    if small.all():
+        return _lemire_offsets(limits + np.uint64(1), csprng)
+    result = np.zeros(limits.shape, dtype=np.uint64)
+
+    spans = limits[small] + np.uint64(1)
+    # Valores de 32 bits abaixo deste limiar introduziriam viés e são rejeitados.
+    thresholds = (np.uint64(UINT32_SPAN) - spans) % spans
+
+    masks = limits[~small]
+    for shift in (1, 2, 4, 8, 16, 32):
+        masks = masks | (masks >> np.uint64(shift))
+
+    small_idx = np.flatnonzero(small)
+    large_idx = np.flatnonzero(~small)
+    small_pending = np.arange(small_idx.size)
+    large_pending = np.arange(large_idx.size)
+    small_drawn = small_idx.size
+    large_drawn = large_idx.size
+
+    while small_pending.size or large_pending.size:
+        small_bytes = small_pending.size * 4
+        block = csprng.generate(small_bytes + large_pending.size * 8)
+
+        if small_pending.size:
+            words = np.frombuffer(block, dtype='<u4', count=small_pending.size).astype(np.uint64)
+            products = words * spans[small_pending]
+            accepted = (products & np.uint64(0xFFFFFFFF)) >= thresholds[small_pending]
+            result[small_idx[small_pending[accepted]]] = products[accepted] >> np.uint64(32)
+            small_pending = small_pending[~accepted]
+            small_drawn += small_pending.size
+
+        if large_pending.size:
+            words = np.frombuffer(block, dtype='<u8', offset=small_bytes)
+            values = words & masks[large_pending]
+            accepted = values <= limits[large_idx[large_pending]]
+            result[large_idx[large_pending[accepted]]] = values[accepted]
+            large_pending = large_pending[~accepted]
+            large_drawn += large_pending.size
+
+    if small_idx.size:
+        _lemire_candidates.inc(small_drawn)
+        _lemire_rejected.inc(small_drawn - small_idx.size)
+    if large_idx.size:
+        _bitmask_candidates.inc(large_drawn)
+        _bitmask_rejected.inc(large_drawn - large_idx.size)
+    return result
+
+
+def sample_uniform_offsets(limit: int, count: int, csprng) -> np.ndarray:
+    """
+    Como `sample_offsets`, mas com o mesmo limite `limit` (< 2^64) para todas as
+    `count` posições: o limite é um escalar e os aceitos são compactados em
+    ordem, sem arrays de limites nem índices pendentes.
+    """
+    result = np.empty(count, dtype=np.uint64)
+    filled = 0
+    drawn = 0
+    if limit < UINT32_SPAN:
+        span = np.uint64(limit + 1)
+        threshold = np.uint64((UINT32_SPAN - (limit + 1)) % (limit + 1))
+        while filled < count:
+            needed = count - filled
+            words = np.frombuffer(csprng.generate(needed * 4), dtype='<u4').astype(np.uint64)
+            products = words * span
+            accepted = products[(products & np.uint64(0xFFFFFFFF)) >= threshold] >> np.uint64(32)
+            result[filled:filled + accepted.size] = accepted
+            filled += accepted.size
+            drawn += needed
+        _lemire_candidates.inc(drawn)
+        _lemire_rejected.inc(drawn - count)
+    else:
+        mask = np.uint64((1 << limit.bit_length()) - 1)
+        bound = np.uint64(limit)
+        while filled < count:
+            needed = count - filled
+            values = np.frombuffer(csprng.generate(needed * 8), dtype='<u8') & mask
+            accepted = values[values <= bound]
+            result[filled:filled + accepted.size] = accepted
+            filled += accepted.size
+            drawn += needed
+        _bitmask_candidates.inc(drawn)
+        _bitmask_rejected.inc(drawn - count)
+    return result
+
+
+def iter_packed_uints(bits: int, count: int, min_val: int, max_val: int | None, csprng, batch_bytes: int = UINT_BATCH_BYTES):
+    """
+    Retorna um gerador com `count` inteiros uniformes sem viés em [min_val,
+    max_val] (None: o máximo do tipo), empacotados como uint{bits}
+    little-endian, em blocos de até `batch_bytes` bytes. Os parâmetros são
+    validados antes do primeiro bloco (ValueError). Com o intervalo completo do
+    tipo, o próprio keystream já é a saída.
+    """
+    if bits not in UINT_WIDTHS:
+        raise ValueError(f"'bits' deve ser um de {', '.join(map(str, UINT_WIDTHS))}.")
+    if max_val is None:
+        max_val = (1 << bits) - 1
+    if count < 1:
+        raise ValueError("'count' deve ser um inteiro positivo.")
+    if not 0 <= min_val <= max_val <= (1 << bits) - 1:
+        raise ValueError(f"'min' e 'max' devem satisfazer 0 <= min <= max <= {(1 << bits) - 1}.")
+
+    width = bits // 8
+    dtype = np.dtype(f'<u{width}')
+    per_batch = max(1, batch_bytes // width)
+    full_range = min_val == 0 and max_val == (1 << bits) - 1
+    base = np.uint64(min_val)
+
+    def batches():
+        remaining = count
+        while remaining:
+            size = min(per_batch, remaining)
+            if full_range:
+                yield csprng.generate(size * width)
+            else:
+                yield (sample_uniform_offsets(max_val - min_val, size, csprng) + base).astype(dtype).tobytes()
+            remaining -= size
+
+    return batches()
+
+
+def draw_unbiased_array(min_vals, max_vals, csprng) -> np.ndarray:
+    """
+    Versão vetorizada de `generate_unbiased_number` para arrays de limites int64.
+    Retorna um `np.ndarray` int64 com um número por par [min, max].
+    """
+    min_vals = np.asarray(min_vals, dtype=np.int64)
+    max_vals = np.asarray(max_vals, dtype=np.int64)
+    if np.any(min_vals > max_vals):
+        raise ValueError("O valor mínimo não pode ser maior que o valor máximo.")
+
+    # A aritmética em uint64 com wraparound dá o resultado exato, pois ele cabe em int64.
+    limits = max_vals.astype(np.uint64) - min_vals.astype(np.uint64)
+    offsets = sample_offsets(limits, csprng)
+    return (min_vals.astype(np.uint64) + offsets).view(np.int64)
+
+
+def draw_unbiased_numbers(ranges: list, csprng) -> list:
+    """
+    Sorteia um número sem viés para cada par (min, max) de `ranges`.
+
+    Limites que cabem em int64 são processados em lote por `draw_unbiased_array`;
+    inteiros maiores recorrem a `generate_unbiased_number`.
+    """
+    min_vals = [int(r[0]) for r in ranges]
+    max_vals = [int(r[1]) for r in ranges]
+    if not min_vals:
+        return []
+
+    bounds = min_vals + max_vals
+    if min(bounds) >= INT64_MIN and max(bounds) <= INT64_MAX:
+        return draw_unbiased_array(min_vals, max_vals, csprng).tolist()
+
+    return [generate_unbiased_number(lo, hi, csprng) for lo, hi in zip(min_vals, max_vals)]
+
+
+def draw_uniform_numbers(min_val: int, max_val: int, count: int, csprng) -> list:
+    """Sorteia `count` números sem viés no mesmo intervalo [min_val, max_val]."""
+    if INT64_MIN <= min(min_val, max_val) and max(min_val, max_val) <= INT64_MAX:
+        min_vals = np.full(count, min_val, dtype=np.int64)
+        max_vals = np.full(count, max_val, dtype=np.int64)
+        return draw_unbiased_array(min_vals, max_vals, csprng).tolist()
+
+    return [generate_unbiased_number(min_val, max_val, csprng) for _ in range(count)]
+
+
+def _fisher_yates_limits(size: int, steps: int, count: int) -> np.ndarray:
+    # O passo i troca a posição i com uma posição uniforme em [i, size - 1]; um limite por passo e baralho
+    return np.repeat(np.arange(size - 1, size - 1 - steps, -1, dtype=np.uint64), count)
+
+
+def _apply_fisher_yates(decks: np.ndarray, offsets: np.ndarray):
+    """
+    Fisher–Yates vetorizado entre baralhos: `decks` tem forma (posições,
+    baralhos) e `offsets` (passos, baralhos), já sorteados; cada passo troca a
+    mesma posição em todos os baralhos de uma vez.
+    """
+    columns = np.arange(decks.shape[1])
+    for i, offset in enumerate(offsets):
+        targets = offset.astype(np.int64) + i
+        current = decks[i].copy()
+        decks[i] = decks[targets, columns]
+        decks[targets, columns] = current
+
+
+def shuffle_indices(n: int, count: int, csprng) -> np.ndarray:
+    """
+    `count` permutações independentes e sem viés de range(n), como array int64
+    de forma (count, n). Os n - 1 índices de troca de todos os baralhos saem de
+    um único `sample_offsets`.
+    """
+    if n < 1 or count < 1:
+        raise ValueError("'n' e 'count' devem ser inteiros positivos.")
+    offsets = sample_offsets(_fisher_yates_limits(n, n - 1, count), csprng).reshape(n - 1, count)
+    decks = np.repeat(np.arange(n, dtype=np.int64)[:, None], count, axis=1)
+    _apply_fisher_yates(decks, offsets)
+    return decks.T
+
+
+def sample_without_replacement(n: int, k: int, count: int, csprng) -> np.ndarray:
+    """
+    `count` amostras independentes de `k` elementos distintos de range(n), em
+    ordem aleatória, como array int64 de forma (count, k).
+
+    Para k pequeno em relação a n (k² <= n), ou quando os baralhos completos não
+    caberiam em SAMPLE_DENSE_MAX_ITEMS, usa o algoritmo de Floyd, com memória
+    proporcional a k; a ordem do conjunto sorteado é então embaralhada com
+    Fisher–Yates. Nos demais casos usa as k primeiras trocas do Fisher–Yates.
+    Em ambos os casos todos os índices saem de um único `sample_offsets`.
+    """
+    if n < 1 or count < 1 or not 1 <= k <= n:
+        raise ValueError("'n' e 'count' devem ser inteiros positivos e 'k' deve estar entre 1 e 'n'.")
+
+    if k * k > n and count * n <= SAMPLE_DENSE_MAX_ITEMS:
+        steps = min(k, n - 1)
+        offsets = sample_offsets(_fisher_yates_limits(n, steps, count), csprng).reshape(steps, count)
+        decks = np.repeat(np.arange(n, dtype=np.int64)[:, None], count, axis=1)
+        _apply_fisher_yates(decks, offsets)
+        return decks[:k].T
+
+    # Floyd: no passo i, t é uniforme em [0, n - k + i]; se t já saiu, entra n - k + i
+    limits = np.concatenate((np.repeat(np.arange(n - k, n, dtype=np.uint64), count), _fisher_yates_limits(k, k - 1, count)))
+    offsets = sample_offsets(limits, csprng)
+    draws = offsets[:k * count].reshape(k, count).astype(np.int64)
+    chosen = np.empty((k, count), dtype=np.int64)
+    if k <= FLOYD_VECTOR_MAX_K:
+        for i in range(k):
+            hits = (chosen[:i] == draws[i]).any(axis=0)
+            chosen[i] = np.where(hits, n - k + i, draws[i])
+    else:
+        for column, values in enumerate(draws.T.tolist()):
+            seen = set()
+            for i, value in enumerate(values):
+                seen.add(n - k + i if value in seen else value)
+            chosen[:, column] = list(seen)
+    _apply_fisher_yates(chosen, offsets[k * count:].reshape(k - 1, count))
+    return chosen.T
+
+
+class AliasTable:
+    """
+    Tabela de alias de Vose construída com aritmética inteira exata.
+
+    Cada uma das `n` colunas tem altura `total` (a soma dos pesos). Um sorteio
+    uniforme em [0, n * total) escolhe a coluna e a altura ao mesmo tempo; a
+    altura é comparada com o limiar inteiro da coluna, então a distribuição
+    resultante é exatamente proporcional aos pesos, sem arredondamento de float.
+    """
+    def __init__(self, names: list, weights: list):
+        num_symbols = len(weights)
+        total = sum(weights)
+        # Escala os pesos por n para que a média das colunas seja exatamente `total`.
+        scaled = [weight * num_symbols for weight in weights]
+        thresholds = [total] * num_symbols
+        aliases = list(range(num_symbols))
+
+        small = [i for i, value in enumerate(scaled) if value < total]
+        large = [i for i, value in enumerate(scaled) if value >= total]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            thresholds[less] = scaled[less]
+            aliases[less] = more
+            scaled[more] -= total - scaled[less]
+            (small if scaled[more] < total else large).append(more)
+        # As colunas restantes têm exatamente `total` unidades e nunca usam o alias.
+
+        self.names = names
+        self.total = total
+        self.num_symbols = num_symbols
+        self.span = num_symbols * total
+        self._thresholds = thresholds
+        self._aliases = aliases
+        if self.span <= UINT64_SPAN:
+            self._threshold_array = np.array(thresholds, dtype=np.uint64)
+            self._alias_array = np.array(aliases, dtype=np.int64)
+
+    def sample_indices(self, num_draws: int, csprng) -> np.ndarray:
+        """Sorteia `num_draws` índices de símbolos (array int64) em O(1) por sorteio."""
+        if self.span <= UINT64_SPAN:
+            limits = np.full(num_draws, self.span - 1, dtype=np.uint64)
+            values = sample_offsets(limits, csprng)
+            total = np.uint64(self.total)
+            columns = (values // total).astype(np.int64)
+            heights = values % total
+            keep = heights < self._threshold_array[columns]
+            return np.where(keep, columns, self._alias_array[columns])
+
+        indices = np.empty(num_draws, dtype=np.int64)
+        for i in range(num_draws):
+            value = generate_unbiased_number(0, self.span - 1, csprng)
+            column, height = divmod(value, self.total)
+            indices[i] = column if height < self._thresholds[column] else self._aliases[column]
+        return indices
+
+    def sample(self, num_draws: int, csprng) -> list:
+        """Sorteia `num_draws` nomes de símbolos."""
+        names = self.names
+        return [names[i] for i in self.sample_indices(num_draws, csprng).tolist()]
+
+
+_alias_cache = OrderedDict()
+_alias_cache_lock = threading.Lock()
+
+
+def _cached_alias_table(key: bytes, build) -> AliasTable:
+    """Retorna a tabela de `key` do cache LRU, construindo-a com `build()` na primeira vez."""
+    with _alias_cache_lock:
+        table = _alias_cache.get(key)
+        if table is not None:
+            _alias_cache.move_to_end(key)
+            return table
+
+    table = build()
+    with _alias_cache_lock:
+        _alias_cache[key] = table
+        _alias_cache.move_to_end(key)
+        while len(_alias_cache) > ALIAS_CACHE_SIZE:
+            _alias_cache.popitem(last=False)
+    return table
+
+
+def compile_alias_table(symbols: list) -> AliasTable:
+    """
+    Valida a configuração de símbolos e retorna sua tabela de alias.
+
+    As tabelas ficam em um cache LRU limitado, indexado pelo hash da forma
+    canônica (JSON ordenado) da configuração, então configurações repetidas
+    não são validadas nem reconstruídas.
+    """
+    canonical = json.dumps(symbols, sort_keys=True, separators=(',', ':'))
+    key = hashlib.sha256(canonical.encode('utf-8')).digest()
+
+    def build():
+        names, weights = [], []
+        for symbol in symbols:
+            # Validação de entrada para garantir a integridade dos dados
+            if not isinstance(symbol, dict) or not isinstance(symbol.get('name'), str) or not isinstance(symbol.get('weight'), int) or symbol.get('weight') <= 0:
+                raise ValueError("Cada símbolo deve ter um 'name' (string) e um 'weight' (inteiro positivo).")
+            names.append(symbol['name'])
+            weights.append(symbol['weight'])
+        return AliasTable(names, weights)
+
+    return _cached_alias_table(key, build)
+
+
+def compile_weight_table(weights: np.ndarray) -> AliasTable:
+    """
+    Como `compile_alias_table`, para uma lista de pesos sem nomes (o layout
+    compacto de draw_symbols): o símbolo é a posição do peso. Compartilha o cache.
+    """
+    weights = np.ascontiguousarray(weights, dtype=np.uint64)
+    key = hashlib.sha256(b'weights:' + weights.tobytes()).digest()
+
+    def build():
+        if not len(weights) or not np.all(weights > 0):
+            raise ValueError("Os pesos devem ser inteiros positivos.")
+        return AliasTable(list(range(len(weights))), weights.tolist())
+
+    return _cached_alias_table(key, build)
+
+
+def perform_weighted_draw(symbols: list, num_draws: int, csprng) -> list:
+    """
+    Realiza um sorteio ponderado de símbolos usando o CSPRNG, sem viés.
+
+    Usa uma tabela de alias (memória proporcional ao número de símbolos, não à
+    soma dos pesos) obtida do cache de tabelas compiladas.
+    """
+    if not symbols:
+        return []
+    return compile_alias_table(symbols).sample(num_draws, csprng)
+
+
+def perform_weighted_draw_indices(symbols: list, num_draws: int, csprng) -> np.ndarray:
+    """Como `perform_weighted_draw`, mas retorna os índices em `symbols` (array int64)."""
+    return compile_alias_table(symbols).sample_indices(num_draws, csprng)
+
+
+def draw_weighted_indices(weights, num_draws: int, csprng) -> np.ndarray:
+    """Sorteia `num_draws` índices proporcionais a `weights` (array int64)."""
+    return compile_weight_table(weights).sample_indices(num_draws, csprng)
@@ -0,0 +1,215 @@
+# Desenvolvido por: Leandro M. da Costa (HG Studios)
+#
+
+import os
+import json
+
+import numpy as np
+
+from games import GAMES_DIR
+from sampling import sample_offsets
+
+# --- Configurações ---
+SLOTS_DIR = os.getenv("SLOTS_DIR", os.path.join(GAMES_DIR, "slots"))
+EVALUATION_BATCH = 65536  # Giros avaliados por vez (limita a memória dos arrays intermediários)
+
+
+class SlotMachine:
+    """
+    Máquina de slot compilada a partir de `games/slots/<nome>.json`.
+
+    Cada giro sorteia uma parada uniforme por rolo (`sample_offsets`, sem viés)
+    e a janela visível são as `rows` posições da fita a partir da parada, com
+    volta ao início. Cada linha de pagamento aposta 1 crédito, então a aposta do
+    giro é o número de linhas. Uma linha paga o símbolo que aparece em
+    sequência a partir do primeiro rolo (o coringa substitui qualquer símbolo,
+    exceto o scatter); o scatter paga pela contagem em qualquer posição da
+    janela, multiplicada pela aposta total. A avaliação é vetorizada por lote.
+    """
+    def __init__(self, name: str, symbols: list, reels: list, rows: int, paylines: list,
+                 line_pays: np.ndarray, scatter_pays: np.ndarray, wild: int, scatter: int):
+        self.name = name
+        self.symbols = symbols
+        self.rows = rows
+        self.num_reels = len(reels)
+        self.paylines = np.array(paylines, dtype=np.intp)
+        self.bet = len(paylines)
+        self.wild = wild
+        self.scatter = scatter
+        self._line_pays = line_pays
+        self._scatter_pays = scatter_pays
+        self._symbol_dtype = np.uint8 if len(symbols) <= 256 else np.uint16
+        # Cada fita repete as primeiras `rows - 1` posições no final, para a janela não precisar de módulo.
+        self._strips = [np.array(strip + strip[:rows - 1], dtype=self._symbol_dtype) for strip in reels]
+        self.strip_lengths = np.array([len(strip) for strip in reels], dtype=np.int64)
+
+    def draw_stops(self, spins: int, csprng) -> np.ndarray:
+        """Sorteia as paradas de `spins` giros. Retorna um array (spins, rolos)."""
+        limits = np.tile((self.strip_lengths - 1).astype(np.uint64), spins)
+        return sample_offsets(limits, csprng).astype(np.int64).reshape(spins, self.num_reels)
+
+    def window(self, stops: np.ndarray) -> np.ndarray:
+        """Símbolos visíveis de cada giro, como array (giros, rolos, linhas) de índices em `symbols`."""
+        offsets = np.arange(self.rows)
+        return np.stack([strip[stops[:, reel, None] + offsets] for reel, strip in enumerate(self._strips)], axis=1)
+
+    def _evaluate_batch(self, stops: np.ndarray) -> dict:
+        window = self.window(stops)
+        num_reels = self.num_reels
+        # (giros, linhas, rolos): o símbolo de cada linha de pagamento em cada rolo
+        lines = window[:, np.arange(num_reels), self.paylines]
+
+        if self.wild >= 0:
+            is_wild = lines == self.wild
+            first = (~is_wild).argmax(axis=-1)
+            all_wild = is_wild.all(axis=-1)
+            base = np.take_along_axis(lines, first[..., None], axis=-1)[..., 0]
+            base = np.where(all_wild, self.wild, base)
+            matches = (lines == base[..., None]) | is_wild
+            wild_run = np.where(all_wild, num_reels, first)
+        else:
+            base = lines[..., 0]
+            matches = lines == base[..., None]
+        run = np.where(matches.all(axis=-1), num_reels, matches.argmin(axis=-1))
+        line_wins = self._line_pays[base, run]
+        line_symbols, line_counts = base, run
+
+        if self.wild >= 0:
+            # Uma sequência só de coringas pode pagar mais que o símbolo que ela completa
+            wild_wins = self._line_pays[self.wild, wild_run]
+            wild_better = wild_wins > line_wins
+            line_wins = np.where(wild_better, wild_wins, line_wins)
+            line_symbols = np.where(wild_better, self.wild, line_symbols)
+            line_counts = np.where(wild_better, wild_run, line_counts)
+
+        if self.scatter >= 0:
+            scatter_counts = np.count_nonzero(window == self.scatter, axis=(1, 2))
+            scatter_wins = self._scatter_pays[scatter_counts] * self.bet
+        else:
+            scatter_counts = np.zeros(len(stops), dtype=np.int64)
+            scatter_wins = np.zeros(len(stops), dtype=self._line_pays.dtype)
+
+        return {
+            "stops": stops,
+            "window": window,
+            "line_wins": line_wins,
+            "line_symbols": line_symbols,
+            "line_counts": line_counts,
+            "scatter_counts": scatter_counts,
+            "scatter_wins": scatter_wins,
+            "wins": line_wins.sum(axis=1) + scatter_wins,
+        }
+
+    def evaluate(self, stops: np.ndarray) -> dict:
+        """
+        Avalia os giros com paradas `stops` (giros, rolos). Retorna arrays por
+        giro: `window`, `line_wins`/`line_symbols`/`line_counts` (giros,
+        linhas), `scatter_counts`, `scatter_wins` e `wins` (prêmio total em créditos).
+        """
+        if len(stops) <= EVALUATION_BATCH:
+            return self._evaluate_batch(stops)
+        parts = [self._evaluate_batch(stops[i:i + EVALUATION_BATCH]) for i in range(0, len(stops), EVALUATION_BATCH)]
+        return {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+
+    def spin(self, spins: int, csprng) -> dict:
+        """Sorteia e avalia `spins` giros."""
+        return self.evaluate(self.draw_stops(spins, csprng))
+
+    def spin_wins(self, spins: int, csprng) -> np.ndarray:
+        """Só o prêmio total de cada giro, em lotes de EVALUATION_BATCH (usado pelo simulador)."""
+        wins = np.empty(spins, dtype=self._line_pays.dtype)
+        for start in range(0, spins, EVALUATION_BATCH):
+            size = min(EVALUATION_BATCH, spins - start)
+            wins[start:start + size] = self._evaluate_batch(self.draw_stops(size, csprng))["wins"]
+        return wins
+
+
+def _pay_table(pays: dict, label: str, max_count: int, dtype) -> np.ndarray:
+    table = np.zeros(max_count + 1, dtype=dtype)
+    if not isinstance(pays, dict):
+        raise ValueError(f"Os pagamentos de '{label}' devem ser um mapa de quantidade -> prêmio.")
+    for key, pay in pays.items():
+        try:
+            count = int(key)
+        except ValueError:
+            raise ValueError(f"Quantidade inválida em '{label}': '{key}'.")
+        if not 1 <= count <= max_count:
+            raise ValueError(f"A quantidade {count} de '{label}' deve estar entre 1 e {max_count}.")
+        if isinstance(pay, bool) or not isinstance(pay, (int, float)) or not pay >= 0:
+            raise ValueError(f"O prêmio de {count}x '{label}' deve ser um número não negativo.")
+        table[count] = pay
+    return table
+
+
+def compile_slot(name: str, config: dict) -> SlotMachine:
+    """
+    Valida a configuração de um slot e a compila. Campos: `symbols` (nomes),
+    `rows`, `reels` (uma fita de símbolos por rolo), `paylines` (a linha da
+    janela em cada rolo), `paytable` (símbolo -> {quantidade: prêmio por
+    crédito de linha}) e, opcionais, `wild` e `scatter` (o prêmio do scatter
+    na `paytable` multiplica a aposta total).
+    """
+    if not isinstance(config, dict):
+        raise ValueError("A configuração do slot deve ser um objeto JSON.")
+
+    symbols = config.get("symbols")
+    if (not isinstance(symbols, list) or not symbols or not all(isinstance(s, str) for s in symbols)
+            or len(set(symbols)) != len(symbols)):
+        raise ValueError("'symbols' deve ser uma lista não vazia de nomes distintos.")
+    index = {symbol: i for i, symbol in enumerate(symbols)}
+
+    rows = config.get("rows")
+    if not isinstance(rows, int) or isinstance(rows, bool) or rows <= 0:
+        raise ValueError("'rows' deve ser um inteiro positivo.")
+
+    reels = config.get("reels")
+    if not isinstance(reels, list) or not reels:
+        raise ValueError("'reels' deve ser uma lista não vazia de fitas.")
+    strips = []
+    for number, strip in enumerate(reels, start=1):
+        if not isinstance(strip, list) or len(strip) < rows:
+            raise ValueError(f"A fita do rolo {number} deve ter pelo menos {rows} símbolos.")
+        unknown = sorted({s for s in strip if s not in index}, key=str)
+        if unknown:
+            raise ValueError(f"A fita do rolo {number} usa símbolos desconhecidos: {unknown}.")
+        strips.append([index[s] for s in strip])
+
+    paylines = config.get("paylines")
+    if (not isinstance(paylines, list) or not paylines
+            or not all(isinstance(line, list) and len(line) == len(strips)
+                       and all(isinstance(r, int) and not isinstance(r, bool) and 0 <= r < rows for r in line)
+                       for line in paylines)):
+        raise ValueError(f"'paylines' deve ser uma lista de linhas com {len(strips)} posições entre 0 e {rows - 1}.")
+
+    special = {}
+    for key in ("wild", "scatter"):
+        symbol = config.get(key)
+        if symbol is not None and symbol not in index:
+            raise ValueError(f"'{key}' deve ser um dos símbolos.")
+        special[key] = index[symbol] if symbol is not None else -1
+    if special["wild"] >= 0 and special["wild"] == special["scatter"]:
+        raise ValueError("'wild' e 'scatter' devem ser símbolos diferentes.")
+
+    paytable = config.get("paytable")
+    if not isinstance(paytable, dict) or not paytable:
+        raise ValueError("'paytable' deve ser um mapa não vazio de símbolo -> pagamentos.")
+    all_pays = [pay for pays in paytable.values() if isinstance(pays, dict) for pay in pays.values()]
+    dtype = np.int64 if all(isinstance(pay, int) for pay in all_pays) else np.float64
+    line_pays = np.zeros((len(symbols), len(strips) + 1), dtype=dtype)
+    scatter_pays = np.zeros(len(strips) * rows + 1, dtype=dtype)
+    for symbol, pays in paytable.items():
+        if symbol not in index:
+            raise ValueError(f"Símbolo desconhecido na 'paytable': '{symbol}'.")
+        if index[symbol] == special["scatter"]:
+            scatter_pays = _pay_table(pays, symbol, len(strips) * rows, dtype)
+        else:
+            line_pays[index[symbol]] = _pay_table(pays, symbol, len(strips), dtype)
+
+    return SlotMachine(name, symbols, strips, rows, paylines, line_pays, scatter_pays, special["wild"], special["scatter"])
+
+
+def load_slot(path: str) -> SlotMachine:
+    """Compila um arquivo de slot fora do catálogo (ex: no simulador de RTP)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return compile_slot(os.path.splitext(os.path.basename(path))[0], json.load(f))
+
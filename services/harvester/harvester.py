@@ -1,59 +1,76 @@
 import os
 import time
+import random
+import asyncio
 import hashlib
-import requests
-import threading
 import importlib
+from concurrent.futures import ThreadPoolExecutor
 import logging
 import logging.config
-from common.auth import create_hmac
 from common.logging_config import LOGGING_CONFIG
+from mixer_client import MixerClient
+from health import SourceHealth
 
 # --- Configuração ---
 logging.config.dictConfig(LOGGING_CONFIG)
 logger = logging.getLogger("harvester.main")
 
-MIXER_SERVER_URL = "http://mixer:5000"
+MIXER_SERVER_URL = os.getenv("MIXER_SERVER_URL", "http://mixer:5000")
+# Se definido (ex: tcp://mixer:5100), os hashes vão pelo transporte binário interno
+MIXER_TRANSPORT_URL = os.getenv("MIXER_TRANSPORT_URL")
 # Lê as fontes da variável de ambiente, separadas por vírgula
 ENABLED_SOURCES_STR = os.getenv("HARVESTER_SOURCES", "latency,radio")
 ENABLED_SOURCES = [s.strip() for s in ENABLED_SOURCES_STR.split(',') if s.strip()]
+# Threads do executor usado pelas chamadas bloqueantes das fontes (I/O de rede, áudio)
+HARVESTER_MAX_THREADS = int(os.getenv("HARVESTER_MAX_THREADS", "64"))
 
-def send_hash_to_mixer(hash_value: str, source_name: str):
-    """Envia o hash gerado para o Servidor Mixer com autenticação HMAC."""
-    url = f"{MIXER_SERVER_URL}/api/v1/entropy"
-    try:
-        data_bytes = bytes.fromhex(hash_value)
-        hmac_digest = create_hmac(data_bytes)
-        
-        headers = {'X-RNG-Auth': hmac_digest}
-        response = requests.post(url, data=data_bytes, headers=headers, timeout=10)
-        response.raise_for_status()
-        logger.info(f"Hash from '{source_name}' sent to mixer successfully.", extra={'event': 'send_hash_success', 'source': source_name})
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error sending hash from '{source_name}' to mixer: {e}", extra={'event': 'send_hash_failure', 'source': source_name})
+def screen_sample(source_instance, health: SourceHealth, raw: bytes):
+    """
+    Aplica os testes de saúde aos bytes brutos e, se aprovados, condiciona e
+    gera o hash da coleta. Retorna (hash, bits creditados) ou None.
+    """
+    if not health.check(raw):
+        return None
+    # Adiciona um timestamp para garantir unicidade mesmo se a fonte retornar dados idênticos
+    entropy_data = source_instance.condition(raw) + str(time.time_ns()).encode('utf-8')
+    return hashlib.sha256(entropy_data).digest(), health.credit(len(raw))
 
-def run_source(source_instance):
-    """Função alvo para a thread, executa uma única fonte em loop."""
+async def run_source(source_instance, mixer_client: MixerClient):
+    """Executa uma única fonte em loop no scheduler assíncrono, no intervalo da fonte."""
     source_name = source_instance.name
+    health = SourceHealth(source_name, source_instance.min_entropy_per_byte)
     logger.info(f"Starting source: {source_name} with interval {source_instance.interval}s")
+    # Começa em um ponto aleatório do intervalo para que as fontes não coletem em sincronia
+    await asyncio.sleep(random.uniform(0, source_instance.jitter * source_instance.interval))
     while True:
+        started = time.monotonic()
         try:
-            entropy_data = source_instance.get_entropy()
+            raw_data = await source_instance.aget_entropy()
             
-            if entropy_data:
-                # Adiciona um timestamp para garantir unicidade mesmo se a fonte retornar dados idênticos
-                entropy_data += str(time.time_ns()).encode('utf-8')
-                
-                # Gera o hash SHA256 dos dados
-                final_hash = hashlib.sha256(entropy_data).hexdigest()
-                send_hash_to_mixer(final_hash, source_name)
+            if raw_data:
+                # Testes e condicionamento rodam no executor: uma coleta grande não bloqueia as outras fontes
+                screened = await asyncio.to_thread(screen_sample, source_instance, health, raw_data)
+                if screened is not None:
+                    final_hash, min_entropy = screened
+                    # Apenas enfileira: o cliente agrupa os hashes e os envia em lote
+                    mixer_client.submit(final_hash, source_name, min_entropy)
             else:
                 logger.warning(f"Source '{source_name}' did not return entropy data.", extra={'event': 'no_entropy_data', 'source': source_name})
 
         except Exception as e:
             logger.error(f"An unhandled error occurred in source '{source_name}': {e}", extra={'event': 'source_runtime_error', 'source': source_name}, exc_info=True)
-        
-        time.sleep(source_instance.interval)
+
+        # O intervalo é contado a partir do início da coleta, com jitter para espalhar a carga
+        jitter = random.uniform(-source_instance.jitter, source_instance.jitter) * source_instance.interval
+        elapsed = time.monotonic() - started
+        await asyncio.sleep(max(0.0, source_instance.interval + jitter - elapsed))
+
+async def run_sources(sources: list):
+    """Agenda todas as fontes no mesmo event loop."""
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=HARVESTER_MAX_THREADS, thread_name_prefix="harvester-io"))
+    mixer_client = MixerClient(MIXER_SERVER_URL, transport_url=MIXER_TRANSPORT_URL)
+    await asyncio.gather(*(run_source(source, mixer_client) for source in sources))
 
 def main():
     """Carrega dinamicamente e inicia as fontes de entropia habilitadas."""
@@ -63,27 +80,25 @@ def main():
 
     logger.info(f"Harvester starting up with sources: {', '.join(ENABLED_SOURCES)}", extra={'event': 'harvester_startup', 'sources': ENABLED_SOURCES})
     
-    threads = []
+    sources = []
     for source_name in ENABLED_SOURCES:
         try:
             # Importa dinamicamente o módulo da fonte
             module = importlib.import_module(f"sources.{source_name}")
             # A classe deve ter o mesmo nome do módulo, capitalizado (ex: latency -> Latency)
             SourceClass = getattr(module, source_name.capitalize())
-            source_instance = SourceClass()
+            sources.append(SourceClass())
             
-            # Cria e inicia uma thread para a fonte
-            thread = threading.Thread(target=run_source, args=(source_instance,), daemon=True)
-            thread.start()
-            threads.append(thread)
-            
-        except (ImportError, AttributeError) as e:
+        except (ImportError, AttributeError, ValueError) as e:
             logger.error(f"Could not load source '{source_name}': {e}. Check if 'services/harvester/sources/{source_name}.py' and class '{source_name.capitalize()}' exist.", extra={'event': 'source_load_failure', 'source': source_name})
 
-    # Mantém o processo principal vivo enquanto as threads (daemon) rodam
+    if not sources:
+        logger.critical("No harvester sources could be loaded.", extra={'event': 'no_sources_loaded'})
+        return
+
+    # Todas as fontes rodam em um único event loop; chamadas bloqueantes vão para o executor
     try:
-        while True:
-            time.sleep(3600) # Dorme por um longo tempo, o trabalho é feito nas threads
+        asyncio.run(run_sources(sources))
     except KeyboardInterrupt:
         logger.info("Harvester shutting down.")
 
@@ -0,0 +1,151 @@
+"""
+Testes de saúde contínuos e estimativa de min-entropia por fonte.
+
+Seguem o NIST SP 800-90B sobre os bytes brutos de cada coleta (antes do
+condicionamento e do hash), tratando cada byte como um símbolo:
+
+- Repetition Count Test (4.4.1): falha se um mesmo símbolo se repete
+  `rct_cutoff` vezes seguidas.
+- Adaptive Proportion Test (4.4.2): em janelas de APT_WINDOW símbolos, falha
+  se o primeiro símbolo da janela aparece `apt_cutoff` vezes ou mais.
+- Amostra repetida: uma coleta idêntica à anterior (ex: resposta de API em
+  cache) também é uma falha.
+
+Os cortes usam a min-entropia declarada pela fonte e probabilidade de falso
+positivo 2^-HEALTH_ALPHA_EXPONENT. O estado é mantido entre coletas (a
+sequência de repetição e a janela parcial continuam na coleta seguinte) e os
+testes são vetorizados com NumPy, então acompanham fontes de alta taxa como o
+áudio. A estimativa de min-entropia é a do valor mais comum (6.3.1).
+
+Uma falha coloca a fonte em quarentena: as coletas continuam sendo testadas,
+mas nada é enviado ao mixer até HEALTH_RECOVERY_SAMPLES coletas seguidas
+passarem nos testes.
+"""
+import os
+import math
+import hashlib
+import logging
+import numpy as np
+
+logger = logging.getLogger("harvester.health")
+
+HEALTH_ALPHA_EXPONENT = 20  # Falso positivo por teste: 2^-20
+APT_WINDOW = 512  # Janela do teste de proporção adaptativa para símbolos não binários
+# Coletas aprovadas seguidas para uma fonte sair da quarentena
+HEALTH_RECOVERY_SAMPLES = int(os.getenv("HEALTH_RECOVERY_SAMPLES", "3"))
+# Símbolos considerados na estimativa; acima disso as contagens são reduzidas à metade
+ESTIMATE_HISTORY = 1 << 20
+ENTROPY_CREDIT_CAP = 256  # Um hash SHA-256 não carrega mais que 256 bits
+_Z_99 = 2.576  # Limite superior de 99% da proporção do valor mais comum
+
+
+def rct_cutoff(min_entropy: float) -> int:
+    """Corte do Repetition Count Test: C = 1 + ceil(α / H)."""
+    return 1 + math.ceil(HEALTH_ALPHA_EXPONENT / min_entropy)
+
+
+def apt_cutoff(min_entropy: float, window: int = APT_WINDOW) -> int:
+    """Corte do Adaptive Proportion Test: C = 1 + CRITBINOM(W, 2^-H, 1 - α)."""
+    p = 2.0 ** -min_entropy
+    target = 1.0 - 2.0 ** -HEALTH_ALPHA_EXPONENT
+    log_p, log_q = math.log(p), math.log1p(-p)
+    cumulative = 0.0
+    for k in range(window + 1):
+        cumulative += math.exp(math.lgamma(window + 1) - math.lgamma(k + 1) - math.lgamma(window - k + 1)
+                               + k * log_p + (window - k) * log_q)
+        if cumulative >= target:
+            return 1 + k
+    return window + 1
+
+
+class SourceHealth:
+    """Estado dos testes de saúde e da estimativa de min-entropia de uma fonte."""
+    def __init__(self, source: str, claimed_entropy: float):
+        if not 0 < claimed_entropy <= 8:
+            raise ValueError(f"Min-entropia declarada inválida para '{source}': {claimed_entropy} bits por byte.")
+        self.source = source
+        self.claimed_entropy = claimed_entropy
+        self.rct_cutoff = rct_cutoff(claimed_entropy)
+        self.apt_cutoff = apt_cutoff(claimed_entropy)
+        self.quarantined = False
+        self.failures = {}  # Falhas acumuladas por teste
+        self._passes = 0
+        self._last_symbol = -1
+        self._run_length = 0
+        self._apt_pending = np.empty(0, dtype=np.uint8)
+        self._counts = np.zeros(256, dtype=np.int64)
+        self._observed = 0
+        self._last_digest = None
+
+    def _repetition_count(self, data) -> bool:
+        # Comprimento de cada sequência de símbolos iguais; a primeira continua a da coleta anterior
+        changes = np.flatnonzero(data[1:] != data[:-1]) + 1
+        runs = np.diff(np.concatenate(([0], changes, [len(data)])))
+        if data[0] == self._last_symbol:
+            runs[0] += self._run_length
+        self._last_symbol = int(data[-1])
+        self._run_length = int(runs[-1])
+        return int(runs.max()) >= self.rct_cutoff
+
+    def _adaptive_proportion(self, data) -> bool:
+        buffered = np.concatenate((self._apt_pending, data)) if len(self._apt_pending) else data
+        full = len(buffered) // APT_WINDOW * APT_WINDOW
+        self._apt_pending = buffered[full:].copy()
+        if not full:
+            return False
+        windows = buffered[:full].reshape(-1, APT_WINDOW)
+        counts = np.count_nonzero(windows == windows[:, :1], axis=1)
+        return int(counts.max()) >= self.apt_cutoff
+
+    def _update_estimate(self, data):
+        self._counts += np.bincount(data, minlength=256)
+        self._observed += len(data)
+        if self._observed > ESTIMATE_HISTORY:
+            self._counts //= 2
+            self._observed = int(self._counts.sum())
+
+    @property
+    def min_entropy(self) -> float:
+        """Estimativa de min-entropia por byte (valor mais comum, limite superior de 99%)."""
+        if self._observed < 2:
+            return 0.0
+        p_hat = int(self._counts.max()) / self._observed
+        p_upper = min(1.0, p_hat + _Z_99 * math.sqrt(p_hat * (1 - p_hat) / (self._observed - 1)))
+        return -math.log2(p_upper) if p_upper < 1.0 else 0.0
+
+    def credit(self, size: int) -> float:
+        """Bits de min-entropia creditados a uma coleta de `size` bytes (no máximo a declarada)."""
+        return min(ENTROPY_CREDIT_CAP, min(self.min_entropy, self.claimed_entropy) * size)
+
+    def check(self, raw: bytes) -> bool:
+        """Testa uma coleta. Retorna True se ela pode ser enviada ao mixer."""
+        data = np.frombuffer(raw, dtype=np.uint8)
+        failed = []
+        digest = hashlib.sha256(raw).digest()
+        if digest == self._last_digest:
+            failed.append('repeated_sample')
+        self._last_digest = digest
+        if self._repetition_count(data):
+            failed.append('repetition_count')
+        if self._adaptive_proportion(data):
+            failed.append('adaptive_proportion')
+        self._update_estimate(data)
+
+        if failed:
+            for name in failed:
+                self.failures[name] = self.failures.get(name, 0) + 1
+            self._passes = 0
+            logger.warning(f"Source '{self.source}' failed health tests: {', '.join(failed)}.",
+                           extra={'event': 'source_health_failure', 'source': self.source, 'tests': failed})
+            if not self.quarantined:
+                self.quarantined = True
+                logger.error(f"Source '{self.source}' quarantined.", extra={'event': 'source_quarantined', 'source': self.source})
+            return False
+
+        if self.quarantined:
+            self._passes += 1
+            if self._passes < HEALTH_RECOVERY_SAMPLES:
+                return False
+            self.quarantined = False
+            logger.info(f"Source '{self.source}' released from quarantine.", extra={'event': 'source_released', 'source': self.source})
+        return True
@@ -0,0 +1,137 @@
+import json
+import math
+import time
+import logging
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from common.auth import create_hmac
+from common.transport import TransportClient, TransportError, FrameRejected
+from health import ENTROPY_CREDIT_CAP
+
+logger = logging.getLogger("harvester.mixer_client")
+
+BATCH_WINDOW_SECONDS = 0.25  # Tempo máximo que um hash espera para ser agrupado em um lote
+MAX_BATCH_ENTRIES = 1024     # Deve ser <= MAX_BATCH_ENTRIES do mixer
+MAX_PENDING_ENTRIES = 8192   # Limite de hashes retidos enquanto o mixer está inacessível
+
+
+class BatchRejected(Exception):
+    """O mixer recusou o lote de forma definitiva (4xx ou FRAME_ERROR); reenviá-lo não adianta."""
+
+
+class MixerClient:
+    """
+    Cliente do mixer com conexões keep-alive reutilizadas (requests.Session).
+
+    `submit` apenas enfileira o hash; uma thread de background agrupa os hashes
+    recebidos em uma janela curta e os envia em um único POST para
+    /api/v1/entropy/batch, assinado com um único HMAC. Com `transport_url`, os
+    lotes vão pela conexão persistente do transporte binário interno.
+
+    Só falhas de conexão e erros 5xx fazem o lote voltar para a fila. Um lote
+    recusado pelo mixer (4xx ou FRAME_ERROR) é descartado, registrado no log e
+    contabilizado em `rejected`, para não bloquear os lotes seguintes.
+    """
+    def __init__(self, base_url: str, window: float = BATCH_WINDOW_SECONDS, transport_url: str = None):
+        self.url = f"{base_url}/api/v1/entropy/batch"
+        self.window = window
+        self._transport = TransportClient(transport_url) if transport_url else None
+        self._session = requests.Session()
+        self._session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        self._session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        self._pending = []
+        self._rejected = 0
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._flush_loop, name="mixer-client", daemon=True)
+        self._thread.start()
+
+    def submit(self, hash_value: bytes, source_name: str, min_entropy: float = None):
+        """
+        Enfileira um hash de 32 bytes para envio no próximo lote. `min_entropy`
+        é a estimativa, em bits, da entropia que o hash carrega; ela é limitada a
+        [0, ENTROPY_CREDIT_CAP] aqui, para que o HTTP (que recusa valores fora
+        do intervalo) e o transporte binário tratem o hash da mesma forma.
+        Uma estimativa não finita é descartada.
+        """
+        entry = {"source": source_name, "hash": hash_value.hex()}
+        if min_entropy is not None and math.isfinite(min_entropy):
+            entry["min_entropy"] = round(min(max(min_entropy, 0.0), ENTROPY_CREDIT_CAP), 3)
+        with self._condition:
+            self._pending.append(entry)
+            if len(self._pending) > MAX_PENDING_ENTRIES:
+                dropped = len(self._pending) - MAX_PENDING_ENTRIES
+                del self._pending[:dropped]
+                logger.warning(f"Dropped {dropped} pending hashes while the mixer is unreachable.", extra={'event': 'send_hash_dropped', 'count': dropped})
+            self._condition.notify()
+
+    @property
+    def rejected(self) -> int:
+        """Total de hashes descartados porque o mixer recusou o lote."""
+        with self._condition:
+            return self._rejected
+
+    def _reject(self, batch: list, reason: str):
+        with self._condition:
+            self._rejected += len(batch)
+            total = self._rejected
+        sources = sorted({entry["source"] for entry in batch})
+        logger.error(f"Mixer rejected {len(batch)} hashes; batch dropped: {reason}",
+                     extra={'event': 'send_hash_rejected', 'count': len(batch), 'sources': sources, 'rejected_total': total})
+
+    def _flush_loop(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+            # Espera a janela para agrupar os hashes que chegarem logo em seguida
+            time.sleep(self.window)
+            with self._condition:
+                batch = self._pending[:MAX_BATCH_ENTRIES]
+                del self._pending[:MAX_BATCH_ENTRIES]
+            try:
+                sent = self._send(batch)
+            except BatchRejected as e:
+                self._reject(batch, str(e))
+                continue
+            if not sent:
+                with self._condition:
+                    self._pending[:0] = batch
+                time.sleep(1)
+
+    def _send(self, batch: list) -> bool:
+        """
+        Envia o lote. Retorna False em falhas transitórias (conexão, 5xx), que
+        devem ser repetidas, e levanta BatchRejected se o mixer recusou o lote.
+        """
+        if self._transport is not None:
+            return self._send_transport(batch)
+        body = json.dumps({"entries": batch}).encode('utf-8')
+        headers = {'X-RNG-Auth': create_hmac(body), 'Content-Type': 'application/json'}
+        sources = sorted({entry["source"] for entry in batch})
+        try:
+            response = self._session.post(self.url, data=body, headers=headers, timeout=10)
+            response.raise_for_status()
+            logger.info(f"Sent {len(batch)} hashes to mixer.", extra={'event': 'send_hash_success', 'count': len(batch), 'sources': sources})
+            return True
+        except requests.exceptions.HTTPError as e:
+            if e.response is not None and e.response.status_code < 500:
+                raise BatchRejected(f"HTTP {e.response.status_code}: {e.response.text[:200]}") from e
+            logger.error(f"Error sending {len(batch)} hashes to mixer: {e}", extra={'event': 'send_hash_failure', 'count': len(batch), 'sources': sources})
+            return False
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Error sending {len(batch)} hashes to mixer: {e}", extra={'event': 'send_hash_failure', 'count': len(batch), 'sources': sources})
+            return False
+
+    def _send_transport(self, batch: list) -> bool:
+        entries = [(entry["source"], bytes.fromhex(entry["hash"]), entry.get("min_entropy")) for entry in batch]
+        sources = sorted({entry["source"] for entry in batch})
+        try:
+            self._transport.push_entropy(entries)
+            logger.info(f"Sent {len(batch)} hashes to mixer.", extra={'event': 'send_hash_success', 'count': len(batch), 'sources': sources, 'transport': 'binary'})
+            return True
+        except FrameRejected as e:
+            raise BatchRejected(str(e)) from e
+        except TransportError as e:
+            logger.error(f"Error sending {len(batch)} hashes to mixer: {e}", extra={'event': 'send_hash_failure', 'count': len(batch), 'sources': sources, 'transport': 'binary'})
+            return False
@@ -1,3 +1,4 @@
+import asyncio
 from abc import ABC, abstractmethod
 import logging
 
@@ -6,13 +7,53 @@ class BaseSource(ABC):
     Classe base abstrata para todas as fontes de entropia.
     Define a interface que cada fonte deve implementar.
     """
+    interval = 60      # Segundos entre coletas (cada fonte define o seu)
+    concurrency = 4    # Máximo de sub-requisições simultâneas da fonte
+    jitter = 0.1       # Variação aleatória do intervalo, como fração do intervalo
+    # Min-entropia declarada, em bits por byte bruto: define os cortes dos testes
+    # de saúde e limita o crédito de entropia informado ao mixer
+    min_entropy_per_byte = 1.0
+
     def __init__(self):
         self.name = self.__class__.__name__
         # O logger será configurado pelo harvester principal,
         # mas o obtemos aqui para uso na classe.
         self.logger = logging.getLogger(f"harvester.source.{self.name}")
+        self._semaphore = None
 
     @abstractmethod
     def get_entropy(self) -> bytes | None:
         """Coleta dados da fonte e os retorna como bytes."""
         pass
+
+    def condition(self, raw: bytes) -> bytes:
+        """
+        Condiciona os bytes brutos (já aprovados nos testes de saúde) antes do
+        hash final. Por padrão os retorna sem alteração.
+        """
+        return raw
+
+    async def aget_entropy(self) -> bytes | None:
+        """
+        Versão assíncrona usada pelo scheduler do harvester.
+
+        Por padrão executa `get_entropy` (bloqueante) em uma thread do executor.
+        Fontes com várias sub-requisições podem sobrescrevê-la e usar
+        `gather_limited` para fazê-las em paralelo.
+        """
+        return await asyncio.to_thread(self.get_entropy)
+
+    async def gather_limited(self, func, items: list) -> list:
+        """
+        Executa `func(item)` (bloqueante) para cada item em threads do executor,
+        com no máximo `concurrency` chamadas simultâneas. Retorna os resultados
+        na ordem dos itens.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def limited(item):
+            async with self._semaphore:
+                return await asyncio.to_thread(func, item)
+
+        return await asyncio.gather(*(limited(item) for item in items))
@@ -7,6 +7,7 @@ class Currency(BaseSource):
         super().__init__()
         self.api_url = "https://api.exchangerate-api.com/v4/latest/USD"
         self.interval = 300  # 5 minutos
+        self.min_entropy_per_byte = 0.1  # JSON quase todo estável; só algumas cotações mudam entre coletas
 
     def get_entropy(self) -> bytes | None:
         try:
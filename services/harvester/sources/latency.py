@@ -12,23 +12,34 @@ class Latency(BaseSource):
             "208.67.222.222"  # OpenDNS
         ]
         self.interval = 10  # 10 segundos
+        self.min_entropy_per_byte = 1.0  # Só os últimos dígitos de cada atraso variam
+        self.concurrency = len(self.servers_to_ping)
 
-    def get_entropy(self) -> bytes | None:
-        combined_data = ""
-        for server in self.servers_to_ping:
-            try:
-                # ping3 requer privilégios, o que é resolvido no Dockerfile
-                delay = ping3.ping(server, unit='ms', timeout=1)
-                if delay is not None and delay is not False:
-                    # Usamos a representação de string de alta precisão do float
-                    combined_data += f"{delay:.15f}"
-                    self.logger.debug(f"Ping to {server} successful: {delay:.2f}ms")
-            except Exception as e:
-                # Captura permissões ou outros erros de ping
-                self.logger.warning(f"Error pinging {server}: {e}", extra={'event': 'ping_failure', 'server': server})
+    def _ping(self, server: str) -> str | None:
+        """Mede a latência até um servidor. Retorna o atraso em texto de alta precisão ou None."""
+        try:
+            # ping3 requer privilégios, o que é resolvido no Dockerfile
+            delay = ping3.ping(server, unit='ms', timeout=1)
+            if delay is not None and delay is not False:
+                self.logger.debug(f"Ping to {server} successful: {delay:.2f}ms")
+                # Usamos a representação de string de alta precisão do float
+                return f"{delay:.15f}"
+        except Exception as e:
+            # Captura permissões ou outros erros de ping
+            self.logger.warning(f"Error pinging {server}: {e}", extra={'event': 'ping_failure', 'server': server})
+        return None
 
+    def _combine(self, results: list) -> bytes | None:
+        combined_data = "".join(r for r in results if r)
         if not combined_data:
             self.logger.warning("Failed to collect any latency data.", extra={'event': 'latency_collection_failed'})
             return None
 
         return combined_data.encode('utf-8')
+
+    def get_entropy(self) -> bytes | None:
+        return self._combine([self._ping(server) for server in self.servers_to_ping])
+
+    async def aget_entropy(self) -> bytes | None:
+        # Os pings são feitos em paralelo: o ciclo leva o tempo do servidor mais lento.
+        return self._combine(await self.gather_limited(self._ping, self.servers_to_ping))
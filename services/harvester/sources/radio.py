@@ -1,77 +1,240 @@
 import os
 import sys
-import pyaudio
+import time
+import hashlib
+import threading
 from .base import BaseSource
 
-class Radio(BaseSource):
+# Backend de captura: 'pyaudio' (dispositivo real) ou 'fake' (ruído sintético, sem /dev/snd)
+RADIO_BACKEND = os.getenv("RADIO_BACKEND", "pyaudio")
+# Janela mantida no buffer circular; o que for mais antigo é sobrescrito
+RADIO_BUFFER_SECONDS = float(os.getenv("RADIO_BUFFER_SECONDS", "5"))
+# Bytes brutos comprimidos em cada digest SHA-256 do condicionamento
+RADIO_CONDITION_BLOCK = int(os.getenv("RADIO_CONDITION_BLOCK", "4096"))
+SAMPLE_WIDTH = 2  # paInt16
+
+
+class _RingBuffer:
+    """Buffer circular de tamanho fixo; `drain` devolve os bytes mais recentes e esvazia o buffer."""
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._data = bytearray(capacity)
+        self._pos = 0
+        self._filled = 0
+        self.overwritten = 0  # Bytes descartados porque ninguém drenou a tempo
+        self._cond = threading.Condition()
+
+    def write(self, data: bytes):
+        with self._cond:
+            size = len(data)
+            if size >= self.capacity:
+                self.overwritten += self._filled + size - self.capacity
+                self._data[:] = data[-self.capacity:]
+                self._pos = 0
+                self._filled = self.capacity
+            else:
+                end = self._pos + size
+                if end <= self.capacity:
+                    self._data[self._pos:end] = data
+                else:
+                    split = self.capacity - self._pos
+                    self._data[self._pos:] = data[:split]
+                    self._data[:size - split] = data[split:]
+                self._pos = end % self.capacity
+                excess = self._filled + size - self.capacity
+                if excess > 0:
+                    self.overwritten += excess
+                self._filled = min(self.capacity, self._filled + size)
+            self._cond.notify_all()
+
+    def drain(self, min_bytes: int = 0, timeout: float = 0.0) -> bytes:
+        """Espera até `timeout` segundos por `min_bytes` e retorna o conteúdo em ordem cronológica."""
+        with self._cond:
+            if self._filled < min_bytes:
+                self._cond.wait_for(lambda: self._filled >= min_bytes, timeout)
+            start = (self._pos - self._filled) % self.capacity
+            if start + self._filled <= self.capacity:
+                data = bytes(self._data[start:start + self._filled])
+            else:
+                data = bytes(self._data[start:] + self._data[:self._pos])
+            self._filled = 0
+            return data
+
+
+class PyAudioBackend:
+    """Captura contínua pelo PortAudio; os blocos chegam na thread de callback do PortAudio."""
     def __init__(self):
-        super().__init__()
-        self.format = pyaudio.paInt16
-        self.channels = 1
-        self.rate = 44100
-        self.chunk = 1024
-        self.record_seconds = 0.1  # Captura muito curta, apenas para ruído
-        self.interval = 5  # 5 segundos
+        import pyaudio
+        self._pyaudio = pyaudio
+        self._audio = None
+        self._stream = None
 
-    def get_entropy(self) -> bytes | None:
+    def _suppress_stderr(self, func):
         # Suprime logs de erro verbosos do ALSA/PortAudio para manter a saída limpa
         devnull = os.open(os.devnull, os.O_WRONLY)
         old_stderr = os.dup(sys.stderr.fileno())
         os.dup2(devnull, sys.stderr.fileno())
-        
         try:
-            audio = pyaudio.PyAudio()
+            return func()
         finally:
             os.dup2(old_stderr, sys.stderr.fileno())
             os.close(devnull)
             os.close(old_stderr)
 
-        stream = None
+    def open(self, rates: list, channels: int, chunk: int, callback) -> int:
+        """Abre o stream com a primeira taxa aceita e retorna a taxa negociada."""
+        if self._audio is None:
+            self._audio = self._suppress_stderr(self._pyaudio.PyAudio)
+        rates = list(rates)
+        # Tenta obter a taxa padrão do dispositivo para priorizá-la
         try:
-            # Tenta encontrar uma taxa de amostragem suportada pelo hardware
-            rates_to_try = [self.rate, 48000, 32000, 16000, 8000]
-            
-            # Tenta obter a taxa padrão do dispositivo para priorizá-la
+            default_rate = int(self._audio.get_default_input_device_info().get('defaultSampleRate', 0))
+            if default_rate > 0 and default_rate not in rates:
+                rates.insert(1, default_rate)
+        except Exception:
+            pass
+
+        def on_audio(in_data, frame_count, time_info, status):
+            callback(in_data)
+            return (None, self._pyaudio.paContinue)
+
+        for rate in rates:
             try:
-                device_info = audio.get_default_input_device_info()
-                default_rate = int(device_info.get('defaultSampleRate', 0))
-                if default_rate > 0 and default_rate not in rates_to_try:
-                    rates_to_try.insert(0, default_rate)
+                self._stream = self._suppress_stderr(lambda: self._audio.open(
+                    format=self._pyaudio.paInt16, channels=channels, rate=rate, input=True,
+                    frames_per_buffer=chunk, stream_callback=on_audio))
+                return rate
+            except Exception:
+                continue
+        raise RuntimeError("Não foi possível abrir o stream de áudio com nenhuma taxa suportada.")
+
+    def is_active(self) -> bool:
+        return self._stream is not None and self._stream.is_active()
+
+    def close(self):
+        if self._stream is not None:
+            try:
+                self._stream.stop_stream()
+                self._stream.close()
             except Exception:
                 pass
+            self._stream = None
+        if self._audio is not None:
+            self._audio.terminate()
+            self._audio = None
+
+
+class FakeAudioBackend:
+    """Gera ruído sintético no ritmo de um dispositivo real, para testes e benchmarks sem /dev/snd."""
+    def __init__(self):
+        self._thread = None
+        self._stop = threading.Event()
 
-            for rate in rates_to_try:
-                try:
-                    stream = audio.open(format=self.format, channels=self.channels,
-                                        rate=rate, input=True,
-                                        frames_per_buffer=self.chunk)
-                    self.rate = rate
-                    break
-                except Exception:
-                    continue
-
-            if not stream:
-                raise RuntimeError("Não foi possível abrir o stream de áudio com nenhuma taxa suportada.")
-
-            self.logger.debug(f"Capturing audio sample at {self.rate}Hz...")
-            frames = []
-            num_chunks = int(self.rate / self.chunk * self.record_seconds)
-            for _ in range(0, max(1, num_chunks)):
-                # exception_on_overflow=False evita crashes se o sistema estiver lento
-                data = stream.read(self.chunk, exception_on_overflow=False)
-                frames.append(data)
-
-            self.logger.info("Audio sample captured successfully.", extra={'event': 'audio_capture_success'})
-            return b''.join(frames)
+    def open(self, rates: list, channels: int, chunk: int, callback) -> int:
+        rate = rates[0]
+        period = chunk / rate
+        chunk_bytes = chunk * channels * SAMPLE_WIDTH
+        self._stop.clear()
 
+        def run():
+            deadline = time.monotonic()
+            while not self._stop.is_set():
+                callback(os.urandom(chunk_bytes))
+                deadline += period
+                self._stop.wait(max(0.0, deadline - time.monotonic()))
+
+        self._thread = threading.Thread(target=run, name="radio-fake-capture", daemon=True)
+        self._thread.start()
+        return rate
+
+    def is_active(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+BACKENDS = {
+    "pyaudio": PyAudioBackend,
+    "fake": FakeAudioBackend,
+}
+
+
+class Radio(BaseSource):
+    """
+    Ruído de áudio capturado continuamente. O dispositivo é aberto uma única
+    vez (a taxa negociada fica em cache para reaberturas) e os blocos são
+    gravados em um buffer circular; cada coleta drena a janela mais recente e
+    retorna o byte menos significativo de cada amostra, que `condition`
+    comprime depois dos testes de saúde.
+    """
+    def __init__(self, backend: str = None):
+        super().__init__()
+        self.channels = 1
+        self.rate = 44100
+        self.chunk = 1024
+        self.record_seconds = 0.1  # Janela mínima aceita por coleta
+        self.interval = 5  # 5 segundos
+        self.min_entropy_per_byte = 1.0  # Com o microfone em silêncio, o byte baixo fica em poucos valores
+        self.backend_name = backend or RADIO_BACKEND
+        if self.backend_name not in BACKENDS:
+            raise ValueError(f"Backend de áudio desconhecido: '{self.backend_name}' (opções: {', '.join(BACKENDS)})")
+        self._backend = None
+        self._buffer = None
+        self._open_lock = threading.Lock()
+
+    def _ensure_stream(self):
+        """Abre o stream na primeira coleta, ou reabre se o dispositivo parou."""
+        with self._open_lock:
+            if self._backend is not None and self._backend.is_active():
+                return
+            if self._backend is not None:
+                self.logger.warning("Audio stream stopped; reopening device.", extra={'event': 'audio_stream_restart'})
+                self._backend.close()
+            backend = BACKENDS[self.backend_name]()
+            # A taxa em cache (a última negociada) é tentada primeiro
+            rates = [self.rate] + [r for r in (48000, 44100, 32000, 16000, 8000) if r != self.rate]
+            self._buffer = None
+            self.rate = backend.open(rates, self.channels, self.chunk, self._on_audio)
+            # O buffer depende da taxa negociada; blocos que chegarem antes dele são descartados
+            capacity = int(self.rate * RADIO_BUFFER_SECONDS) * self.channels * SAMPLE_WIDTH
+            self._buffer = _RingBuffer(max(capacity, self.chunk * self.channels * SAMPLE_WIDTH))
+            self._backend = backend
+            self.logger.info(f"Audio capture started at {self.rate}Hz ({self.backend_name}).",
+                             extra={'event': 'audio_stream_open', 'rate': self.rate, 'backend': self.backend_name})
+
+    def _on_audio(self, data: bytes):
+        # Chamado na thread de captura do backend
+        buffer = self._buffer
+        if buffer is not None:
+            buffer.write(data)
+
+    def condition(self, raw: bytes) -> bytes:
+        """Comprime cada bloco de RADIO_CONDITION_BLOCK bytes em um SHA-256."""
+        return b''.join(hashlib.sha256(raw[i:i + RADIO_CONDITION_BLOCK]).digest()
+                        for i in range(0, len(raw), RADIO_CONDITION_BLOCK))
+
+    def get_entropy(self) -> bytes | None:
+        try:
+            self._ensure_stream()
+            min_bytes = int(self.rate * self.record_seconds) * self.channels * SAMPLE_WIDTH
+            samples = self._buffer.drain(min_bytes, timeout=max(1.0, 2 * self.record_seconds))
+            if len(samples) < min_bytes:
+                raise RuntimeError(f"Captura insuficiente: {len(samples)} de {min_bytes} bytes.")
+            self.logger.info("Audio sample captured successfully.",
+                             extra={'event': 'audio_capture_success', 'bytes': len(samples), 'overwritten': self._buffer.overwritten})
+            # paInt16 little-endian: o primeiro byte de cada amostra é o menos significativo,
+            # onde está o ruído. O condicionamento acontece depois dos testes de saúde.
+            return samples[::SAMPLE_WIDTH]
         except Exception as e:
             self.logger.error(f"Could not capture audio. Error: {e}", extra={'event': 'audio_capture_failure'})
             return None
-        finally:
-            if stream:
-                try:
-                    stream.stop_stream()
-                    stream.close()
-                except Exception:
-                    pass
-            audio.terminate()
+
+    def close(self):
+        with self._open_lock:
+            if self._backend is not None:
+                self._backend.close()
+                self._backend = None
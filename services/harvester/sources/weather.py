@@ -13,29 +13,39 @@ class Weather(BaseSource):
             {"name": "Florianopolis", "latitude": -27.5935, "longitude": -48.5585},
         ]
         self.interval = 300  # 5 minutos
+        self.min_entropy_per_byte = 0.5  # Medições com poucos dígitos, atualizadas a cada poucos minutos
+        self.concurrency = len(self.cities)
 
-    def get_entropy(self) -> bytes | None:
-        concatenated_data = ""
-        for city in self.cities:
-            params = {
-                "latitude": city['latitude'],
-                "longitude": city['longitude'],
-                "current_weather": True,
-                "timezone": "auto"
-            }
-            try:
-                response = requests.get(self.api_url, params=params, timeout=20)
-                response.raise_for_status()
-                data = response.json()
-                if 'current_weather' in data:
-                    weather = data['current_weather']
-                    concatenated_data += f"{weather['temperature']}{weather['windspeed']}{weather['weathercode']}"
-            except requests.exceptions.RequestException as e:
-                self.logger.warning(f"Request failed for {city['name']}: {e}.", extra={'event': 'fetch_weather_city_failure', 'city': city['name']})
-                continue
+    def _fetch_city(self, city: dict) -> str | None:
+        """Busca o clima atual de uma cidade. Retorna a representação em texto ou None."""
+        params = {
+            "latitude": city['latitude'],
+            "longitude": city['longitude'],
+            "current_weather": True,
+            "timezone": "auto"
+        }
+        try:
+            response = requests.get(self.api_url, params=params, timeout=20)
+            response.raise_for_status()
+            data = response.json()
+            if 'current_weather' in data:
+                weather = data['current_weather']
+                return f"{weather['temperature']}{weather['windspeed']}{weather['weathercode']}"
+        except requests.exceptions.RequestException as e:
+            self.logger.warning(f"Request failed for {city['name']}: {e}.", extra={'event': 'fetch_weather_city_failure', 'city': city['name']})
+        return None
 
+    def _combine(self, results: list) -> bytes | None:
+        concatenated_data = "".join(r for r in results if r)
         if not concatenated_data:
             self.logger.warning("Failed to collect weather data from any city.", extra={'event': 'fetch_weather_all_failed'})
             return None
 
         return concatenated_data.encode('utf-8')
+
+    def get_entropy(self) -> bytes | None:
+        return self._combine([self._fetch_city(city) for city in self.cities])
+
+    async def aget_entropy(self) -> bytes | None:
+        # As cidades são consultadas em paralelo: o ciclo leva o tempo da mais lenta.
+        return self._combine(await self.gather_limited(self._fetch_city, self.cities))
@@ -0,0 +1,20 @@
+# Configuração do modo de produção do Mixer.
+# Uso: gunicorn -c gunicorn.conf.py mixer_server:app
+#
+# O pool de entropia vive na memória do processo, então o mixer usa um único
+# worker (com várias threads): mais workers dividiriam a entropia recebida entre
+# pools independentes. Um SIGHUP no master recria o worker, o que reinicia o pool.
+
+import os
+
+bind = os.getenv("MIXER_BIND", "0.0.0.0:5000")
+workers = 1
+worker_class = "gthread"
+threads = int(os.getenv("MIXER_THREADS", "8"))
+preload_app = False
+graceful_timeout = 30
+
+
+def post_worker_init(worker):
+    import mixer_server
+    mixer_server.start_transport_server()
@@ -1,7 +1,11 @@
 # Desenvolvido por: Leandro M. da Costa (HG Studios)
 #
 
+import os
+import math
+import time
 import hashlib
+import itertools
 import threading
 from flask import Flask, request, jsonify, Response
 import logging
@@ -10,20 +14,111 @@ from functools import wraps
 
 from common.auth import verify_hmac
 from common.logging_config import LOGGING_CONFIG
+from common import transport
+from common.metrics import Counter, Histogram, Gauge, REGISTRY, CONTENT_TYPE, LOCK_WAIT_BUCKETS, acquire_timed, instrument_app
 
 # --- Configuração de Logging ---
 logging.config.dictConfig(LOGGING_CONFIG)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
+instrument_app(app)
 
-# --- Pool de Entropia ---
-# O tamanho do pool é 64 bytes (512 bits), correspondendo à saída do SHA-512.
+# --- Acumulador de Entropia (estilo Fortuna) ---
+# A entropia recebida é distribuída entre NUM_POOLS pools, cada um com seu próprio
+# lock e estado SHA-512 incremental. Cada fonte percorre os pools em round-robin,
+# então uma fonte rápida não domina nenhum pool. As sementes são derivadas de uma
+# chave de 64 bytes (512 bits) que é re-semeada a partir dos pools: no n-ésimo
+# reseed, o pool i participa se 2^i divide n.
+# Cada hash credita ao seu pool a min-entropia estimada pelo harvester; um reseed
+# exige MIN_ENTROPY_SOURCES hashes e MIN_RESEED_ENTROPY bits creditados no pool 0.
+# Até o primeiro reseed, toda a entropia vai para o pool 0: com o round-robin, ele
+# receberia só 1 de cada NUM_POOLS hashes de cada fonte e a primeira semente
+# demoraria NUM_POOLS vezes mais para ficar disponível.
 ENTROPY_POOL_SIZE = 64
+NUM_POOLS = 32
+MIN_ENTROPY_SOURCES = 3  # Número mínimo de hashes no pool 0 antes de um reseed (e da primeira semente)
+MIN_RESEED_ENTROPY = 256  # Bits de min-entropia creditados no pool 0 antes de um reseed
+RESEED_MIN_INTERVAL = 0.1  # Segundos mínimos entre reseeds
+ENTROPY_HASH_SIZE = 32  # SHA-256
+MAX_ENTROPY_CREDIT = ENTROPY_HASH_SIZE * 8  # Um hash não carrega mais entropia que o seu tamanho
+# Crédito de hashes sem estimativa (harvesters antigos): MIN_ENTROPY_SOURCES deles bastam, como antes
+DEFAULT_ENTROPY_CREDIT = math.ceil(MIN_RESEED_ENTROPY / MIN_ENTROPY_SOURCES)
+MAX_BATCH_ENTRIES = 1024  # Máximo de hashes por requisição em /api/v1/entropy/batch
+# Fontes aceitas (nomes separados por vírgula, ex: "latency,radio,weather"); vazio aceita
+# qualquer nome até MAX_ENTROPY_SOURCES fontes distintas. Cada fonte ocupa contadores e
+# séries de métricas próprias, então o número de fontes é sempre limitado.
+ALLOWED_SOURCES = frozenset(name.strip() for name in os.getenv("MIXER_ALLOWED_SOURCES", "").split(",") if name.strip())
+MAX_ENTROPY_SOURCES = int(os.getenv("MAX_ENTROPY_SOURCES", "64"))
+MAX_SOURCE_NAME_LENGTH = 64
+# Endereço opcional do transporte binário interno (ex: tcp://0.0.0.0:5100 ou unix:///run/rng/mixer.sock)
+MIXER_TRANSPORT_ADDR = os.getenv("MIXER_TRANSPORT_ADDR")
+
+# --- Métricas ---
+ENTROPY_EVENTS = Counter("mixer_entropy_events_total", "Hashes de entropia recebidos, por fonte.", ("source",))
+LOCK_WAIT = Histogram("mixer_lock_wait_seconds", "Espera pelos locks dos pools e da chave, só nas aquisições disputadas.", ("lock",), buckets=LOCK_WAIT_BUCKETS)
+SEEDS_ISSUED = Counter("mixer_seeds_issued_total", "Sementes emitidas para o gerador.")
+SEEDS_REFUSED = Counter("mixer_seeds_refused_total", "Pedidos de semente recusados antes do primeiro reseed.")
+RESEEDS = Counter("mixer_reseeds_total", "Reseeds da chave do acumulador a partir dos pools.")
+ENTROPY_CREDITED = Counter("mixer_entropy_credited_bits_total", "Bits de min-entropia creditados aos pools, por fonte.", ("source",))
+_pool_lock_wait = LOCK_WAIT.labels("pool")
+_key_lock_wait = LOCK_WAIT.labels("key")
+
+class EntropyPool:
+    """Um pool do acumulador: estado SHA-512 incremental protegido por um lock próprio."""
+    def __init__(self, index: int):
+        self.index = index
+        self.lock = threading.Lock()
+        self._hash = hashlib.sha512()
+        self.events = 0        # Hashes recebidos desde o último reseed que usou este pool
+        self.total_events = 0  # Hashes recebidos desde o início do serviço
+        self.entropy = 0.0     # Bits creditados desde o último reseed que usou este pool
+
+    def add(self, events: list, entropy: float):
+        waited = acquire_timed(self.lock)
+        try:
+            for event in events:
+                self._hash.update(event)
+            self.events += len(events)
+            self.total_events += len(events)
+            self.entropy += entropy
+        finally:
+            self.lock.release()
+        if waited:
+            _pool_lock_wait.observe(waited)
+
+    def drain(self) -> bytes:
+        """Retorna o digest do pool e o reinicia."""
+        with self.lock:
+            digest = self._hash.digest()
+            self._hash = hashlib.sha512()
+            self.events = 0
+            self.entropy = 0.0
+            return digest
+
+    def ready(self) -> bool:
+        return self.events >= MIN_ENTROPY_SOURCES and self.entropy >= MIN_RESEED_ENTROPY
+
+pools = [EntropyPool(i) for i in range(NUM_POOLS)]
+source_counters = {}
+source_counters_lock = threading.Lock()
+known_sources = set()  # Fontes já aceitas (ver `accept_sources`), protegidas por source_counters_lock
+source_estimates = {}  # Último crédito de min-entropia informado por fonte
+
+# Estado de saída: chave da qual as sementes são derivadas. `pool_lock` protege
+# apenas este estado (reseed e emissão de sementes), não a ingestão.
 entropy_pool = bytearray(ENTROPY_POOL_SIZE)
+reseed_count = 0
+last_reseed = 0.0
 pool_lock = threading.Lock()
-MIN_ENTROPY_SOURCES = 3  # Número mínimo de hashes recebidos antes de fornecer uma semente
-entropy_sources_count = 0
+
+Gauge("mixer_pool_events", "Hashes acumulados em cada pool desde o último reseed que o usou.",
+      lambda: {(str(pool.index),): pool.events for pool in pools}, ("pool",))
+Gauge("mixer_pool_entropy_bits", "Bits de min-entropia creditados a cada pool desde o último reseed que o usou.",
+      lambda: {(str(pool.index),): pool.entropy for pool in pools}, ("pool",))
+Gauge("mixer_source_min_entropy_bits", "Último crédito de min-entropia por hash informado por cada fonte.",
+      lambda: {(source,): value for source, value in list(source_estimates.items())}, ("source",))
+Gauge("mixer_reseed_count", "Reseeds da chave desde o início do serviço.", lambda: reseed_count)
 
 def auth_required(f):
     """Decorator para proteger endpoints com autenticação HMAC."""
@@ -46,67 +141,257 @@ def auth_required(f):
 @app.route("/api/v1/health", methods=["GET"])
 def health_check():
     """Verifica se o serviço está ativo e se o pool de entropia está pronto."""
-    with pool_lock:
-        is_ready = entropy_sources_count >= MIN_ENTROPY_SOURCES
-    
+    pool = pools[0]
+    is_ready = reseed_count > 0 or pool.ready()
+
     if is_ready:
         return jsonify({"status": "ok", "message": "Mixer está pronto."}), 200
     else:
-        return jsonify({"status": "seeding", "message": f"Mixer está coletando entropia inicial ({entropy_sources_count}/{MIN_ENTROPY_SOURCES} fontes)."}), 503
+        return jsonify({"status": "seeding", "message": f"Mixer está coletando entropia inicial ({pool.events}/{MIN_ENTROPY_SOURCES} fontes, {pool.entropy:.0f}/{MIN_RESEED_ENTROPY} bits)."}), 503
+
+@app.route("/api/v1/metrics", methods=["GET"])
+def get_metrics():
+    """Métricas do mixer no formato de texto do Prometheus."""
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+def _next_pool(source: str) -> EntropyPool:
+    """Retorna o próximo pool da fonte (round-robin independente por fonte; o pool 0 antes do primeiro reseed)."""
+    if reseed_count == 0:
+        return pools[0]
+    counter = source_counters.get(source)
+    if counter is None:
+        with source_counters_lock:
+            counter = source_counters.setdefault(source, itertools.count())
+    return pools[next(counter) % NUM_POOLS]
+
+def accept_sources(sources) -> str | None:
+    """
+    Registra as fontes de um lote. Retorna None se todas são aceitas, ou a
+    mensagem de erro: nome longo demais, fora de MIXER_ALLOWED_SOURCES ou além
+    de MAX_ENTROPY_SOURCES fontes distintas.
+    """
+    new = [source for source in set(sources) if source not in known_sources]
+    if not new:
+        return None
+    with source_counters_lock:
+        for source in new:
+            if source in known_sources:
+                continue
+            if len(source) > MAX_SOURCE_NAME_LENGTH:
+                return f"Source names must have at most {MAX_SOURCE_NAME_LENGTH} characters."
+            if ALLOWED_SOURCES and source not in ALLOWED_SOURCES:
+                return f"Unknown entropy source '{source}'."
+            if len(known_sources) >= MAX_ENTROPY_SOURCES:
+                return f"Too many distinct entropy sources (limit {MAX_ENTROPY_SOURCES})."
+            known_sources.add(source)
+    return None
+
+def entropy_credit(min_entropy) -> float:
+    """Crédito de um hash: a estimativa informada, limitada a [0, MAX_ENTROPY_CREDIT], ou o padrão."""
+    if min_entropy is None:
+        return DEFAULT_ENTROPY_CREDIT
+    return min(max(float(min_entropy), 0.0), MAX_ENTROPY_CREDIT)
+
+def mix_entropy(entries: list):
+    """
+    Distribui uma lista de (fonte, hash de 32 bytes) ou (fonte, hash,
+    min-entropia estimada em bits ou None) entre os pools.
+
+    Os hashes são agrupados por pool, então cada pool envolvido é travado uma
+    única vez por chamada; pools diferentes podem ser alimentados em paralelo.
+    """
+    grouped = {}
+    per_source = {}
+    for entry in entries:
+        source, new_entropy = entry[0], entry[1]
+        credit = entropy_credit(entry[2] if len(entry) > 2 else None)
+        tag = source.encode('utf-8')[:255]
+        # O evento identifica a fonte (com prefixo de tamanho) para separação de domínio
+        event = bytes([len(tag)]) + tag + new_entropy
+        pool = _next_pool(source)
+        group = grouped.get(pool)
+        if group is None:
+            group = grouped[pool] = [[], 0.0]
+        group[0].append(event)
+        group[1] += credit
+        count, credited = per_source.get(source, (0, 0.0))
+        per_source[source] = (count + 1, credited + credit)
+        if len(entry) > 2 and entry[2] is not None:
+            source_estimates[source] = credit
+
+    for pool, (events, credit) in grouped.items():
+        pool.add(events, credit)
+    for source, (count, credited) in per_source.items():
+        ENTROPY_EVENTS.labels(source).inc(count)
+        ENTROPY_CREDITED.labels(source).inc(credited)
+
+def _reseed_if_due():
+    """Re-semeia a chave a partir dos pools elegíveis. Deve ser chamado com `pool_lock` adquirido."""
+    global entropy_pool, reseed_count, last_reseed
+
+    now = time.monotonic()
+    if not pools[0].ready() or now - last_reseed < RESEED_MIN_INTERVAL:
+        return
+
+    reseed_count += 1
+    RESEEDS.inc()
+    h = hashlib.sha512()
+    h.update(entropy_pool)
+    used_pools = 0
+    for pool in pools:
+        if reseed_count % (1 << pool.index) != 0:
+            break
+        h.update(pool.drain())
+        used_pools += 1
+    entropy_pool = bytearray(h.digest())
+    last_reseed = now
+    logger.info("Chave do acumulador re-semeada.", extra={'event': 'accumulator_reseed', 'reseed_count': reseed_count, 'pools_used': used_pools})
 
 @app.route("/api/v1/entropy", methods=["POST"])
 @auth_required
 def add_entropy():
     """Recebe um hash de um harvester e o mistura no pool de entropia."""
-    global entropy_pool, entropy_sources_count
-    
     new_entropy = request.get_data()
-    if len(new_entropy) != 32: # SHA-256
+    if len(new_entropy) != ENTROPY_HASH_SIZE:
         logger.warning("Entropia recebida com tamanho inválido.", extra={'event': 'invalid_entropy_size', 'size': len(new_entropy), 'ip': request.remote_addr})
         return jsonify({"status": "error", "message": "Entropy must be 32 bytes (256 bits)."}), 400
 
-    with pool_lock:
-        # Mistura a nova entropia com o pool atual usando SHA-512
-        h = hashlib.sha512()
-        h.update(entropy_pool)
-        h.update(new_entropy)
-        entropy_pool = bytearray(h.digest())
-        
-        if entropy_sources_count < MIN_ENTROPY_SOURCES:
-            entropy_sources_count += 1
-        
-        logger.info("Nova entropia misturada ao pool.", extra={'event': 'entropy_mixed', 'source_ip': request.remote_addr})
+    # Fontes antigas não se identificam; o IP do harvester é usado como fonte
+    source = request.headers.get('X-RNG-Source', request.remote_addr or 'unknown')
+    error = accept_sources([source])
+    if error is not None:
+        logger.warning(error, extra={'event': 'entropy_source_rejected', 'source': source[:MAX_SOURCE_NAME_LENGTH], 'ip': request.remote_addr})
+        return jsonify({"status": "error", "message": error}), 400
+    mix_entropy([(source, new_entropy)])
+    logger.info("Nova entropia misturada ao pool.", extra={'event': 'entropy_mixed', 'source_ip': request.remote_addr})
         
     return jsonify({"status": "success", "message": "Entropy mixed."})
 
-@app.route("/api/v1/seed", methods=["GET"])
+@app.route("/api/v1/entropy/batch", methods=["POST"])
 @auth_required
-def get_seed():
-    """Fornece uma semente de 64 bytes para o gerador."""
+def add_entropy_batch():
+    """
+    Recebe vários hashes identificados por fonte, sob um único HMAC, e os
+    mistura no pool em uma única passagem.
+
+    Corpo: {"entries": [{"source": "latency", "hash": "<64 caracteres hex>", "min_entropy": 24.5}, ...]}
+
+    `min_entropy` (opcional) é a estimativa, em bits, da entropia do hash feita
+    pelos testes de saúde do harvester; sem ela vale DEFAULT_ENTROPY_CREDIT.
+    """
+    request_data = request.get_json(silent=True) or {}
+    entries = request_data.get("entries")
+    if not isinstance(entries, list) or not 0 < len(entries) <= MAX_BATCH_ENTRIES:
+        logger.warning("Lote de entropia inválido.", extra={'event': 'invalid_entropy_batch', 'ip': request.remote_addr})
+        return jsonify({"status": "error", "message": f"'entries' must be a list of 1 to {MAX_BATCH_ENTRIES} items."}), 400
+
+    hashes = []
+    sources = {}
+    for entry in entries:
+        source = new_entropy = min_entropy = None
+        try:
+            source = entry["source"]
+            new_entropy = bytes.fromhex(entry["hash"])
+            min_entropy = entry.get("min_entropy")
+        except (TypeError, KeyError, ValueError, AttributeError):
+            pass
+        if not isinstance(source, str) or new_entropy is None or len(new_entropy) != ENTROPY_HASH_SIZE:
+            logger.warning("Entrada de lote de entropia inválida.", extra={'event': 'invalid_entropy_batch', 'ip': request.remote_addr})
+            return jsonify({"status": "error", "message": "Each entry must have a 'source' (string) and a 32-byte hex 'hash'."}), 400
+        if min_entropy is not None and (isinstance(min_entropy, bool) or not isinstance(min_entropy, (int, float))
+                                        or not 0 <= min_entropy <= MAX_ENTROPY_CREDIT):
+            logger.warning("Entrada de lote de entropia inválida.", extra={'event': 'invalid_entropy_batch', 'ip': request.remote_addr})
+            return jsonify({"status": "error", "message": f"'min_entropy' must be a number of bits between 0 and {MAX_ENTROPY_CREDIT}."}), 400
+        hashes.append((source, new_entropy, min_entropy))
+        sources[source] = sources.get(source, 0) + 1
+
+    error = accept_sources(sources)
+    if error is not None:
+        logger.warning(error, extra={'event': 'entropy_source_rejected', 'ip': request.remote_addr})
+        return jsonify({"status": "error", "message": error}), 400
+    mix_entropy(hashes)
+    logger.info("Lote de entropia misturado ao pool.", extra={'event': 'entropy_batch_mixed', 'source_ip': request.remote_addr, 'count': len(hashes), 'sources': sources})
+
+    return jsonify({"status": "success", "message": "Entropy mixed.", "mixed": len(hashes)})
+
+def issue_seed() -> bytes | None:
+    """Emite uma semente de 64 bytes, ou None se o acumulador ainda não foi semeado."""
     global entropy_pool
-    
-    with pool_lock:
-        if entropy_sources_count < MIN_ENTROPY_SOURCES:
-            logger.warning("Tentativa de obter semente antes do pool estar pronto.", extra={'event': 'seed_request_too_early'})
-            return jsonify({"status": "error", "message": "Entropy pool is not sufficiently seeded."}), 503
+
+    waited = acquire_timed(pool_lock)
+    try:
+        _reseed_if_due()
+        if reseed_count == 0:
+            SEEDS_REFUSED.inc()
+            return None
             
-        # Gera a semente de saída como um hash do pool atual.
+        # Gera a semente de saída como um hash da chave atual.
         # Isso evita expor o estado interno diretamente.
         output_h = hashlib.sha512()
         output_h.update(entropy_pool)
         output_h.update(b'CSPRNG-SEED-V1') # Salt para a saída
         seed = output_h.digest()
         
-        # Re-mistura (re-stir) o pool para o próximo pedido, garantindo que o estado futuro seja diferente.
+        # Re-mistura (re-stir) a chave para o próximo pedido, garantindo que o estado futuro seja diferente.
         internal_h = hashlib.sha512()
         internal_h.update(entropy_pool)
         internal_h.update(b'CSPRNG-POOL-V1') # Salt diferente para a atualização interna
         entropy_pool = bytearray(internal_h.digest())
-        
-        logger.info("Semente fornecida para o gerador.", extra={'event': 'seed_provided'})
+    finally:
+        pool_lock.release()
+        if waited:
+            _key_lock_wait.observe(waited)
+    SEEDS_ISSUED.inc()
+    return seed
+
+@app.route("/api/v1/seed", methods=["GET"])
+@auth_required
+def get_seed():
+    """Fornece uma semente de 64 bytes para o gerador."""
+    seed = issue_seed()
+    if seed is None:
+        logger.warning("Tentativa de obter semente antes do pool estar pronto.", extra={'event': 'seed_request_too_early'})
+        return jsonify({"status": "error", "message": "Entropy pool is not sufficiently seeded."}), 503
 
+    logger.info("Semente fornecida para o gerador.", extra={'event': 'seed_provided'})
     return Response(seed, mimetype='application/octet-stream')
 
+def _transport_entropy_push(payload: bytes, estimated: bool = False):
+    entries = transport.decode_entropy_entries(payload, estimated)
+    if not 0 < len(entries) <= MAX_BATCH_ENTRIES:
+        raise ValueError(f"Entropy push must carry 1 to {MAX_BATCH_ENTRIES} hashes.")
+    error = accept_sources(entry[0] for entry in entries)
+    if error is not None:
+        logger.warning(error, extra={'event': 'entropy_source_rejected', 'transport': 'binary'})
+        raise ValueError(error)
+    mix_entropy(entries)
+    return transport.ack(len(entries))
+
+def _transport_entropy_push_estimated(payload: bytes):
+    return _transport_entropy_push(payload, estimated=True)
+
+def _transport_seed_pull(payload: bytes):
+    seed = issue_seed()
+    if seed is None:
+        logger.warning("Tentativa de obter semente antes do pool estar pronto.", extra={'event': 'seed_request_too_early', 'transport': 'binary'})
+        return transport.FRAME_ERROR, b"Entropy pool is not sufficiently seeded."
+    logger.info("Semente fornecida para o gerador.", extra={'event': 'seed_provided', 'transport': 'binary'})
+    return transport.FRAME_SEED, seed
+
+def start_transport_server():
+    """Inicia o transporte binário interno, se MIXER_TRANSPORT_ADDR estiver configurado."""
+    if not MIXER_TRANSPORT_ADDR:
+        return None
+    server = transport.TransportServer(MIXER_TRANSPORT_ADDR, {
+        transport.FRAME_ENTROPY_PUSH: _transport_entropy_push,
+        transport.FRAME_ENTROPY_PUSH_ESTIMATED: _transport_entropy_push_estimated,
+        transport.FRAME_SEED_PULL: _transport_seed_pull,
+    }).start()
+    logger.info(f"Binary transport listening on {MIXER_TRANSPORT_ADDR}.", extra={'event': 'transport_start'})
+    return server
+
 if __name__ == "__main__":
+    # Servidor de desenvolvimento. Em produção use: gunicorn -c gunicorn.conf.py mixer_server:app
     logger.info("Mixer service starting up...")
+    start_transport_server()
     app.run(host="0.0.0.0", port=5000, debug=False)
\ No newline at end of file
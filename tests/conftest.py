@@ -0,0 +1,16 @@
+"""
+Configuração comum dos testes: os serviços são importados direto de services/,
+como nos scripts, com uma chave de API e diretórios temporários.
+"""
+import os
+import sys
+import tempfile
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SERVICES_DIR = os.path.join(ROOT_DIR, "services")
+sys.path[:0] = [SERVICES_DIR, os.path.join(SERVICES_DIR, "generator"), os.path.join(SERVICES_DIR, "mixer")]
+
+os.environ.setdefault("API_AUTH_KEY", "test-key")
+os.environ.setdefault("LOG_DIR", tempfile.mkdtemp(prefix="rng-test-logs-"))
+os.environ.setdefault("SEED_ESCROW_DIR", tempfile.mkdtemp(prefix="rng-test-seeds-"))
+os.environ.setdefault("GAMES_DIR", os.path.join(ROOT_DIR, "games"))
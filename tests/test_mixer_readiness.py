@@ -0,0 +1,68 @@
+import os
+import itertools
+
+import pytest
+
+import mixer_server
+import generator_server
+
+# Cadência dos harvesters do docker-compose: (fonte, intervalo em segundos, crédito por hash em bits).
+# O crédito é o da coleta típica: ~80 bytes de latências e um bloco de áudio (limitado a 256 bits).
+DEFAULT_SOURCES = (("latency", 10, 80.0), ("radio", 5, 256.0))
+BATCH_WINDOW = 0.25  # harvester.mixer_client.BATCH_WINDOW_SECONDS
+START_JITTER = 0.1   # Fração do intervalo antes da primeira coleta (pior caso)
+
+
+@pytest.fixture
+def fresh_mixer(monkeypatch):
+    monkeypatch.setattr(mixer_server, "pools", [mixer_server.EntropyPool(i) for i in range(mixer_server.NUM_POOLS)])
+    monkeypatch.setattr(mixer_server, "source_counters", {})
+    monkeypatch.setattr(mixer_server, "reseed_count", 0)
+    monkeypatch.setattr(mixer_server, "last_reseed", 0.0)
+    return mixer_server
+
+
+def _collections(until: float):
+    """Coletas (instante, fonte, crédito) das fontes padrão até `until`, com o atraso máximo de início."""
+    events = []
+    for source, interval, credit in DEFAULT_SOURCES:
+        for n in itertools.count():
+            moment = START_JITTER * interval + n * interval + BATCH_WINDOW
+            if moment > until:
+                break
+            events.append((moment, source, credit))
+    return sorted(events)
+
+
+def test_first_seed_within_generator_retry_window(fresh_mixer):
+    window = generator_server.SEED_FETCH_ATTEMPTS * generator_server.SEED_FETCH_RETRY_DELAY
+    issued_at = None
+    for moment, source, credit in _collections(window):
+        fresh_mixer.mix_entropy([(source, os.urandom(32), credit)])
+        if fresh_mixer.issue_seed() is not None:
+            issued_at = moment
+            break
+    assert issued_at is not None and issued_at <= window
+
+
+def test_round_robin_resumes_after_first_reseed(fresh_mixer):
+    for _ in range(mixer_server.MIN_ENTROPY_SOURCES):
+        fresh_mixer.mix_entropy([("radio", os.urandom(32), 256.0)])
+    assert fresh_mixer.issue_seed() is not None
+
+    fresh_mixer.mix_entropy([("radio", os.urandom(32), 256.0) for _ in range(mixer_server.NUM_POOLS)])
+    assert all(pool.total_events >= 1 for pool in fresh_mixer.pools)
+
+
+def test_initialize_csprng_keeps_retrying(monkeypatch):
+    attempts = iter([None, None, None] + [os.urandom(64)] * generator_server.CSPRNG_SHARDS)
+    monkeypatch.setattr(generator_server, "fetch_new_seed_with_retry", lambda: next(attempts))
+    monkeypatch.setattr(generator_server.time, "sleep", lambda seconds: None)
+    monkeypatch.setattr(generator_server, "csprng_instance", None)
+
+    generator_server.initialize_csprng()
+    try:
+        assert generator_server.csprng_instance is not None
+        assert len(generator_server.csprng_instance) == generator_server.CSPRNG_SHARDS
+    finally:
+        generator_server.csprng_instance.close()
@@ -0,0 +1,44 @@
+import os
+import json
+
+import pytest
+
+import mixer_server
+from common.auth import create_hmac
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(mixer_server, "known_sources", set())
+    monkeypatch.setattr(mixer_server, "MAX_ENTROPY_SOURCES", 2)
+    return mixer_server.app.test_client()
+
+
+def _post_batch(client, sources):
+    body = json.dumps({"entries": [{"source": source, "hash": os.urandom(32).hex()} for source in sources]}).encode()
+    return client.post("/api/v1/entropy/batch", data=body, headers={"X-RNG-Auth": create_hmac(body), "Content-Type": "application/json"})
+
+
+def test_distinct_sources_are_capped(client):
+    assert _post_batch(client, ["latency", "radio"]).status_code == 200
+    assert _post_batch(client, ["radio", "latency"]).status_code == 200
+    assert _post_batch(client, ["weather"]).status_code == 400
+    assert mixer_server.known_sources == {"latency", "radio"}
+
+
+def test_allow_list(client, monkeypatch):
+    monkeypatch.setattr(mixer_server, "ALLOWED_SOURCES", frozenset({"latency"}))
+    assert _post_batch(client, ["latency"]).status_code == 200
+    assert _post_batch(client, ["spoofed"]).status_code == 400
+
+
+def test_long_source_names_are_rejected(client):
+    assert _post_batch(client, ["x" * (mixer_server.MAX_SOURCE_NAME_LENGTH + 1)]).status_code == 400
+
+
+def test_transport_push_rejects_unknown_sources(client, monkeypatch):
+    monkeypatch.setattr(mixer_server, "ALLOWED_SOURCES", frozenset({"latency"}))
+    from common import transport
+    payload = transport.encode_entropy_entries([("spoofed", os.urandom(32))])
+    with pytest.raises(ValueError):
+        mixer_server._transport_entropy_push(payload)
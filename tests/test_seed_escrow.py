@@ -0,0 +1,44 @@
+import os
+import sys
+import json
+import subprocess
+
+import generator_server
+import replay
+
+
+def _escrowed_seeds():
+    directory = generator_server.SEED_ESCROW_DIR
+    records = []
+    for name in os.listdir(directory) if os.path.isdir(directory) else []:
+        with open(os.path.join(directory, name)) as f:
+            records.append(json.load(f))
+    return {record["commitment"]: record for record in records if "seed" in record}
+
+
+def test_open_epoch_seed_is_never_written():
+    csprng = generator_server.DeterministicCSPRNG(os.urandom(64), domain=b"TEST-OPEN-EPOCH")
+    try:
+        with replay.recording() as segments:
+            csprng.generate(4096)
+        assert segments[0]["commitment"] not in _escrowed_seeds()
+    finally:
+        csprng.close()
+
+
+def test_closed_epoch_is_escrowed_and_replayable():
+    csprng = generator_server.DeterministicCSPRNG(os.urandom(64), domain=b"TEST-CLOSED-EPOCH")
+    with replay.recording() as segments:
+        data = csprng.generate(1000)
+    csprng.close()
+
+    record = _escrowed_seeds()[segments[0]["commitment"]]
+    assert record["bytes_served"] == 1000
+    assert replay.replay_keystream(segments, generator_server.seed_escrow.load) == data
+
+
+def test_escrow_dir_inside_log_dir_is_rejected(tmp_path):
+    env = dict(os.environ, LOG_DIR=str(tmp_path), SEED_ESCROW_DIR=str(tmp_path / "seeds"), PYTHONPATH=os.pathsep.join(sys.path))
+    result = subprocess.run([sys.executable, "-c", "import generator_server"], env=env, capture_output=True, text=True)
+    assert result.returncode != 0
+    assert "SEED_ESCROW_DIR" in result.stderr